@@ -0,0 +1,77 @@
+"""conversation counters
+
+Revision ID: 1c9e5f2b7d03
+Revises: f7c3a8e1d254
+Create Date: 2025-09-28 16:03:55.417290
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c9e5f2b7d03'
+down_revision: Union[str, Sequence[str], None] = 'f7c3a8e1d254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_BATCH = 5000
+
+
+def _backfill_token_counts(bind) -> None:
+    """Keyset batches over messages with token_count IS NULL, counted in Python."""
+    from services.tokenizer_service import tokenizer_service
+
+    select_batch = sa.text("""
+        SELECT id, created_at, content FROM messages
+        WHERE token_count IS NULL AND id > :after
+        ORDER BY id
+        LIMIT :limit
+    """)
+    update_row = sa.text("UPDATE messages SET token_count = :tokens WHERE id = :id AND created_at = :created_at")
+    after = ""
+    while True:
+        rows = bind.execute(select_batch, {"after": after, "limit": BACKFILL_BATCH}).all()
+        if not rows:
+            break
+        counts = tokenizer_service.count_many([r.content or "" for r in rows])
+        bind.execute(update_row, [
+            {"id": r.id, "created_at": r.created_at, "tokens": n} for r, n in zip(rows, counts)
+        ])
+        after = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('token_total', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('summarized_message_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('summarized_token_total', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('summary_watermark_at', sa.DateTime(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_watermark_id', sa.String(length=36), nullable=True))
+    # Counters are summed from token_count, so fill it where callers left it empty. Counted with the
+    # same tokenizer the API uses, so the curator's budgets agree with the backfilled rows
+    _backfill_token_counts(op.get_bind())
+    op.execute("""
+        UPDATE conversations c
+        SET message_count = s.n, token_total = s.tokens
+        FROM (
+            SELECT conversation_id, count(*) AS n, COALESCE(sum(token_count), 0) AS tokens
+            FROM messages
+            GROUP BY conversation_id
+        ) s
+        WHERE s.conversation_id = c.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'summary_watermark_id')
+    op.drop_column('conversations', 'summary_watermark_at')
+    op.drop_column('conversations', 'summarized_token_total')
+    op.drop_column('conversations', 'summarized_message_count')
+    op.drop_column('conversations', 'token_total')
+    op.drop_column('conversations', 'message_count')
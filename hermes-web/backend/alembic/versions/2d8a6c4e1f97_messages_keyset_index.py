@@ -0,0 +1,34 @@
+"""messages keyset index
+
+Revision ID: 2d8a6c4e1f97
+Revises: 1c9e5f2b7d03
+Create Date: 2025-09-29 10:47:26.381904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d8a6c4e1f97'
+down_revision: Union[str, Sequence[str], None] = '1c9e5f2b7d03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction block; avoids locking writes on large tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_conversation_created', 'messages', ['conversation_id', 'created_at', 'id'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_messages_conversation_created', table_name='messages', postgresql_concurrently=True)
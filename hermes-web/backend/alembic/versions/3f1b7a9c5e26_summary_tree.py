@@ -0,0 +1,51 @@
+"""summary tree
+
+Revision ID: 3f1b7a9c5e26
+Revises: 2d8a6c4e1f97
+Create Date: 2025-09-30 15:12:40.662019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1b7a9c5e26'
+down_revision: Union[str, Sequence[str], None] = '2d8a6c4e1f97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('summaries', sa.Column('level', sa.Integer(), nullable=True))
+    op.add_column('summaries', sa.Column('parent_id', sa.String(length=36), nullable=True))
+    op.add_column('summaries', sa.Column('span_start_at', sa.DateTime(), nullable=True))
+    op.add_column('summaries', sa.Column('span_start_id', sa.String(length=36), nullable=True))
+    op.add_column('summaries', sa.Column('span_end_at', sa.DateTime(), nullable=True))
+    op.add_column('summaries', sa.Column('span_end_id', sa.String(length=36), nullable=True))
+    op.add_column('summaries', sa.Column('message_count', sa.Integer(), nullable=True))
+    op.add_column('summaries', sa.Column('token_count', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_summaries_parent', 'summaries', 'summaries', ['parent_id'], ['id'], ondelete='SET NULL')
+    op.create_index(
+        'ix_summaries_roots', 'summaries', ['conversation_id', 'level', 'span_start_at'],
+        unique=False, postgresql_where=sa.text('parent_id IS NULL'),
+    )
+    op.create_index('ix_summaries_parent', 'summaries', ['parent_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_summaries_parent', table_name='summaries')
+    op.drop_index('ix_summaries_roots', table_name='summaries')
+    op.drop_constraint('fk_summaries_parent', 'summaries', type_='foreignkey')
+    op.drop_column('summaries', 'token_count')
+    op.drop_column('summaries', 'message_count')
+    op.drop_column('summaries', 'span_end_id')
+    op.drop_column('summaries', 'span_end_at')
+    op.drop_column('summaries', 'span_start_id')
+    op.drop_column('summaries', 'span_start_at')
+    op.drop_column('summaries', 'parent_id')
+    op.drop_column('summaries', 'level')
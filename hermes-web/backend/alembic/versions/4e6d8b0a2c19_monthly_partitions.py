@@ -0,0 +1,107 @@
+"""monthly partitions for messages, tool_calls and summaries
+
+Revision ID: 4e6d8b0a2c19
+Revises: 3f1b7a9c5e26
+Create Date: 2025-10-02 10:41:27.305118
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e6d8b0a2c19'
+down_revision: Union[str, Sequence[str], None] = '3f1b7a9c5e26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONED_TABLES = ('messages', 'tool_calls', 'summaries')
+MONTHS_AHEAD = 3  # services.retention_service keeps creating future months after this
+
+# Indexes recreated on the partitioned parents (propagated to every partition)
+INDEXES = {
+    'messages': [
+        "CREATE INDEX ix_messages_id ON messages (id)",
+        "CREATE INDEX ix_messages_conversation_created ON messages (conversation_id, created_at, id)",
+    ],
+    'tool_calls': [
+        "CREATE INDEX ix_tool_calls_id ON tool_calls (id)",
+    ],
+    'summaries': [
+        "CREATE INDEX ix_summaries_id ON summaries (id)",
+        "CREATE INDEX ix_summaries_roots ON summaries (conversation_id, level, span_start_at) WHERE parent_id IS NULL",
+        "CREATE INDEX ix_summaries_parent ON summaries (parent_id)",
+    ],
+}
+FOREIGN_KEYS = {
+    'messages': "ALTER TABLE messages ADD CONSTRAINT messages_conversation_id_fkey "
+                "FOREIGN KEY (conversation_id) REFERENCES conversations (id) ON DELETE CASCADE",
+    'tool_calls': "ALTER TABLE tool_calls ADD CONSTRAINT tool_calls_conversation_id_fkey "
+                  "FOREIGN KEY (conversation_id) REFERENCES conversations (id)",
+    'summaries': "ALTER TABLE summaries ADD CONSTRAINT summaries_conversation_id_fkey "
+                 "FOREIGN KEY (conversation_id) REFERENCES conversations (id) ON DELETE CASCADE",
+}
+
+
+def _add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A foreign key into a partitioned table would need the partition key in the
+    # referenced unique constraint; tool_calls.message_id and summaries.parent_id
+    # become plain references (rows are archived month by month anyway).
+    op.drop_constraint('tool_calls_message_id_fkey', 'tool_calls', type_='foreignkey')
+    op.drop_constraint('fk_summaries_parent', 'summaries', type_='foreignkey')
+
+    bind = op.get_bind()
+    now = datetime.utcnow()
+    for table in PARTITIONED_TABLES:
+        op.execute(f"UPDATE {table} SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL")
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+        )
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL")
+        first = bind.execute(sa.text(f"SELECT min(created_at) FROM {table}_unpartitioned")).scalar() or now
+        month = datetime(first.year, first.month, 1)
+        last = _add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD)
+        while month <= last:
+            upper = _add_months(month, 1)
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            )
+            month = upper
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_unpartitioned")
+        op.execute(f"DROP TABLE {table}_unpartitioned")
+        # The partition key must be part of every unique constraint on a partitioned table
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)")
+        for ddl in INDEXES[table]:
+            op.execute(ddl)
+        op.execute(FOREIGN_KEYS[table])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Rows already moved to the archive (archive_manifest) are not restored
+    for table in PARTITIONED_TABLES:
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+        op.execute(f"CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS)")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at DROP NOT NULL")
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_partitioned")
+        op.execute(f"DROP TABLE {table}_partitioned CASCADE")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        for ddl in INDEXES[table]:
+            op.execute(ddl)
+        op.execute(FOREIGN_KEYS[table])
+    op.create_foreign_key('fk_summaries_parent', 'summaries', 'summaries', ['parent_id'], ['id'], ondelete='SET NULL')
+    op.create_foreign_key(
+        'tool_calls_message_id_fkey', 'tool_calls', 'messages', ['message_id'], ['id'], ondelete='CASCADE'
+    )
@@ -0,0 +1,50 @@
+"""archive manifest
+
+Revision ID: 5a9f3e7c1b82
+Revises: 4e6d8b0a2c19
+Create Date: 2025-10-02 11:06:52.940731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a9f3e7c1b82'
+down_revision: Union[str, Sequence[str], None] = '4e6d8b0a2c19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('archive_manifest',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('partition_name', sa.String(length=80), nullable=False),
+    sa.Column('range_start', sa.DateTime(), nullable=False),
+    sa.Column('range_end', sa.DateTime(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('conversation_ids', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('path', sa.Text(), nullable=False),
+    sa.Column('compression', sa.String(length=10), nullable=False),
+    sa.Column('bytes', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_archive_manifest_table_range', 'archive_manifest', ['table_name', 'range_start'], unique=False)
+    op.create_index(
+        'ix_archive_manifest_conversations', 'archive_manifest', ['conversation_ids'],
+        unique=False, postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_archive_manifest_conversations', table_name='archive_manifest')
+    op.drop_index('ix_archive_manifest_table_range', table_name='archive_manifest')
+    op.drop_table('archive_manifest')
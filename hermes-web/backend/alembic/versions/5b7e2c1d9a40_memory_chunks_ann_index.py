@@ -0,0 +1,44 @@
+"""memory chunks ann index
+
+Revision ID: 5b7e2c1d9a40
+Revises: 0a32c3868819
+Create Date: 2025-09-20 10:12:41.508213
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c1d9a40'
+down_revision: Union[str, Sequence[str], None] = '0a32c3868819'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 'hnsw' (pgvector >= 0.5.0, default) or 'ivfflat' (build after the table has data)
+ANN_INDEX_KIND = os.getenv("MEMORY_ANN_INDEX", "hnsw").lower()
+HNSW_M = int(os.getenv("MEMORY_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("MEMORY_HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_LISTS = int(os.getenv("MEMORY_IVFFLAT_LISTS", "100"))
+
+INDEX_NAME = 'ix_memory_chunks_embedding_ann'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if ANN_INDEX_KIND == "ivfflat":
+        using = f"ivfflat (embedding vector_cosine_ops) WITH (lists = {IVFFLAT_LISTS})"
+    else:
+        using = f"hnsw (embedding vector_cosine_ops) WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    # CONCURRENTLY cannot run inside a transaction block; avoids locking writes on large tables
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON memory_chunks USING {using};")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME};")
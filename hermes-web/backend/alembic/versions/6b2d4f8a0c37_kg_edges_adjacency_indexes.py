@@ -0,0 +1,42 @@
+"""kg edges adjacency indexes
+
+Revision ID: 6b2d4f8a0c37
+Revises: 5a9f3e7c1b82
+Create Date: 2025-10-06 10:14:27.305912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2d4f8a0c37'
+down_revision: Union[str, Sequence[str], None] = '5a9f3e7c1b82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Endpoint indexes carry (relationship_type, other endpoint) so a filtered expansion step
+    # in /kg/traverse is an index-only range scan
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_kg_edges_source', 'kg_edges', ['source_node_id', 'relationship_type', 'target_node_id'],
+            unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_kg_edges_target', 'kg_edges', ['target_node_id', 'relationship_type', 'source_node_id'],
+            unique=False, postgresql_concurrently=True,
+        )
+        op.create_index('ix_kg_edges_relationship_type', 'kg_edges', ['relationship_type'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_kg_edges_relationship_type', table_name='kg_edges', postgresql_concurrently=True)
+        op.drop_index('ix_kg_edges_target', table_name='kg_edges', postgresql_concurrently=True)
+        op.drop_index('ix_kg_edges_source', table_name='kg_edges', postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""memory chunks fulltext
+
+Revision ID: 8d41f6a2c3e5
+Revises: 5b7e2c1d9a40
+Create Date: 2025-09-22 14:37:05.219644
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41f6a2c3e5'
+down_revision: Union[str, Sequence[str], None] = '5b7e2c1d9a40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = 'ix_memory_chunks_content_tsv'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 'simple' config: no stemming/stopwords, safe for mixed-language and code content
+    op.execute(
+        "ALTER TABLE memory_chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED;"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON memory_chunks USING gin (content_tsv);")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME};")
+    op.execute("ALTER TABLE memory_chunks DROP COLUMN IF EXISTS content_tsv;")
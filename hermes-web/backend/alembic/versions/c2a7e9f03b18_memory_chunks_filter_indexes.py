@@ -0,0 +1,43 @@
+"""memory chunks filter indexes
+
+Revision ID: c2a7e9f03b18
+Revises: 8d41f6a2c3e5
+Create Date: 2025-09-24 11:05:52.731120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2a7e9f03b18'
+down_revision: Union[str, Sequence[str], None] = '8d41f6a2c3e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction block; avoids locking writes on large tables
+    with op.get_context().autocommit_block():
+        op.create_index('ix_memory_chunks_source', 'memory_chunks', ['source_type', 'source_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_memory_chunks_created_at', 'memory_chunks', ['created_at'], unique=False, postgresql_concurrently=True)
+        op.create_index(
+            'ix_memory_chunks_metadata', 'memory_chunks', ['metadata'], unique=False,
+            postgresql_using='gin', postgresql_ops={'metadata': 'jsonb_path_ops'}, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_memory_chunks_missing_embedding', 'memory_chunks', ['id'], unique=False,
+            postgresql_where=sa.text('embedding IS NULL'), postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_memory_chunks_missing_embedding', table_name='memory_chunks', postgresql_concurrently=True)
+        op.drop_index('ix_memory_chunks_metadata', table_name='memory_chunks', postgresql_concurrently=True)
+        op.drop_index('ix_memory_chunks_created_at', table_name='memory_chunks', postgresql_concurrently=True)
+        op.drop_index('ix_memory_chunks_source', table_name='memory_chunks', postgresql_concurrently=True)
@@ -0,0 +1,66 @@
+"""memory chunks content sha256
+
+Revision ID: e4b19d07a6c2
+Revises: c2a7e9f03b18
+Create Date: 2025-09-25 09:41:17.204385
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b19d07a6c2'
+down_revision: Union[str, Sequence[str], None] = 'c2a7e9f03b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('memory_chunks', sa.Column('content_sha256', sa.String(length=64), nullable=True))
+    # Backfill with the same digest services.memory_ingest_service.content_sha256() computes
+    op.execute("UPDATE memory_chunks SET content_sha256 = encode(sha256(convert_to(content, 'UTF8')), 'hex')")
+    # Collapse existing exact duplicates within a source scope (keep the earliest row,
+    # carrying over an embedding if only a later duplicate had one) so the unique index can build
+    op.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   first_value(id) OVER w AS keep_id,
+                   row_number() OVER w AS rn
+            FROM memory_chunks
+            WINDOW w AS (PARTITION BY source_type, source_id, content_sha256 ORDER BY created_at, id)
+        )
+        UPDATE memory_chunks m
+        SET embedding = d.embedding
+        FROM ranked r
+        JOIN memory_chunks d ON d.id = r.id
+        WHERE r.rn > 1 AND m.id = r.keep_id AND m.embedding IS NULL AND d.embedding IS NOT NULL
+    """)
+    op.execute("""
+        DELETE FROM memory_chunks m
+        USING (
+            SELECT id, row_number() OVER (
+                PARTITION BY source_type, source_id, content_sha256 ORDER BY created_at, id
+            ) AS rn
+            FROM memory_chunks
+        ) d
+        WHERE m.id = d.id AND d.rn > 1
+    """)
+    op.alter_column('memory_chunks', 'content_sha256', nullable=False)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_memory_chunks_source_content', 'memory_chunks', ['source_type', 'source_id', 'content_sha256'],
+            unique=True, postgresql_concurrently=True,
+        )
+        op.create_index('ix_memory_chunks_content_sha256', 'memory_chunks', ['content_sha256'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_memory_chunks_content_sha256', table_name='memory_chunks', postgresql_concurrently=True)
+        op.drop_index('uq_memory_chunks_source_content', table_name='memory_chunks', postgresql_concurrently=True)
+    op.drop_column('memory_chunks', 'content_sha256')
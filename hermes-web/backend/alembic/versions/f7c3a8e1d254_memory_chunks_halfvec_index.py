@@ -0,0 +1,56 @@
+"""memory chunks halfvec index
+
+Revision ID: f7c3a8e1d254
+Revises: e4b19d07a6c2
+Create Date: 2025-09-26 14:22:08.913562
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c3a8e1d254'
+down_revision: Union[str, Sequence[str], None] = 'e4b19d07a6c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# MEMORY_ANN_QUANTIZATION=halfvec (pgvector >= 0.7.0): replace the float32 ANN index with a half-precision
+# expression index (~half the size and write cost); PgVectorIndex re-ranks candidates against the
+# full-precision column. Exactly one ANN index exists either way; the app checks at startup that it
+# is the one MEMORY_ANN_QUANTIZATION searches (check_ann_index), so a migration run with a different
+# setting fails fast instead of scanning sequentially
+ANN_QUANTIZATION = os.getenv("MEMORY_ANN_QUANTIZATION", "none").lower()
+HNSW_M = int(os.getenv("MEMORY_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("MEMORY_HNSW_EF_CONSTRUCTION", "64"))
+EMBED_DIM = 1536
+
+INDEX_NAME = 'ix_memory_chunks_embedding_halfvec_ann'
+FULL_INDEX_NAME = 'ix_memory_chunks_embedding_ann'  # 5b7e2c1d9a40
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if ANN_QUANTIZATION != "halfvec":
+        return
+    # Expression must match PgVectorIndex._ann_order() exactly for the planner to use it
+    using = (
+        f"hnsw ((embedding::halfvec({EMBED_DIM})) halfvec_cosine_ops) "
+        f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON memory_chunks USING {using};")
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {FULL_INDEX_NAME};")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {FULL_INDEX_NAME} ON memory_chunks USING "
+            f"hnsw (embedding vector_cosine_ops) WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});"
+        )
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME};")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Async DB load test - concurrent request throughput with a blocking Session vs an AsyncSession
+
+    DATABASE_URL=postgresql+psycopg://... python bench_async_db.py --requests 400 --concurrency 1,10,50 --query-ms 20
+
+Both apps expose the same `async def` handler doing one query that takes --query-ms on the server
+(pg_sleep) plus a primary-key lookup:
+  sync    Session from create_engine (the pre-port get_db): every query blocks the event loop,
+          so concurrent requests are served one at a time
+  async   AsyncSession from create_async_engine (get_async_db): the loop keeps serving other
+          requests while a query waits on Postgres
+Requests go through httpx's in-process ASGI transport, so the numbers isolate the server side.
+Pool size for both engines is max(concurrency) so pool waits don't mask the difference.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.database import _async_database_url
+
+QUERY = text("SELECT pg_sleep(:seconds), (SELECT count(*) FROM conversations WHERE id = :id)")
+
+
+def _sync_app(url: str, pool_size: int, seconds: float) -> FastAPI:
+    engine = create_engine(url, pool_size=pool_size, max_overflow=0)
+    factory = sessionmaker(bind=engine)
+    app = FastAPI()
+
+    def get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/probe")
+    async def probe(db: Session = Depends(get_db)):
+        return {"n": db.execute(QUERY, {"seconds": seconds, "id": "bench"}).all()[0][1]}
+
+    app.state.engine = engine
+    return app
+
+
+def _async_app(url: str, pool_size: int, seconds: float) -> FastAPI:
+    engine = create_async_engine(url, pool_size=pool_size, max_overflow=0)
+    factory = async_sessionmaker(engine)
+    app = FastAPI()
+
+    async def get_db():
+        async with factory() as db:
+            yield db
+
+    @app.get("/probe")
+    async def probe(db: AsyncSession = Depends(get_db)):
+        return {"n": (await db.execute(QUERY, {"seconds": seconds, "id": "bench"})).all()[0][1]}
+
+    app.state.engine = engine
+    return app
+
+
+async def _load(app: FastAPI, requests: int, concurrency: int):
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                r = await client.get("/probe")
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await client.get("/probe")  # warm the pool
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return requests / elapsed, statistics.median(latencies), latencies[int(0.95 * (len(latencies) - 1))]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", default="1,10,50", help="concurrency levels to sweep")
+    parser.add_argument("--query-ms", type=float, default=20.0, help="server-side query time (pg_sleep)")
+    args = parser.parse_args()
+    url = os.environ["DATABASE_URL"]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    pool_size = max(levels)
+    seconds = args.query_ms / 1000.0
+
+    apps = {
+        "sync": _sync_app(url, pool_size, seconds),
+        "async": _async_app(os.getenv("ASYNC_DATABASE_URL") or _async_database_url(url), pool_size, seconds),
+    }
+    print(f"requests={args.requests} query_ms={args.query_ms}")
+    print(f"{'engine':<7} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for concurrency in levels:
+        for name, app in apps.items():
+            rps, p50, p95 = await _load(app, args.requests, concurrency)
+            print(f"{name:<7} {concurrency:>5} {rps:>9.1f} {1000 * p50:>8.1f} {1000 * p95:>8.1f}")
+    apps["sync"].state.engine.dispose()
+    await apps["async"].state.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tool input validation benchmark - per-call overhead of compiled schema validators
+
+    python bench_tool_schema.py --calls 20000 --items 1,10,100
+
+Validators compared on the same tool schema (nested objects + arrays) and payloads with N array items:
+  legacy       the old _validate_input_against_schema: walks the schema dict each call, top level only
+  interpreted  full nested validation that re-walks the schema dict on every call
+  compiled     services.tool_schema_service.compile_schema, compiled once (what /tools/execute runs now)
+  jsonschema   Draft7Validator built once, if the jsonschema package is installed
+"""
+
+import argparse
+import time
+
+from services.tool_schema_service import TYPE_CHECKS, compile_schema
+
+SCHEMA = {
+    "type": "object",
+    "required": ["repo", "checks"],
+    "properties": {
+        "repo": {"type": "string", "minLength": 1},
+        "branch": {"type": "string"},
+        "depth": {"type": "integer", "minimum": 1, "maximum": 10},
+        "checks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["name", "args"],
+                "properties": {
+                    "name": {"enum": ["lint", "test", "build"]},
+                    "args": {"type": "array", "items": {"type": "string"}},
+                    "env": {"type": "object", "additionalProperties": {"type": "string"}},
+                },
+            },
+        },
+    },
+}
+
+
+def _payload(items: int) -> dict:
+    return {
+        "repo": "hermes",
+        "branch": "main",
+        "depth": 3,
+        "checks": [{"name": "test", "args": ["-q", f"tests/{i}"], "env": {"CI": "1"}} for i in range(items)],
+    }
+
+
+def _legacy(data: dict, schema: dict) -> None:
+    required = schema.get("required", [])
+    props = schema.get("properties", {})
+    for r in required:
+        if r not in data:
+            raise ValueError(f"Missing required field: {r}")
+    type_map = {"string": str, "number": (int, float), "object": dict, "array": list, "boolean": bool}
+    for key, spec in props.items():
+        if key in data and "type" in spec:
+            pytype = type_map.get(spec["type"])
+            if pytype and not isinstance(data[key], pytype):
+                raise ValueError(f"Field '{key}' expects type {spec['type']}")
+
+
+def _interpreted(data, schema: dict) -> None:
+    if "type" in schema and not TYPE_CHECKS[schema["type"]](data):
+        raise ValueError("type")
+    if "enum" in schema and data not in schema["enum"]:
+        raise ValueError("enum")
+    if isinstance(data, str) and len(data) < schema.get("minLength", 0):
+        raise ValueError("minLength")
+    if isinstance(data, int) and not (schema.get("minimum", data) <= data <= schema.get("maximum", data)):
+        raise ValueError("range")
+    if isinstance(data, dict):
+        for r in schema.get("required", []):
+            if r not in data:
+                raise ValueError(r)
+        props = schema.get("properties", {})
+        for key, sub in props.items():
+            if key in data:
+                _interpreted(data[key], sub)
+        extra = schema.get("additionalProperties")
+        if isinstance(extra, dict):
+            for key in data.keys() - props.keys():
+                _interpreted(data[key], extra)
+    if isinstance(data, list) and "items" in schema:
+        for item in data:
+            _interpreted(item, schema["items"])
+
+
+def _time(fn, data, calls: int) -> float:
+    for _ in range(min(calls, 1000)):
+        fn(data)
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn(data)
+    return (time.perf_counter() - started) / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--items", default="1,10,100", help="array sizes to sweep")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    compiled = compile_schema(SCHEMA)
+    compile_us = (time.perf_counter() - started) * 1e6
+    validators = {
+        "legacy": lambda d: _legacy(d, SCHEMA),
+        "interpreted": lambda d: _interpreted(d, SCHEMA),
+        "compiled": compiled,
+    }
+    try:
+        from jsonschema import Draft7Validator
+    except ImportError:
+        pass
+    else:
+        validators["jsonschema"] = Draft7Validator(SCHEMA).validate
+
+    print(f"calls={args.calls} compile_us={compile_us:.1f} (once per /tools/register)")
+    print(f"{'validator':<12} {'items':>6} {'us/call':>9} {'calls/s':>11}")
+    for items in (int(n) for n in args.items.split(",")):
+        data = _payload(items)
+        for name, fn in validators.items():
+            per_call = _time(fn, data, max(1, args.calls // max(1, items // 10)))
+            print(f"{name:<12} {items:>6} {per_call * 1e6:>9.2f} {1 / per_call:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Quantized vector search benchmark - recall@k and scan size vs exact float32 search
+
+    python bench_vector_quantization.py --rows 20000 --dim 1536 --queries 200 --k 10
+
+Modes:
+  float32          exact brute force (ground truth), 4 bytes/dim scanned
+  halfvec          float16 scan (what pgvector's halfvec index stores), 2 bytes/dim
+  int8             NumpyVectorIndex(quantization='int8'), 1 byte/dim + 4-byte scale
+Each quantized mode is reported without re-rank (rerank x1) and with exact
+float32 re-ranking of top_k * factor candidates.
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from services.vector_index import NumpyVectorIndex, VectorRecord
+
+
+def _dataset(rows: int, dim: int, queries: int, clusters: int, seed: int):
+    """Clustered data (embeddings are far from uniform); queries are perturbed data points."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, clusters, rows)] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    picks = rng.integers(0, rows, queries)
+    q = data[picks] + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32) / np.sqrt(dim)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return data, q
+
+
+def _topk(scores: np.ndarray, k: int) -> np.ndarray:
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _recall(truth: np.ndarray, got) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(t) & set(g)) / k for t, g in zip(truth.tolist(), got)]))
+
+
+def _halfvec(data: np.ndarray, q: np.ndarray, k: int, factor: int):
+    half = data.astype(np.float16)
+    started = time.perf_counter()
+    cand = _topk(q @ half.T.astype(np.float32), k * factor)
+    got = []
+    for i, rows in enumerate(cand):
+        exact = data[rows] @ q[i]
+        got.append(rows[np.argsort(-exact)[:k]].tolist())
+    return got, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--factors", default="1,2,4,8", help="re-rank factors to sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    factors = [int(f) for f in args.factors.split(",")]
+
+    data, q = _dataset(args.rows, args.dim, args.queries, args.clusters, args.seed)
+    started = time.perf_counter()
+    truth = _topk(q @ data.T, args.k)
+    exact_s = time.perf_counter() - started
+
+    print(f"rows={args.rows} dim={args.dim} queries={args.queries} k={args.k}")
+    print(f"{'mode':<10} {'rerank':>7} {'recall@k':>9} {'ms/query':>9} {'scan MB':>9} {'ratio':>6}")
+    full_mb = data.nbytes / 2**20
+
+    def report(mode, factor, recall, seconds, scan_mb):
+        print(f"{mode:<10} {('x' + str(factor)) if factor else '-':>7} {recall:>9.4f} "
+              f"{1000 * seconds / args.queries:>9.3f} {scan_mb:>9.1f} {scan_mb / full_mb:>6.2f}")
+
+    report("float32", None, 1.0, exact_s, full_mb)
+    for factor in factors:
+        got, seconds = _halfvec(data, q, args.k, factor)
+        report("halfvec", factor, _recall(truth, got), seconds, full_mb / 2)
+
+    with tempfile.TemporaryDirectory() as path:
+        index = NumpyVectorIndex(path, args.dim, quantization="int8")
+        index.upsert(
+            VectorRecord(id=str(i), source_type="bench", source_id="bench", content="", embedding=vec)
+            for i, vec in enumerate(data)
+        )
+        scan_mb = index.stats()["scan_bytes"] / 2**20
+        for factor in factors:
+            index.rerank_factor = factor
+            started = time.perf_counter()
+            hits = index.search_batch(q, top_k=args.k)
+            seconds = time.perf_counter() - started
+            report("int8", factor, _recall(truth, [[int(h.id) for h in row] for row in hits]), seconds, scan_mb)
+
+
+if __name__ == "__main__":
+    main()
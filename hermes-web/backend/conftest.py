@@ -0,0 +1,35 @@
+"""
+Shared test fixtures - in-memory SQLite stand-in for the Postgres schema
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_on_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def make_session_factory():
+    """make_session_factory(*models) -> sessionmaker over a fresh in-memory database with just those tables.
+
+    One shared connection (StaticPool) so sessions opened from worker threads see the same data.
+    """
+    engines = []
+
+    def make(*models):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        for model in models:
+            model.__table__.create(engine)
+        engines.append(engine)
+        return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    yield make
+    for engine in engines:
+        engine.dispose()
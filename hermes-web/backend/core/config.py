@@ -5,21 +5,14 @@ Core Configuration Module
 
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from passlib.context import CryptContext
 from fastapi.security import HTTPBearer
 
 # 加载环境变量
 load_dotenv()
 
-# 数据库配置
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable must be set")
-
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 数据库配置 (引擎与连接池在 core.database 中只创建一次，这里转出以兼容旧的导入路径)
+from core.database import DATABASE_URL, SessionLocal, engine, get_db
 
 # 安全配置
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -51,11 +44,3 @@ USE_LOCAL_SUMMARY = os.getenv("USE_LOCAL_SUMMARY", "true").lower() == "true"
 
 # 宪法治理配置
 CONSTITUTION_FORBIDDEN = set([s.strip() for s in os.getenv("CONSTITUTION_FORBIDDEN", "").split(",") if s.strip()])
-
-def get_db():
-    """数据库会话依赖"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
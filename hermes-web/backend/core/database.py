@@ -0,0 +1,103 @@
+"""
+Database Engine Module
+进程内共享的数据库引擎 - 同步 / 异步各一个连接池，池大小、溢出、回收、借出超时统一由环境变量配置
+"""
+
+import os
+from typing import Any, AsyncIterator, Dict, Iterator
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from core.pool import PoolMetrics, timed_pool
+
+# 加载环境变量
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    raise ValueError("DATABASE_URL environment variable must be set")
+
+
+def _async_database_url(url: str) -> str:
+    for prefix in ("postgresql+psycopg2://", "postgresql+psycopg://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_database_url(DATABASE_URL)
+
+# Applied to each of the two pools: a worker process holds at most 2 * (size + overflow) connections.
+# A checkout that waits DB_POOL_TIMEOUT seconds raises sqlalchemy.exc.TimeoutError (-> 503 in main.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def _pool_options() -> Dict[str, Any]:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+engine = create_engine(DATABASE_URL, poolclass=timed_pool(QueuePool, sync_pool_metrics), **_pool_options())
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for the memory / KG / workflow / tool-call handlers: DB waits yield the event loop
+# instead of blocking it. Sync services (curator, vector index, ingest, retention) run on the same
+# connection through AsyncSession.run_sync.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=timed_pool(AsyncAdaptedQueuePool, async_pool_metrics),
+    **_pool_options(),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if async_engine.dialect.driver == "asyncpg":
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _register_vector_codecs(dbapi_connection, connection_record):
+        # pgvector's SQLAlchemy type and our raw SQL bind vectors in text form ("[1,2,3]");
+        # asyncpg has no codec for the extension types unless told to pass text through
+        async def register(conn):
+            for type_name in ("vector", "halfvec"):
+                try:
+                    await conn.set_type_codec(type_name, encoder=str, decoder=str, format="text")
+                except ValueError:
+                    pass  # extension (or halfvec, pgvector < 0.7) not installed
+        dbapi_connection.run_async(register)
+
+
+def get_db() -> Iterator[Session]:
+    """数据库会话依赖"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_stats() -> Dict[str, Any]:
+    """/metrics 用：两个连接池的借出等待与占用情况"""
+    return {
+        "sync": sync_pool_metrics.snapshot(engine.pool),
+        "async": async_pool_metrics.snapshot(async_engine.pool),
+    }
@@ -0,0 +1,84 @@
+"""
+Connection Pool Instrumentation
+连接池统计 - 借出等待耗时、占用 / 溢出连接数、超时次数；池耗尽时借出在 pool_timeout 后失败
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Type
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+WAIT_SAMPLES = 1024  # recent checkout waits kept for percentiles
+
+
+class PoolMetrics:
+    """单个连接池的借出统计（占用数来自池本身）"""
+
+    def __init__(self, samples: int = WAIT_SAMPLES):
+        self._lock = threading.Lock()
+        self._waits: Deque[float] = deque(maxlen=samples)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._waits.append(seconds)
+
+    @staticmethod
+    def _percentile(ordered, q: float) -> float:
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self, pool: Pool) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            attempts = self.checkouts + self.timeouts
+            out: Dict[str, Any] = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_total / attempts * 1000, 3) if attempts else 0.0,
+                "wait_ms_p50": round(self._percentile(waits, 0.50) * 1000, 3),
+                "wait_ms_p95": round(self._percentile(waits, 0.95) * 1000, 3),
+                "wait_ms_max": round(self.wait_max * 1000, 3),
+            }
+        if isinstance(pool, QueuePool):
+            out.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "timeout_s": pool.timeout(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                # QueuePool counts overflow from -size; only connections beyond pool_size are overflow
+                "overflow": max(0, pool.overflow()),
+            })
+        return out
+
+
+def timed_pool(base: Type[QueuePool], metrics: PoolMetrics) -> Type[QueuePool]:
+    """QueuePool 子类：记录每次借出的等待时间（含排队）与超时；engine 重建池时沿用同一 metrics"""
+
+    class TimedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeoutError:
+                metrics.observe(time.perf_counter() - start, timed_out=True)
+                raise
+            metrics.observe(time.perf_counter() - start)
+            return conn
+
+    TimedPool.__name__ = TimedPool.__qualname__ = f"Timed{base.__name__}"
+    return TimedPool
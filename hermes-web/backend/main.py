@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
@@ -10,20 +10,44 @@ from passlib.context import CryptContext
 import os
 from dotenv import load_dotenv
 from logging_config import setup_logging, get_logger
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from exceptions import ZSCEException, handle_zsce_exception
 from uuid import uuid4
 from models import Conversation, Message, ToolCall, MemoryChunk
 from models import Summary  # curator writes here
+from models import ArchiveManifest
 from models import User as ORMUser
 import hashlib
+import asyncio
+import json
 import math
+import time
 import subprocess
 import signal
+import shlex
+import re
+from services.vector_index import SearchFilters, VectorIndex, VectorRecord, check_ann_index, check_vector_config, get_vector_index
+from services.embedding_service import embedding_service, encode_embeddings_frame, FRAME_DTYPES
+from services.reindex_service import reindex_service
+from services.curator_service import curator_service, record_message, unsummarized_counts
+from services.summary_tree_service import summary_tree_service
+from services.tokenizer_service import tokenizer_service
+from services.memory_ingest_service import content_sha256, find_shared_embeddings, upsert_chunks
+from services.write_buffer_service import insert_transcript, write_buffer_service
+from services.retention_service import PARTITIONED_TABLES, read_archive, retention_service
+from services.kg_service import DIRECTIONS as KG_DIRECTIONS, traverse as kg_traverse
+from services.orchestration_service import PlanError, dag_executor, normalize_plan
+from services.tool_metrics_service import tool_metrics_service
+from services.tool_cache_service import tool_cache_service
+from services.tool_executor_service import ToolTimeoutError, registered_tool_stub, tool_executor
+from services.tool_schema_service import SchemaError, ValidationError, compile_schema
 
 # --- DB wiring ---
-from sqlalchemy import create_engine, text, func
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import text, func, and_, or_, select
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import sqlalchemy as sa
 from models import Project, Workflow
 
@@ -48,19 +72,8 @@ from training_module import training_module, FeedbackType
 # 加载环境变量
 load_dotenv()
 
-# SQLAlchemy engine/session
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable must be set")
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# SQLAlchemy engines/sessions: one shared sync + async pool per process (core.database)
+from core.database import AsyncSessionLocal, SessionLocal, get_async_db, get_db, pool_stats
 
 # 设置日志
 setup_logging(
@@ -109,6 +122,16 @@ async def zsce_exception_handler(request, exc: ZSCEException):
     })
     return handle_zsce_exception(exc)
 
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request, exc: PoolTimeoutError):
+    # Pool saturated for DB_POOL_TIMEOUT seconds: shed load instead of queueing behind it
+    logger.warning(f"DB pool exhausted: {request.method} {request.url.path}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database connection pool exhausted, retry later"},
+        headers={"Retry-After": "1"},
+    )
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc: Exception):
     logger.error(f"Unhandled Exception: {str(exc)}", exc_info=True, extra={
@@ -209,9 +232,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = PyJWT.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         payload = PyJWT.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
@@ -225,7 +248,7 @@ def get_current_user(
         # 先查内存用户；若没有则回退查数据库
         user = next((u for u in users_db if u["username"] == username), None)
         if user is None:
-            orm_user = db.query(ORMUser).filter(ORMUser.username == username).first()
+            orm_user = (await db.scalars(select(ORMUser).where(ORMUser.username == username))).first()
             if orm_user is None:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -321,7 +344,17 @@ async def metrics():
             "users": len(users_db),
             "projects": len(projects_db),
             "workflows": len(workflows_db),
-            "active_workflows": len([w for w in workflows_db if w.get("status") == "running"])
+            "active_workflows": len([w for w in workflows_db if w.get("status") == "running"]),
+            "embedding_cache": embedding_service.stats(),
+            "curator": curator_service.stats(),
+            "tokenizer": tokenizer_service.stats(),
+            "write_buffer": write_buffer_service.stats(),
+            "retention": retention_service.stats(),
+            "db_pool": pool_stats(),
+            "orchestration": dag_executor.stats(),
+            "tools": tool_metrics_service.snapshot(),
+            "tool_cache": tool_cache_service.stats(),
+            "tool_executor": tool_executor.stats(),
         }
         logger.debug("Metrics collected successfully")
         return metrics_data
@@ -337,6 +370,8 @@ async def db_ping(db: Session = Depends(get_db)):
         res = db.execute(text("SELECT version()"))
         row = res.fetchone()
         return {"ok": True, "version": row[0] if row else None}
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -489,9 +524,11 @@ async def get_project_api(project_id: int, current_user: dict = Depends(get_curr
     }
 
 @app.get("/workflows", response_model=List[WorkflowDetailOut])
-async def list_workflows_api(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    user_projects = db.query(Project.id).filter(Project.owner_id == current_user["id"]).subquery()
-    rows = db.query(Workflow).filter(Workflow.project_id.in_(user_projects)).order_by(Workflow.start_time.desc()).all()
+async def list_workflows_api(current_user: dict = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    user_projects = select(Project.id).where(Project.owner_id == current_user["id"])
+    rows = (await db.scalars(
+        select(Workflow).where(Workflow.project_id.in_(user_projects)).order_by(Workflow.start_time.desc())
+    )).all()
     return [
         WorkflowDetailOut(
             id=r.id,
@@ -511,9 +548,11 @@ async def list_workflows_api(current_user: dict = Depends(get_current_user), db:
 async def start_workflow_api(
     body: WorkflowStartRequest,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    project = db.query(Project).filter(Project.id == body.project_id, Project.owner_id == current_user["id"]).first()
+    project = (await db.scalars(
+        select(Project).where(Project.id == body.project_id, Project.owner_id == current_user["id"])
+    )).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -529,8 +568,8 @@ async def start_workflow_api(
             creator_id=current_user["id"],
         )
         db.add(wf)
-        db.commit()
-        db.refresh(wf)
+        await db.commit()
+        await db.refresh(wf)
         return WorkflowDetailOut(
             id=wf.id,
             project_id=wf.project_id,
@@ -557,12 +596,14 @@ async def start_workflow_api(
         )
 
 @app.get("/workflows/{workflow_id}", response_model=WorkflowDetailOut)
-async def get_workflow_api(workflow_id: str, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_workflow_api(workflow_id: str, current_user: dict = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     # Ensure workflow belongs to user's project
-    wf = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+    wf = await db.get(Workflow, workflow_id)
     if not wf:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    proj = db.query(Project).filter(Project.id == wf.project_id, Project.owner_id == current_user["id"]).first()
+    proj = (await db.scalars(
+        select(Project).where(Project.id == wf.project_id, Project.owner_id == current_user["id"])
+    )).first()
     if not proj:
         raise HTTPException(status_code=403, detail="Forbidden")
     return WorkflowDetailOut(
@@ -592,9 +633,11 @@ class ConversationOut(BaseModel):
     purpose: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
+    message_count: int = 0
+    token_total: int = 0
 
 @app.post("/memory/conversations", response_model=ConversationOut)
-async def create_conversation(payload: ConversationCreate, db: Session = Depends(get_db)):
+async def create_conversation(payload: ConversationCreate, db: AsyncSession = Depends(get_async_db)):
     conv = Conversation(
         id=str(uuid4()),
         user_id=payload.user_id,
@@ -602,10 +645,12 @@ async def create_conversation(payload: ConversationCreate, db: Session = Depends
         purpose=payload.purpose,
         created_at=datetime.utcnow(),
         updated_at=None,
+        message_count=0,
+        token_total=0,
     )
     db.add(conv)
-    db.commit()
-    db.refresh(conv)
+    await db.commit()
+    await db.refresh(conv)
     return ConversationOut(
         id=conv.id,
         user_id=conv.user_id,
@@ -613,11 +658,13 @@ async def create_conversation(payload: ConversationCreate, db: Session = Depends
         purpose=conv.purpose,
         created_at=conv.created_at,
         updated_at=conv.updated_at,
+        message_count=conv.message_count or 0,
+        token_total=conv.token_total or 0,
     )
 
 @app.get("/memory/conversations/{conversation_id}", response_model=ConversationOut)
-async def get_conversation(conversation_id: str, db: Session = Depends(get_db)):
-    conv = db.get(Conversation, conversation_id)
+async def get_conversation(conversation_id: str, db: AsyncSession = Depends(get_async_db)):
+    conv = await db.get(Conversation, conversation_id)
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return ConversationOut(
@@ -627,6 +674,8 @@ async def get_conversation(conversation_id: str, db: Session = Depends(get_db)):
         purpose=conv.purpose,
         created_at=conv.created_at,
         updated_at=conv.updated_at,
+        message_count=conv.message_count or 0,
+        token_total=conv.token_total or 0,
     )
 
 class MessageCreate(BaseModel):
@@ -645,52 +694,49 @@ class MessageOut(BaseModel):
     token_count: Optional[int] = None
     created_at: datetime
 
+def _message_row(payload: MessageCreate, now: datetime, token_count: Optional[int] = None) -> Dict[str, Any]:
+    return {
+        "id": str(uuid4()),
+        "conversation_id": payload.conversation_id,
+        "sender": payload.sender,
+        "content": payload.content,
+        "role": payload.role,
+        "token_count": payload.token_count if payload.token_count is not None else (
+            token_count if token_count is not None else estimate_tokens(payload.content)
+        ),
+        "created_at": now,
+    }
+
+async def _buffered_write(messages: List[Dict[str, Any]], tool_calls: List[Dict[str, Any]]) -> bool:
+    """Hand rows to the write-behind buffer; returns True when acknowledged before the flush committed."""
+    future, acked = write_buffer_service.submit_with_ack(messages, tool_calls)
+    if acked:
+        return True  # WRITE_BUFFER_ACK=buffer; past WRITE_BUFFER_MAX_QUEUE_ROWS the caller waits like 'flush'
+    try:
+        await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Buffered write failed: {e.__class__.__name__}")
+    return False
+
 @app.post("/memory/messages", response_model=MessageOut)
-async def create_message(payload: MessageCreate, db: Session = Depends(get_db)):
+async def create_message(payload: MessageCreate, db: AsyncSession = Depends(get_async_db)):
     # STUB: Consider validating sender enum and conversation existence with FK
-    msg = Message(
-        id=str(uuid4()),
-        conversation_id=payload.conversation_id,
-        sender=payload.sender,
-        content=payload.content,
-        role=payload.role,
-        token_count=payload.token_count,
-        created_at=datetime.utcnow(),
-    )
+    row = _message_row(payload, datetime.utcnow())
+    if write_buffer_service.enabled:
+        # Coalesced with concurrent writes; counters and auto-curation run in the flush
+        await _buffered_write([row], [])
+        return MessageOut(**row)
+    now = row["created_at"]
+    msg = Message(**row)
     db.add(msg)
-    db.commit()
-    db.refresh(msg)
+    # Running counters bumped in the same transaction: O(1) regardless of history length
+    conv = await db.run_sync(record_message, payload.conversation_id, msg.token_count, now) if payload.conversation_id else None
+    await db.commit()
 
-    # Optional auto-curation to prevent context rot
-    if AUTO_CURATE and payload.conversation_id:
-        try:
-            # Fire-and-forget best-effort summarize (synchronous here; later move async)
-            rows: List[Message] = (
-                db.query(Message)
-                .filter(Message.conversation_id == payload.conversation_id)
-                .order_by(Message.created_at.asc())
-                .all()
-            )
-            total_messages = len(rows)
-            total_tokens = sum(estimate_tokens(r.content or "") for r in rows)
-            if total_messages > CONTEXT_BUDGET_MESSAGES or total_tokens > CONTEXT_BUDGET_TOKENS:
-                cutoff_idx = max(0, int(total_messages * 0.6))  # HARDCODED
-                to_summarize = rows[:cutoff_idx]
-                target_tokens = max(256, int(CONTEXT_BUDGET_TOKENS * 0.1))
-                summary_text = summarize_messages(to_summarize, target_tokens)
-                summ = Summary(
-                    id=str(uuid4()),
-                    conversation_id=payload.conversation_id,
-                    summary=summary_text,
-                    period="on_event",
-                    generated_by="curator_v1",  # HARDCODED
-                    created_at=datetime.utcnow(),
-                )
-                db.add(summ)
-                db.commit()
-        except Exception as _:
-            # STUB: swallow errors for now; add logging/metrics later
-            pass
+    # Optional auto-curation to prevent context rot; the delta since the watermark is
+    # summarized by the background curator, never inside this request
+    if AUTO_CURATE and conv is not None and curator_service.over_budget(conv):
+        curator_service.enqueue(conv.id)
 
     return MessageOut(
         id=msg.id,
@@ -702,32 +748,125 @@ async def create_message(payload: MessageCreate, db: Session = Depends(get_db)):
         created_at=msg.created_at,
     )
 
+# Keyset pagination over ix_messages_conversation_created (conversation_id, created_at, id)
+MESSAGES_PAGE_MAX = int(os.getenv("MESSAGES_PAGE_MAX", "1000"))
+MESSAGES_STREAM_BATCH = int(os.getenv("MESSAGES_STREAM_BATCH", "500"))
+
+def _message_out(r: Message) -> MessageOut:
+    return MessageOut(
+        id=r.id,
+        conversation_id=r.conversation_id,
+        sender=r.sender,
+        content=r.content,
+        role=r.role,
+        token_count=r.token_count,
+        created_at=r.created_at,
+    )
+
+def _message_cursor(db: Session, conversation_id: str, after: Optional[str]):
+    """Resolve an `after` message id to its (created_at, id) keyset position."""
+    if not after:
+        return None
+    cursor = (
+        db.query(Message.created_at, Message.id)
+        .filter(Message.id == after, Message.conversation_id == conversation_id)
+        .first()
+    )
+    if cursor is None:
+        raise HTTPException(status_code=400, detail="Unknown cursor: 'after' must be a message id in this conversation")
+    return cursor
+
+def _messages_after(db: Session, conversation_id: str, cursor, limit: Optional[int]) -> List[Message]:
+    q = db.query(Message).filter(Message.conversation_id == conversation_id)
+    if cursor is not None:
+        q = q.filter(or_(
+            Message.created_at > cursor.created_at,
+            and_(Message.created_at == cursor.created_at, Message.id > cursor.id),
+        ))
+    q = q.order_by(Message.created_at.asc(), Message.id.asc())
+    return q.limit(limit).all() if limit else q.all()
+
 @app.get("/memory/conversations/{conversation_id}/messages", response_model=List[MessageOut])
-async def list_messages(conversation_id: str, db: Session = Depends(get_db)):
-    rows = db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.created_at.asc()).all()
-    return [
-        MessageOut(
-            id=r.id,
-            conversation_id=r.conversation_id,
-            sender=r.sender,
-            content=r.content,
-            role=r.role,
-            token_count=r.token_count,
-            created_at=r.created_at,
-        )
-        for r in rows
-    ]
+async def list_messages(
+    conversation_id: str,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Messages oldest first. With `limit`, a full page sets X-Next-After to pass back as `after`."""
+    if limit is not None and not 1 <= limit <= MESSAGES_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MESSAGES_PAGE_MAX}")
+    rows = await db.run_sync(lambda s: _messages_after(s, conversation_id, _message_cursor(s, conversation_id, after), limit))
+    if limit and len(rows) == limit:
+        response.headers["X-Next-After"] = rows[-1].id
+    return [_message_out(r) for r in rows]
+
+@app.get("/memory/conversations/{conversation_id}/messages/stream")
+async def stream_messages(conversation_id: str, after: Optional[str] = None):
+    """NDJSON stream of the whole history (one message per line), fetched in keyset batches
+    so memory stays bounded by MESSAGES_STREAM_BATCH regardless of conversation length."""
+    # Short sessions only: the stream is paced by the client, so a session (and its pooled
+    # connection) is held just long enough to read one batch, never across a yield
+    async with AsyncSessionLocal() as db:
+        cursor = await db.run_sync(_message_cursor, conversation_id, after)
+
+    async def generate():
+        nonlocal cursor
+        while True:
+            async with AsyncSessionLocal() as db:
+                rows = await db.run_sync(_messages_after, conversation_id, cursor, MESSAGES_STREAM_BATCH)
+                chunk = "".join(_message_out(r).model_dump_json() + "\n" for r in rows)
+            if not rows:
+                break
+            yield chunk
+            if len(rows) < MESSAGES_STREAM_BATCH:
+                break
+            cursor = rows[-1]  # detached, but created_at/id stay loaded (expire_on_commit=False)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 @app.get("/memory/conversations/{conversation_id}/summaries", response_model=List[str])
-async def list_summaries(conversation_id: str, db: Session = Depends(get_db)):
-    rows = (
-        db.query(Summary)
-        .filter(Summary.conversation_id == conversation_id)
+async def list_summaries(conversation_id: str, db: AsyncSession = Depends(get_async_db)):
+    rows = (await db.scalars(
+        select(Summary)
+        .where(Summary.conversation_id == conversation_id)
         .order_by(Summary.created_at.asc())
-        .all()
-    )
+    )).all()
     return [r.summary for r in rows]
 
+class SummaryNodeOut(BaseModel):
+    id: str
+    level: int
+    summary: str
+    message_count: int
+    token_count: int
+    span_start_at: datetime
+    span_end_at: datetime
+
+@app.get("/memory/conversations/{conversation_id}/summaries/cover", response_model=List[SummaryNodeOut])
+async def summary_cover(
+    conversation_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Fewest summary-tree nodes covering messages in [start, end), oldest first (no bounds: the tree roots)."""
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return [
+        SummaryNodeOut(
+            id=n.id,
+            level=n.level,
+            summary=n.summary,
+            message_count=n.message_count or 0,
+            token_count=n.token_count or 0,
+            span_start_at=n.span_start_at,
+            span_end_at=n.span_end_at,
+        )
+        for n in await db.run_sync(summary_tree_service.cover, conversation_id, start, end)
+    ]
+
 class ToolCallCreate(BaseModel):
     conversation_id: Optional[str] = None
     message_id: Optional[str] = None
@@ -750,23 +889,29 @@ class ToolCallOut(BaseModel):
     status: str
     created_at: datetime
 
+def _tool_call_row(payload: ToolCallCreate, now: datetime, message_id: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": str(uuid4()),
+        "conversation_id": payload.conversation_id,
+        "message_id": message_id or payload.message_id,
+        "step_number": payload.step_number,
+        "tool_name": payload.tool_name,
+        "input": payload.input,
+        "output": payload.output,
+        "latency_ms": payload.latency_ms,
+        "status": payload.status,
+        "created_at": now,
+    }
+
 @app.post("/memory/tool-calls", response_model=ToolCallOut)
-async def create_tool_call(payload: ToolCallCreate, db: Session = Depends(get_db)):
-    tc = ToolCall(
-        id=str(uuid4()),
-        conversation_id=payload.conversation_id,
-        message_id=payload.message_id,
-        step_number=payload.step_number,
-        tool_name=payload.tool_name,
-        input=payload.input,
-        output=payload.output,
-        latency_ms=payload.latency_ms,
-        status=payload.status,
-        created_at=datetime.utcnow(),
-    )
+async def create_tool_call(payload: ToolCallCreate, db: AsyncSession = Depends(get_async_db)):
+    row = _tool_call_row(payload, datetime.utcnow())
+    if write_buffer_service.enabled:
+        await _buffered_write([], [row])
+        return ToolCallOut(**row)
+    tc = ToolCall(**row)
     db.add(tc)
-    db.commit()
-    db.refresh(tc)
+    await db.commit()
     return ToolCallOut(
         id=tc.id,
         conversation_id=tc.conversation_id,
@@ -780,6 +925,85 @@ async def create_tool_call(payload: ToolCallCreate, db: Session = Depends(get_db
         created_at=tc.created_at,
     )
 
+# ---- Batched transcript writes ----
+# Multi-row INSERTs + one counter UPDATE per conversation (services.write_buffer_service).
+# With WRITE_BUFFER_ENABLED the single-row endpoints above are coalesced the same way.
+TRANSCRIPT_BATCH_MAX = int(os.getenv("TRANSCRIPT_BATCH_MAX", "1000"))  # rows per request
+WRITE_BUFFER_ENABLED = os.getenv("WRITE_BUFFER_ENABLED", "false").lower() == "true"
+WRITE_BUFFER_FLUSH_MS = int(os.getenv("WRITE_BUFFER_FLUSH_MS", "5"))
+WRITE_BUFFER_MAX_ROWS = int(os.getenv("WRITE_BUFFER_MAX_ROWS", "500"))
+WRITE_BUFFER_ACK = os.getenv("WRITE_BUFFER_ACK", "flush").lower()  # 'flush' | 'buffer'
+WRITE_BUFFER_MAX_QUEUE_ROWS = int(os.getenv("WRITE_BUFFER_MAX_QUEUE_ROWS", "10000"))  # 0 = unbounded
+
+class TranscriptToolCallCreate(ToolCallCreate):
+    message_index: Optional[int] = None  # position in the same request's `messages`; overrides message_id
+
+class TranscriptBatchRequest(BaseModel):
+    messages: List[MessageCreate] = []
+    tool_calls: List[TranscriptToolCallCreate] = []
+
+class TranscriptBatchResponse(BaseModel):
+    messages: List[MessageOut]
+    tool_calls: List[ToolCallOut]
+    buffered: bool  # acknowledged before commit (WRITE_BUFFER_ACK=buffer); rows may still be lost on flush failure
+
+def _curate_after_write(db: Session, conversation_ids: List[str]) -> None:
+    if not AUTO_CURATE:
+        return
+    for conv in db.query(Conversation).filter(Conversation.id.in_(conversation_ids)):
+        if curator_service.over_budget(conv):
+            curator_service.enqueue(conv.id)
+
+write_buffer_service.configure(
+    SessionLocal,
+    WRITE_BUFFER_ENABLED,
+    flush_ms=WRITE_BUFFER_FLUSH_MS,
+    max_rows=WRITE_BUFFER_MAX_ROWS,
+    ack=WRITE_BUFFER_ACK,
+    on_flush=_curate_after_write,
+    max_queue_rows=WRITE_BUFFER_MAX_QUEUE_ROWS,
+)
+
+@app.on_event("shutdown")
+def _drain_write_buffer():
+    write_buffer_service.drain(timeout=5.0)
+
+@app.post("/memory/transcript/batch", response_model=TranscriptBatchResponse)
+async def create_transcript_batch(payload: TranscriptBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """Write many messages and tool calls in one transaction (or one buffered flush), in request order."""
+    if len(payload.messages) + len(payload.tool_calls) > TRANSCRIPT_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {TRANSCRIPT_BATCH_MAX} rows per batch")
+    now = datetime.utcnow()
+    missing = [m.content for m in payload.messages if m.token_count is None]
+    counted = iter(tokenizer_service.count_many(missing))
+    messages = [
+        # Strictly increasing timestamps keep the batch's order in (created_at, id) keyset scans
+        _message_row(m, now + timedelta(microseconds=i), None if m.token_count is not None else next(counted))
+        for i, m in enumerate(payload.messages)
+    ]
+    tool_calls = []
+    for tc in payload.tool_calls:
+        message_id = None
+        if tc.message_index is not None:
+            if not 0 <= tc.message_index < len(messages):
+                raise HTTPException(status_code=400, detail=f"message_index {tc.message_index} out of range")
+            message_id = messages[tc.message_index]["id"]
+        tool_calls.append(_tool_call_row(tc, now, message_id))
+
+    if write_buffer_service.enabled:
+        buffered = await _buffered_write(messages, tool_calls)
+    else:
+        buffered = False
+        touched = await db.run_sync(insert_transcript, messages, tool_calls)
+        await db.commit()
+        if touched:
+            await db.run_sync(_curate_after_write, touched)
+    return TranscriptBatchResponse(
+        messages=[MessageOut(**m) for m in messages],
+        tool_calls=[ToolCallOut(**t) for t in tool_calls],
+        buffered=buffered,
+    )
+
 class MemoryChunkCreate(BaseModel):
     source_type: str  # HARDCODED: enum contract to be enforced by OpenAPI/validation later
     source_id: str
@@ -797,20 +1021,29 @@ class MemoryChunkOut(BaseModel):
     created_at: datetime
 
 @app.post("/memory/chunks", response_model=MemoryChunkOut)
-async def create_memory_chunk(payload: MemoryChunkCreate, db: Session = Depends(get_db)):
+async def create_memory_chunk(payload: MemoryChunkCreate, db: AsyncSession = Depends(get_async_db)):
+    """Upsert on (source_type, source_id, content_sha256): re-posting identical content returns the stored chunk."""
     # STUB: Add embedding length validation (1536) when real embedder integrated
-    mc = MemoryChunk(
-        id=str(uuid4()),
-        source_type=payload.source_type,
-        source_id=payload.source_id,
-        content=payload.content,
-        embedding=payload.embedding,  # pgvector accepts list[float]
-        metadata_json=payload.metadata,
-        created_at=datetime.utcnow(),
-    )
-    db.add(mc)
-    db.commit()
-    db.refresh(mc)
+    digest = content_sha256(payload.content)
+    embedding = payload.embedding
+    if embedding is None:
+        # Identical content elsewhere already embedded -> share it instead of leaving this row empty
+        embedding = (await db.run_sync(find_shared_embeddings, [digest])).get(digest)
+    row = {
+        "id": str(uuid4()),
+        "source_type": payload.source_type,
+        "source_id": payload.source_id,
+        "content": payload.content,
+        "content_sha256": digest,
+        "embedding": embedding,  # pgvector accepts list[float]
+        "metadata_json": payload.metadata,
+        "created_at": datetime.utcnow(),
+    }
+    ids, _, _ = await db.run_sync(upsert_chunks, [row])
+    await db.commit()
+    mc = await db.get(MemoryChunk, ids[0])
+    await db.refresh(mc)
+    await _index_chunks(db, [mc])
     return MemoryChunkOut(
         id=mc.id,
         source_type=mc.source_type,
@@ -821,9 +1054,140 @@ async def create_memory_chunk(payload: MemoryChunkCreate, db: Session = Depends(
         created_at=mc.created_at,
     )
 
+BULK_INGEST_MAX = int(os.getenv("BULK_INGEST_MAX", "50000"))
+
+class BulkChunkIngestResponse(BaseModel):
+    ids: List[str]  # same order as the submitted items; duplicates resolve to the stored chunk id
+    inserted: int
+    duplicates: int  # items matching an existing or earlier (source_type, source_id, content) in the payload
+    shared_embeddings: int  # embeddings reused from stored chunks with identical content
+    embedded: int
+    write_method: str  # 'copy' | 'insert'
+    elapsed_ms: float
+    chunks_per_second: float
+
+async def _read_bulk_items(request: Request) -> List[dict]:
+    """Accept NDJSON (one chunk per line), a JSON list, or {"chunks": [...]}."""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            return [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+        data = json.loads(body or b"[]")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON payload: {e}")
+    if isinstance(data, dict):
+        data = data.get("chunks")
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="Expected NDJSON, a JSON list, or {\"chunks\": [...]}")
+    return data
+
+@app.post("/memory/chunks/bulk", response_model=BulkChunkIngestResponse)
+async def bulk_create_memory_chunks(request: Request, embed: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Ingest many chunks in one transaction (COPY on Postgres, multi-row INSERT otherwise).
+
+    Chunks are content-addressed: duplicates upsert onto the existing row, and chunks without an
+    embedding reuse one from any stored chunk with identical content before falling back to embed.
+    """
+    started = time.perf_counter()
+    items = await _read_bulk_items(request)
+    if not items:
+        raise HTTPException(status_code=400, detail="No chunks provided")
+    if len(items) > BULK_INGEST_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_INGEST_MAX} chunks per request")
+
+    payloads: List[MemoryChunkCreate] = []
+    for i, item in enumerate(items):
+        try:
+            chunk = MemoryChunkCreate(**item)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid chunk at index {i}: {e}")
+        if chunk.embedding is not None and len(chunk.embedding) != EMBED_DIM:
+            raise HTTPException(status_code=400, detail=f"Chunk at index {i}: embedding must have {EMBED_DIM} dims")
+        payloads.append(chunk)
+
+    digests = [content_sha256(p.content) for p in payloads]
+    embeddings: List[Optional[List[float]]] = [p.embedding for p in payloads]
+    shared = await db.run_sync(find_shared_embeddings, [d for d, e in zip(digests, embeddings) if e is None])
+    shared_count = 0
+    for i, digest in enumerate(digests):
+        if embeddings[i] is None and digest in shared:
+            embeddings[i] = shared[digest]
+            shared_count += 1
+    missing = [i for i, e in enumerate(embeddings) if e is None]
+    embedded = 0
+    if embed and missing:
+        # Embed each distinct content once; repeats in the payload share the vector
+        first_by_digest: Dict[str, int] = {}
+        for i in missing:
+            first_by_digest.setdefault(digests[i], i)
+        todo = list(first_by_digest.values())
+        for start in range(0, len(todo), EMBED_BATCH_MAX):
+            part = todo[start:start + EMBED_BATCH_MAX]
+            # CPU-bound: run each part in the threadpool so the event loop keeps serving requests
+            vectors = await run_in_threadpool(embed_many, [payloads[i].content for i in part], EMBED_DIM)
+            for i, emb in zip(part, vectors):
+                shared[digests[i]] = emb
+        for i in missing:
+            embeddings[i] = shared[digests[i]]
+        embedded = len(todo)
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": str(uuid4()),
+            "source_type": p.source_type,
+            "source_id": p.source_id,
+            "content": p.content,
+            "content_sha256": digest,
+            "embedding": emb,
+            "metadata_json": p.metadata,
+            "created_at": now,
+        }
+        for p, digest, emb in zip(payloads, digests, embeddings)
+    ]
+    try:
+        ids, method, inserted = await db.run_sync(upsert_chunks, rows)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Bulk chunk ingest failed: {e}")
+        raise HTTPException(status_code=500, detail="Bulk ingest failed")
+
+    # Freshly inserted rows are mirrored from the payload; rows resolved onto existing chunks are
+    # re-read since the stored embedding wins over the submitted one
+    fresh = {r["id"]: r for r, chunk_id in zip(rows, ids) if r["id"] == chunk_id and r["embedding"] is not None}
+    await _with_vector_index(db, lambda index: index.upsert([
+        VectorRecord(
+            id=r["id"],
+            source_type=r["source_type"],
+            source_id=r["source_id"],
+            content=r["content"],
+            embedding=r["embedding"],
+            metadata=r["metadata_json"],
+            created_at=r["created_at"],
+        )
+        for r in fresh.values()
+    ]))
+    existing_ids = {chunk_id for r, chunk_id in zip(rows, ids) if r["id"] != chunk_id}
+    if existing_ids and VECTOR_INDEX_BACKEND != "pgvector":
+        existing = await db.run_sync(lambda s: s.query(MemoryChunk).filter(MemoryChunk.id.in_(existing_ids)).all())
+        await _index_chunks(db, existing)
+    elapsed = time.perf_counter() - started
+    return BulkChunkIngestResponse(
+        ids=ids,
+        inserted=inserted,
+        duplicates=len(rows) - inserted,
+        shared_embeddings=shared_count,
+        embedded=embedded,
+        write_method=method,
+        elapsed_ms=round(elapsed * 1000, 2),
+        chunks_per_second=round(len(rows) / elapsed, 1) if elapsed > 0 else 0.0,
+    )
+
 @app.get("/memory/chunks/{chunk_id}", response_model=MemoryChunkOut)
-async def get_memory_chunk(chunk_id: str, db: Session = Depends(get_db)):
-    mc = db.get(MemoryChunk, chunk_id)
+async def get_memory_chunk(chunk_id: str, db: AsyncSession = Depends(get_async_db)):
+    mc = await db.get(MemoryChunk, chunk_id)
     if not mc:
         raise HTTPException(status_code=404, detail="Memory chunk not found")
     return MemoryChunkOut(
@@ -836,10 +1200,26 @@ async def get_memory_chunk(chunk_id: str, db: Session = Depends(get_db)):
         created_at=mc.created_at,
     )
 
+# ANN tuning defaults (pgvector HNSW ef_search / IVFFlat probes); None keeps server defaults
+MEMORY_SEARCH_EF_SEARCH = int(os.getenv("MEMORY_SEARCH_EF_SEARCH", "0")) or None
+MEMORY_SEARCH_PROBES = int(os.getenv("MEMORY_SEARCH_PROBES", "0")) or None
+# pgvector >= 0.8 only: 'relaxed_order' keeps filtered HNSW/IVFFlat scans from returning < top_k rows
+MEMORY_SEARCH_ITERATIVE_SCAN = os.getenv("MEMORY_SEARCH_ITERATIVE_SCAN", "").lower() or None
+
 class VectorSearchRequest(BaseModel):
-    query_embedding: List[float]  # STUB: produced by future embedder
+    query_embedding: Optional[List[float]] = None  # STUB: produced by future embedder
     top_k: int = 5
     source_type: Optional[str] = None
+    ef_search: Optional[int] = None  # HNSW candidate list size; higher = better recall, slower
+    probes: Optional[int] = None  # IVFFlat lists scanned; higher = better recall, slower
+    mode: str = "vector"  # 'vector' | 'hybrid' (full-text + vector, reciprocal rank fusion)
+    query_text: Optional[str] = None  # required for hybrid; embedded locally if no query_embedding
+    rrf_k: int = 60  # RRF damping constant
+    candidates: Optional[int] = None  # per-retriever candidate pool for hybrid (default 4 * top_k)
+    source_id: Optional[str] = None
+    metadata: Optional[dict] = None  # JSONB containment filter, e.g. {"project": "hermes", "language": "python"}
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
 
 class VectorSearchHit(BaseModel):
     id: str
@@ -849,42 +1229,138 @@ class VectorSearchHit(BaseModel):
     score: float
 
 @app.post("/memory/chunks/search", response_model=List[VectorSearchHit])
-async def search_memory_chunks(req: VectorSearchRequest, db: Session = Depends(get_db)):
-    if not req.query_embedding:
+async def search_memory_chunks(req: VectorSearchRequest, db: AsyncSession = Depends(get_async_db)):
+    mode = (req.mode or "vector").lower()
+    if mode not in ("vector", "hybrid"):
+        raise HTTPException(status_code=400, detail="mode must be 'vector' or 'hybrid'")
+    if mode == "hybrid" and not (req.query_text or "").strip():
+        raise HTTPException(status_code=400, detail="query_text is required for hybrid search")
+    query_embedding = req.query_embedding
+    if not query_embedding and mode == "hybrid":
+        query_embedding = generate_embedding_stub(req.query_text, EMBED_DIM)
+    if not query_embedding:
         raise HTTPException(status_code=400, detail="query_embedding is required")
-    # STUB: optional filter by source_type
-    q = db.query(
-        MemoryChunk.id,
-        MemoryChunk.source_type,
-        MemoryChunk.source_id,
-        MemoryChunk.content,
-        (1 - func.cosine_distance(MemoryChunk.embedding, req.query_embedding)).label("score"),
+    if req.top_k < 1 or req.top_k > 1000:
+        raise HTTPException(status_code=400, detail="top_k must be between 1 and 1000")
+    ef_search = req.ef_search or MEMORY_SEARCH_EF_SEARCH
+    probes = req.probes or MEMORY_SEARCH_PROBES
+    if ef_search is not None and not (1 <= ef_search <= 1000):
+        raise HTTPException(status_code=400, detail="ef_search must be between 1 and 1000")
+    if probes is not None and not (1 <= probes <= 10000):
+        raise HTTPException(status_code=400, detail="probes must be between 1 and 10000")
+    if ef_search is not None and ef_search < req.top_k:
+        ef_search = req.top_k  # HNSW never returns more than ef_search rows
+
+    if req.candidates is not None and not (1 <= req.candidates <= 10000):
+        raise HTTPException(status_code=400, detail="candidates must be between 1 and 10000")
+
+    filters = SearchFilters(
+        source_type=req.source_type,
+        source_id=req.source_id,
+        metadata=req.metadata,
+        created_after=req.created_after,
+        created_before=req.created_before,
     )
-    if req.source_type:
-        q = q.filter(MemoryChunk.source_type == req.source_type)
-    rows = q.order_by(sa.desc("score")).limit(req.top_k).all()
+
+    def run(index: VectorIndex):
+        if mode == "hybrid":
+            return index.search_hybrid(
+                query_embedding,
+                req.query_text,
+                top_k=req.top_k,
+                filters=filters,
+                rrf_k=max(1, req.rrf_k),
+                candidates=req.candidates,
+                ef_search=ef_search,
+                probes=probes,
+                iterative_scan=MEMORY_SEARCH_ITERATIVE_SCAN,
+            )
+        return index.search(
+            query_embedding,
+            top_k=req.top_k,
+            filters=filters,
+            ef_search=ef_search,
+            probes=probes,
+            iterative_scan=MEMORY_SEARCH_ITERATIVE_SCAN,
+        )
+
+    try:
+        hits = await _with_vector_index(db, run)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return [
         VectorSearchHit(
-            id=r.id,
-            source_type=r.source_type,
-            source_id=r.source_id,
-            content=r.content,
-            score=float(r.score) if r.score is not None else 0.0,
+            id=h.id,
+            source_type=h.source_type,
+            source_id=h.source_id,
+            content=h.content,
+            score=h.score,
         )
-        for r in rows
+        for h in hits
     ]
 
 # ========================= Context Curator (anti-rot) =========================
 # HARDCODED: static budgets; later tune dynamically per convo/model
 CONTEXT_BUDGET_MESSAGES = int(os.getenv("CONTEXT_BUDGET_MESSAGES", "50"))
 CONTEXT_BUDGET_TOKENS = int(os.getenv("CONTEXT_BUDGET_TOKENS", "8000"))
+SUMMARY_LEAF_WINDOW = int(os.getenv("SUMMARY_LEAF_WINDOW", "32"))  # messages per leaf summary
+SUMMARY_FANOUT = int(os.getenv("SUMMARY_FANOUT", "4"))  # children merged into one parent
 AUTO_CURATE = os.getenv("AUTO_CURATE", "false").lower() == "true"
 
-# STUB: very rough token estimator (to be replaced with tiktoken or tokenizer)
+# Token counts via services.tokenizer_service (tiktoken | local BPE ranks | heuristic), cached by content hash
 def estimate_tokens(text: str) -> int:
     if not text:
         return 0
-    return max(1, int(len(text) / 4))  # ~4 chars per token heuristic
+    return tokenizer_service.count(text)
+
+TOKEN_COUNT_BATCH_MAX = int(os.getenv("TOKEN_COUNT_BATCH_MAX", "1000"))
+
+class TokenCountRequest(BaseModel):
+    texts: Optional[List[str]] = None
+    conversation_id: Optional[str] = None  # whole stored history
+
+class TokenCountResponse(BaseModel):
+    counts: List[int]  # per text; empty for conversation_id
+    total: int
+    messages: int = 0
+    recounted: int = 0  # stored messages lacking token_count that had to be tokenized
+    method: str
+
+@app.post("/tokens/count", response_model=TokenCountResponse)
+async def count_tokens(payload: TokenCountRequest, db: AsyncSession = Depends(get_async_db)):
+    """Batch token counting for ad-hoc texts or a whole conversation history."""
+    if (payload.texts is None) == (payload.conversation_id is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'texts' or 'conversation_id'")
+    if payload.texts is not None:
+        if len(payload.texts) > TOKEN_COUNT_BATCH_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {TOKEN_COUNT_BATCH_MAX} texts per request")
+        counts = tokenizer_service.count_many(payload.texts)
+        return TokenCountResponse(counts=counts, total=sum(counts), method=tokenizer_service.method)
+
+    # Stored token_count is authoritative; only legacy rows without one are tokenized.
+    # Keyset batches keep memory bounded for long histories.
+    total = messages = recounted = 0
+    cursor = None
+    while True:
+        rows = await db.run_sync(_messages_after, payload.conversation_id, cursor, MESSAGES_STREAM_BATCH)
+        if not rows:
+            break
+        missing = [r.content or "" for r in rows if r.token_count is None]
+        total += sum(r.token_count for r in rows if r.token_count is not None)
+        total += sum(tokenizer_service.count_many(missing))
+        messages += len(rows)
+        recounted += len(missing)
+        cursor = rows[-1]
+        db.expunge_all()
+    return TokenCountResponse(
+        counts=[],
+        total=total,
+        messages=messages,
+        recounted=recounted,
+        method=tokenizer_service.method,
+    )
 
 # STUB: simple extractive summarizer placeholder
 # Borrowable: later swap with mature libraries (sumy, gensim, transformers)
@@ -906,82 +1382,322 @@ def summarize_messages(messages: List[Message], target_tokens: int) -> str:
     header = "[Curator v1] Conversation summary (extractive, STUB)"
     return header + "\n" + "\n".join(parts)
 
+# STUB: summary-of-summaries for tree parents; round-robin over the children's extracted lines
+def merge_summaries(children: List[Summary], target_tokens: int) -> str:
+    lines = [(c.summary or "").splitlines()[1:] for c in children]
+    parts: List[str] = []
+    budget = target_tokens
+    for depth in range(max((len(l) for l in lines), default=0)):
+        for child_lines in lines:
+            if depth < len(child_lines) and budget > 0:
+                parts.append(child_lines[depth])
+                budget -= estimate_tokens(child_lines[depth])
+    if not parts:
+        return ""
+    header = "[Curator v2] Merged summary (extractive, STUB)"
+    return header + "\n" + "\n".join(parts)
+
 class CurateResponse(BaseModel):
     summarized: bool
-    created_summary_id: Optional[str] = None
-    total_messages: int
+    created_summary_id: Optional[str] = None  # newest tree node written by this run
+    created_summary_ids: List[str] = []  # leaves and merged parents, in creation order
+    total_messages: int  # unsummarized messages since the watermark, before this run
     total_tokens: int
     budget_messages: int
     budget_tokens: int
 
+summary_tree_service.configure(
+    summarize_messages,
+    merge_summaries,
+    leaf_window=SUMMARY_LEAF_WINDOW,
+    fanout=SUMMARY_FANOUT,
+    target_tokens=max(256, int(CONTEXT_BUDGET_TOKENS * 0.1)),  # HARDCODED
+)
+curator_service.configure(SessionLocal, CONTEXT_BUDGET_MESSAGES, CONTEXT_BUDGET_TOKENS)
+
 @app.post("/memory/conversations/{conversation_id}/curate", response_model=CurateResponse)
-async def curate_conversation(conversation_id: str, db: Session = Depends(get_db)):
-    # Load messages ordered by time
-    rows: List[Message] = (
-        db.query(Message)
-        .filter(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at.asc())
-        .all()
+async def curate_conversation(conversation_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Synchronous curation of the unsummarized delta (same policy as the background curator)."""
+    conv = await db.get(Conversation, conversation_id)
+    if not conv:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    pending = unsummarized_counts(conv)
+    created = await db.run_sync(curator_service.curate, conversation_id)
+    return CurateResponse(
+        summarized=bool(created),
+        created_summary_id=created[-1].id if created else None,
+        created_summary_ids=[s.id for s in created],
+        total_messages=pending["messages"],
+        total_tokens=pending["tokens"],
+        budget_messages=CONTEXT_BUDGET_MESSAGES,
+        budget_tokens=CONTEXT_BUDGET_TOKENS,
     )
-    total_messages = len(rows)
-    total_tokens = sum(estimate_tokens(r.content or "") for r in rows)
-
-    if total_messages <= CONTEXT_BUDGET_MESSAGES and total_tokens <= CONTEXT_BUDGET_TOKENS:
-        return CurateResponse(
-            summarized=False,
-            created_summary_id=None,
-            total_messages=total_messages,
-            total_tokens=total_tokens,
-            budget_messages=CONTEXT_BUDGET_MESSAGES,
-            budget_tokens=CONTEXT_BUDGET_TOKENS,
-        )
 
-    # Determine cut set to summarize
-    # HARDCODED: summarize oldest 60% of messages keeping the latest 40%
-    cutoff_idx = max(0, int(total_messages * 0.6))
-    to_summarize = rows[:cutoff_idx]
+# ---- Context window assembly ----
+CONTEXT_CHUNK_SHARE = float(os.getenv("CONTEXT_CHUNK_SHARE", "0.25"))  # budget reserved for memory chunks when top_k > 0
+CONTEXT_MESSAGE_PAGE = int(os.getenv("CONTEXT_MESSAGE_PAGE", "64"))  # newest-first rows read per query while filling the budget
 
-    target_tokens = max(256, int(CONTEXT_BUDGET_TOKENS * 0.1))  # HARDCODED
-    summary_text = summarize_messages(to_summarize, target_tokens)
+class ContextItem(BaseModel):
+    kind: str  # 'summary' | 'chunk' | 'message'
+    id: str
+    content: str
+    tokens: int
+    sender: Optional[str] = None
+    role: Optional[str] = None
+    score: Optional[float] = None
+    created_at: Optional[datetime] = None
 
-    summ = Summary(
-        id=str(uuid4()),
+class ContextResponse(BaseModel):
+    conversation_id: str
+    budget: int
+    used_tokens: int
+    items: List[ContextItem]  # summary-tree roots, then chunks, then messages; each oldest -> newest
+    omitted_messages: int  # unsummarized messages that did not fit
+    method: str
+
+def _newest_messages_within(db: Session, conv: Conversation, budget: int, after_watermark: bool) -> List[tuple]:
+    """(row, tokens) for the newest messages whose sizes sum to at most `budget`, oldest -> newest.
+    Pages of CONTEXT_MESSAGE_PAGE newest-first rows over ix_messages_conversation_created, so only
+    about budget / average message size rows are read; rows without a stored token_count are tokenized."""
+    q = select(
+        Message.id,
+        Message.sender,
+        Message.role,
+        Message.content,
+        Message.token_count,
+        Message.created_at,
+    ).where(Message.conversation_id == conv.id)
+    if after_watermark and conv.summary_watermark_at is not None:
+        q = q.where(or_(
+            Message.created_at > conv.summary_watermark_at,
+            and_(Message.created_at == conv.summary_watermark_at, Message.id > conv.summary_watermark_id),
+        ))
+    q = q.order_by(Message.created_at.desc(), Message.id.desc()).limit(CONTEXT_MESSAGE_PAGE)
+    picked: List[tuple] = []
+    used = 0
+    cursor = None
+    while True:
+        page_q = q if cursor is None else q.where(or_(
+            Message.created_at < cursor.created_at,
+            and_(Message.created_at == cursor.created_at, Message.id < cursor.id),
+        ))
+        rows = db.execute(page_q).all()
+        counted = iter(tokenizer_service.count_many([r.content or "" for r in rows if r.token_count is None]))
+        for r in rows:
+            tokens = r.token_count if r.token_count is not None else next(counted)
+            if used + tokens > budget:
+                return picked[::-1]
+            picked.append((r, tokens))
+            used += tokens
+        if len(rows) < CONTEXT_MESSAGE_PAGE:
+            return picked[::-1]
+        cursor = rows[-1]
+
+@app.get("/memory/conversations/{conversation_id}/context", response_model=ContextResponse)
+async def assemble_context(
+    conversation_id: str,
+    budget: int,
+    top_k: int = 0,
+    query: Optional[str] = None,
+    include_summary: bool = True,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Pack the summary-tree roots (newest first while they fit), optional top-k memory chunks and the newest
+    messages into `budget` tokens. Message sizes come from the stored token_count (tokenized when missing);
+    chunks are retrieved for `query` (default: newest message)."""
+    if budget < 1:
+        raise HTTPException(status_code=400, detail="budget must be positive")
+    if not 0 <= top_k <= 100:
+        raise HTTPException(status_code=400, detail="top_k must be between 0 and 100")
+    conv = await db.get(Conversation, conversation_id)
+    if not conv:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    remaining = budget
+    items_summary: List[ContextItem] = []
+    if include_summary:
+        # The roots cover everything up to the watermark in O(fanout * log n) nodes
+        for node in reversed(await db.run_sync(summary_tree_service.roots, conversation_id)):
+            tokens = node.token_count if node.token_count is not None else estimate_tokens(node.summary)
+            if tokens > remaining:
+                break
+            items_summary.insert(0, ContextItem(kind="summary", id=node.id, content=node.summary, tokens=tokens, created_at=node.span_end_at))
+            remaining -= tokens
+
+    chunk_reserve = int(remaining * CONTEXT_CHUNK_SHARE) if top_k else 0
+    # Summarized history is represented by the roots, so messages start after the watermark
+    messages = await db.run_sync(_newest_messages_within, conv, remaining - chunk_reserve, bool(items_summary))
+    remaining -= sum(tokens for _, tokens in messages)
+
+    items_chunks: List[ContextItem] = []
+    if top_k:
+        query_text = query or (messages[-1][0].content if messages else "")
+        if query_text:
+            try:
+                query_embedding = generate_embedding_stub(query_text, EMBED_DIM)
+                hits = await _with_vector_index(db, lambda index: index.search(query_embedding, top_k=top_k))
+            except (NotImplementedError, ValueError) as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            for hit, tokens in zip(hits, tokenizer_service.count_many([h.content for h in hits])):
+                if tokens <= remaining:
+                    items_chunks.append(ContextItem(kind="chunk", id=hit.id, content=hit.content, tokens=tokens, score=hit.score))
+                    remaining -= tokens
+
+    pending = unsummarized_counts(conv)["messages"] if items_summary else (conv.message_count or 0)
+    return ContextResponse(
         conversation_id=conversation_id,
-        summary=summary_text,
-        period="on_event",
-        generated_by="curator_v1",  # HARDCODED tag
-        created_at=datetime.utcnow(),
+        budget=budget,
+        used_tokens=budget - remaining,
+        items=items_summary + items_chunks + [
+            ContextItem(
+                kind="message",
+                id=r.id,
+                content=r.content,
+                tokens=tokens,
+                sender=r.sender,
+                role=r.role,
+                created_at=r.created_at,
+            )
+            for r, tokens in messages
+        ],
+        omitted_messages=max(0, pending - len(messages)),
+        method=tokenizer_service.method,
     )
-    db.add(summ)
-    db.commit()
 
-    return CurateResponse(
-        summarized=True,
-        created_summary_id=summ.id,
-        total_messages=total_messages,
-        total_tokens=total_tokens,
-        budget_messages=CONTEXT_BUDGET_MESSAGES,
-        budget_tokens=CONTEXT_BUDGET_TOKENS,
+# ========================= Retention & Archive =========================
+# messages / tool_calls / summaries are partitioned by month (migration 4e6d8b0a2c19); months older
+# than RETENTION_MONTHS move to compressed JSONL files under ARCHIVE_DIR, listed in archive_manifest
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./data/archive")
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "auto").lower()  # auto | zstd | gzip
+RETENTION_MONTHS = int(os.getenv("RETENTION_MONTHS", "6"))
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "0"))  # 0 = only via /memory/retention/run
+# Without the archive schedule, upcoming partitions are still created at startup and every N hours;
+# otherwise rows land in *_default once the pre-created months run out
+PARTITION_MAINTENANCE_HOURS = float(os.getenv("PARTITION_MAINTENANCE_HOURS", "24"))
+
+# Unsummarized messages stay hot only while the curator can still summarize them (AUTO_CURATE), and
+# at most ARCHIVE_PIN_GRACE_MONTHS past the retention cutoff; archived ones count as summarized
+ARCHIVE_PIN_GRACE_MONTHS = int(os.getenv("ARCHIVE_PIN_GRACE_MONTHS", "6"))
+
+retention_service.configure(
+    ARCHIVE_DIR,
+    RETENTION_MONTHS,
+    PARTITION_MONTHS_AHEAD,
+    ARCHIVE_COMPRESSION,
+    pin_unsummarized=AUTO_CURATE,
+    pin_grace_months=ARCHIVE_PIN_GRACE_MONTHS,
+)
+
+@app.on_event("startup")
+def _start_retention():
+    # Not at import: scripts and tests importing main must not run DDL. Every worker starts the
+    # thread, but only the holder of the Postgres advisory lock runs (see RetentionService._lead)
+    if RETENTION_INTERVAL_HOURS > 0:
+        retention_service.start(SessionLocal, RETENTION_INTERVAL_HOURS * 3600)
+    else:
+        retention_service.start(SessionLocal, PARTITION_MAINTENANCE_HOURS * 3600, archive=False)
+
+@app.on_event("shutdown")
+def _stop_retention():
+    retention_service.stop()
+
+class ArchiveManifestOut(BaseModel):
+    id: str
+    table_name: str
+    partition_name: str
+    range_start: datetime
+    range_end: datetime
+    row_count: int
+    bytes: int
+    compression: str
+    sha256: str
+    archived_at: Optional[datetime] = None
+
+class RetentionCandidate(BaseModel):
+    table: str
+    partition: str
+    month: datetime
+
+class RetentionRunResponse(BaseModel):
+    dry_run: bool
+    partitions_created: List[str]
+    candidates: List[RetentionCandidate]
+    archived: List[ArchiveManifestOut]
+
+def _manifest_out(entry: ArchiveManifest) -> ArchiveManifestOut:
+    return ArchiveManifestOut(
+        id=entry.id,
+        table_name=entry.table_name,
+        partition_name=entry.partition_name,
+        range_start=entry.range_start,
+        range_end=entry.range_end,
+        row_count=entry.row_count,
+        bytes=entry.bytes,
+        compression=entry.compression,
+        sha256=entry.sha256,
+        archived_at=entry.archived_at,
+    )
+
+@app.post("/memory/retention/run", response_model=RetentionRunResponse)
+async def run_retention(dry_run: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Pre-create upcoming partitions and archive every month older than RETENTION_MONTHS (each month commits alone)."""
+    result = await db.run_sync(lambda s: retention_service.run(s, dry_run=dry_run))
+    return RetentionRunResponse(
+        dry_run=dry_run,
+        partitions_created=result["partitions_created"],
+        candidates=[RetentionCandidate(**c) for c in result["candidates"]],
+        archived=[_manifest_out(e) for e in result["archived"]],
     )
 
+@app.get("/memory/archive/manifest", response_model=List[ArchiveManifestOut])
+async def list_archives(
+    table: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Archived months overlapping [start, end), optionally only those holding rows of a conversation."""
+    if table is not None and table not in PARTITIONED_TABLES:
+        raise HTTPException(status_code=400, detail=f"table must be one of {sorted(PARTITIONED_TABLES)}")
+    q = select(ArchiveManifest)
+    if table is not None:
+        q = q.where(ArchiveManifest.table_name == table)
+    if start is not None:
+        q = q.where(ArchiveManifest.range_end > start)
+    if end is not None:
+        q = q.where(ArchiveManifest.range_start < end)
+    if conversation_id is not None:
+        q = q.where(ArchiveManifest.conversation_ids.contains([conversation_id]))  # GIN, jsonb @>
+    rows = (await db.scalars(q.order_by(ArchiveManifest.table_name, ArchiveManifest.range_start))).all()
+    return [_manifest_out(e) for e in rows]
+
+@app.get("/memory/archive/{archive_id}/rows")
+async def stream_archive_rows(archive_id: str, conversation_id: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """Decompress one archive file as NDJSON, optionally filtered to a conversation."""
+    entry = await db.get(ArchiveManifest, archive_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Archive not found")
+    if not os.path.exists(entry.path):
+        raise HTTPException(status_code=410, detail="Archive file is no longer on disk")
+
+    def generate():
+        for row in read_archive(entry, conversation_id):
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 # ========================= Embedding STUB =========================
 # STUB: deterministic pseudo-embedding without ML deps; replace with sentence-transformers later
 EMBED_DIM = int(os.getenv("EMBED_DIM", "1536"))  # HARDCODED default matches schema
 
 def generate_embedding_stub(text: str, dim: int = EMBED_DIM) -> List[float]:
-    if not text:
-        return [0.0] * dim
-    # Use rolling hash to produce repeatable values in [-1,1]
-    h = hashlib.sha256(text.encode("utf-8")).digest()
-    vals: List[float] = []
-    acc = 0
-    for i in range(dim):
-        acc = (acc + h[i % len(h)]) % 256
-        v = (acc / 255.0) * 2.0 - 1.0
-        vals.append(v)
-    # L2 normalize
-    norm = math.sqrt(sum(v * v for v in vals)) or 1.0
-    return [v / norm for v in vals]
+    # Vectorized + content-hash cached (services.embedding_service); same vectors as the old loop
+    return embedding_service.embed(text, dim).tolist()
+
+def embed_many(texts: List[str], dim: int = EMBED_DIM) -> List[List[float]]:
+    return embedding_service.embed_many(texts, dim).tolist()
 
 class EmbedRequest(BaseModel):
     text: str
@@ -996,36 +1712,151 @@ async def embed_text(req: EmbedRequest):
     emb = generate_embedding_stub(req.text, EMBED_DIM)
     return EmbedResponse(embedding=emb, dim=len(emb), method="stub_sha256_norm")
 
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "256"))
+_EMBED_BINARY_MEDIA_TYPE = "application/octet-stream"
+
+class EmbedBatchRequest(BaseModel):
+    texts: List[str]
+    encoding: str = "json"  # 'json' | 'f32' | 'f16' (binary frame, see services.embedding_service)
+
+class EmbedBatchResponse(BaseModel):
+    embeddings: List[List[float]]
+    count: int
+    dim: int
+    method: str
+
+@app.post("/embeddings/batch", response_model=EmbedBatchResponse)
+async def embed_batch(req: EmbedBatchRequest):
+    """Embed up to EMBED_BATCH_MAX texts in one call; binary encodings skip JSON float formatting."""
+    if not req.texts:
+        raise HTTPException(status_code=400, detail="texts is required")
+    if len(req.texts) > EMBED_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {EMBED_BATCH_MAX} texts per batch")
+    encoding = req.encoding.lower()
+    if encoding != "json" and encoding not in FRAME_DTYPES:
+        raise HTTPException(status_code=400, detail="encoding must be one of: json, f32, f16")
+    matrix = await run_in_threadpool(embedding_service.embed_many, req.texts, EMBED_DIM)
+    if encoding == "json":
+        return EmbedBatchResponse(
+            embeddings=matrix.tolist(),
+            count=matrix.shape[0],
+            dim=matrix.shape[1],
+            method=embedding_service.method,
+        )
+    return Response(
+        content=encode_embeddings_frame(matrix, encoding),
+        media_type=_EMBED_BINARY_MEDIA_TYPE,
+        headers={
+            "X-Embedding-Count": str(matrix.shape[0]),
+            "X-Embedding-Dim": str(matrix.shape[1]),
+            "X-Embedding-Dtype": encoding,
+            "X-Embedding-Method": embedding_service.method,
+        },
+    )
+
 class ChunkEmbedResponse(BaseModel):
     id: str
     dim: int
 
 @app.post("/memory/chunks/{chunk_id}/embed", response_model=ChunkEmbedResponse)
-async def embed_chunk(chunk_id: str, db: Session = Depends(get_db)):
-    mc = db.get(MemoryChunk, chunk_id)
+async def embed_chunk(chunk_id: str, db: AsyncSession = Depends(get_async_db)):
+    mc = await db.get(MemoryChunk, chunk_id)
     if not mc:
         raise HTTPException(status_code=404, detail="Memory chunk not found")
-    emb = generate_embedding_stub(mc.content or "", EMBED_DIM)
+    digest = mc.content_sha256 or content_sha256(mc.content or "")
+    emb = (await db.run_sync(find_shared_embeddings, [digest])).get(digest) or generate_embedding_stub(mc.content or "", EMBED_DIM)
     mc.embedding = emb
     db.add(mc)
-    db.commit()
+    await db.commit()
+    await _index_chunks(db, [mc])
     return ChunkEmbedResponse(id=mc.id, dim=len(emb))
 
+# Background reindex (services.reindex_service): keyset batches, pooled embedding, commit per batch
+REINDEX_BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", "500"))
+REINDEX_WORKERS = int(os.getenv("REINDEX_WORKERS", "4"))
+
 class ReindexResponse(BaseModel):
+    job_id: str
+    mode: str = "missing"  # 'missing' | 'rebuild'
+    status: str  # 'pending' | 'running' | 'completed' | 'cancelled' | 'failed'
+    total: int
     updated: int
+    shared: int = 0  # rows filled from an existing embedding of identical content
+    batches: int
+    batch_size: int
+    workers: int
+    last_id: Optional[str] = None
+    percent: float
+    rows_per_second: float
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+def _index_reindexed_batch(db: Session, rows: List[dict]) -> None:
+    _vector_index(db).upsert([VectorRecord(**r) for r in rows])
 
 @app.post("/memory/chunks/reindex-missing", response_model=ReindexResponse)
-async def reindex_missing_chunks(db: Session = Depends(get_db)):
-    rows: List[MemoryChunk] = db.query(MemoryChunk).filter(MemoryChunk.embedding == None).all()  # noqa: E711
-    count = 0
-    for mc in rows:
-        emb = generate_embedding_stub(mc.content or "", EMBED_DIM)
-        mc.embedding = emb
-        db.add(mc)
-        count += 1
-    if count:
-        db.commit()
-    return ReindexResponse(updated=count)
+async def reindex_missing_chunks(batch_size: Optional[int] = None, workers: Optional[int] = None):
+    """Start (or return the running) background job embedding chunks with NULL embeddings."""
+    batch_size = batch_size or REINDEX_BATCH_SIZE
+    workers = workers or REINDEX_WORKERS
+    if not (1 <= batch_size <= 10000) or not (1 <= workers <= 32):
+        raise HTTPException(status_code=400, detail="batch_size must be 1-10000 and workers 1-32")
+    job = reindex_service.start(
+        SessionLocal,
+        lambda texts: embed_many(list(texts), EMBED_DIM),
+        batch_size=batch_size,
+        workers=workers,
+        on_batch=_index_reindexed_batch,
+    )
+    return ReindexResponse(**job.progress())
+
+@app.post("/memory/chunks/rebuild-index", response_model=ReindexResponse)
+async def rebuild_vector_index(batch_size: Optional[int] = None):
+    """Load the embeddings already stored in memory_chunks into the in-process vector index
+    (VECTOR_INDEX_BACKEND=numpy), e.g. after switching backends or losing the index files.
+    Runs as a reindex job in 'rebuild' mode: nothing is re-embedded or written back."""
+    if VECTOR_INDEX_BACKEND == "pgvector":
+        raise HTTPException(status_code=400, detail="pgvector searches memory_chunks directly; there is no index to rebuild")
+    batch_size = batch_size or REINDEX_BATCH_SIZE
+    if not (1 <= batch_size <= 10000):
+        raise HTTPException(status_code=400, detail="batch_size must be 1-10000")
+    job = reindex_service.start(
+        SessionLocal,
+        lambda texts: embed_many(list(texts), EMBED_DIM),
+        batch_size=batch_size,
+        on_batch=_index_reindexed_batch,
+        rebuild=True,
+    )
+    return ReindexResponse(**job.progress())
+
+@app.get("/memory/chunks/reindex-jobs/{job_id}", response_model=ReindexResponse)
+async def get_reindex_job(job_id: str):
+    job = reindex_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Reindex job not found")
+    return ReindexResponse(**job.progress())
+
+@app.post("/memory/chunks/reindex-jobs/{job_id}/cancel", response_model=ReindexResponse)
+async def cancel_reindex_job(job_id: str):
+    job = reindex_service.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Reindex job not found")
+    return ReindexResponse(**job.progress())
+
+@app.post("/memory/chunks/reindex-jobs/{job_id}/resume", response_model=ReindexResponse)
+async def resume_reindex_job(job_id: str):
+    job = reindex_service.resume(
+        job_id,
+        SessionLocal,
+        lambda texts: embed_many(list(texts), EMBED_DIM),
+        on_batch=_index_reindexed_batch,
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Reindex job not found")
+    return ReindexResponse(**job.progress())
 
 # ========================= API Gateway Stubs =========================
 # MeditationModule: Problem framing → Core Insight Report (STUB)
@@ -1046,6 +1877,68 @@ class CoreInsightReport(BaseModel):
 # Toggles for local implementations (HARDCODED defaults to local)
 USE_LOCAL_EMBEDDING = os.getenv("USE_LOCAL_EMBEDDING", "true").lower() == "true"
 USE_LOCAL_SUMMARY = os.getenv("USE_LOCAL_SUMMARY", "true").lower() == "true"
+# Vector search backend: 'pgvector' (database) | 'numpy' (in-process memory-mapped index)
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "pgvector").lower()
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "./data/vector_index")
+# Compact ANN storage + exact re-rank: 'none' | 'halfvec' (pgvector, index from migration f7c3a8e1d254,
+# checked at startup) | 'int8' (numpy)
+MEMORY_ANN_QUANTIZATION = os.getenv("MEMORY_ANN_QUANTIZATION", "none").lower()
+# Candidates re-ranked at full precision = top_k * factor
+MEMORY_SEARCH_RERANK_FACTOR = int(os.getenv("MEMORY_SEARCH_RERANK_FACTOR", "4"))
+
+def _vector_index(db: Optional[Session]) -> VectorIndex:
+    return get_vector_index(
+        VECTOR_INDEX_BACKEND,
+        db=db,
+        path=VECTOR_INDEX_PATH,
+        dim=EMBED_DIM,
+        quantization=MEMORY_ANN_QUANTIZATION,
+        rerank_factor=MEMORY_SEARCH_RERANK_FACTOR,
+    )
+
+@app.on_event("startup")
+def _check_ann_index():
+    check_vector_config(VECTOR_INDEX_BACKEND, MEMORY_ANN_QUANTIZATION)
+    if VECTOR_INDEX_BACKEND == "pgvector":
+        with SessionLocal() as db:
+            check_ann_index(db, MEMORY_ANN_QUANTIZATION)
+    elif len(_vector_index(None)) == 0:
+        with SessionLocal() as db:
+            stored = db.query(func.count(MemoryChunk.id)).filter(MemoryChunk.embedding.is_not(None)).scalar() or 0
+        if stored:
+            logger.warning(
+                f"Vector index at {VECTOR_INDEX_PATH} is empty but {stored} memory chunks have embeddings; "
+                "searches miss them until POST /memory/chunks/rebuild-index loads them"
+            )
+
+async def _with_vector_index(db: AsyncSession, fn: Callable[[VectorIndex], Any]) -> Any:
+    """Run fn(index): the NumPy backend scans/writes in the threadpool, off the event loop (it needs no
+    session); pgvector runs inside the session's run_sync, where the work is the database's anyway."""
+    if VECTOR_INDEX_BACKEND == "numpy":
+        return await run_in_threadpool(fn, _vector_index(None))
+    return await db.run_sync(lambda s: fn(_vector_index(s)))
+
+async def _index_chunks(db: AsyncSession, chunks: List[MemoryChunk]) -> None:
+    """Mirror embedded chunks into the configured vector index (no-op for pgvector)."""
+    if VECTOR_INDEX_BACKEND == "pgvector":
+        return
+    records = await db.run_sync(lambda s: _chunk_records(chunks))  # may load attributes expired by commit
+    await _with_vector_index(db, lambda index: index.upsert(records))
+
+def _chunk_records(chunks: List[MemoryChunk]) -> List[VectorRecord]:
+    return [
+        VectorRecord(
+            id=mc.id,
+            source_type=mc.source_type,
+            source_id=mc.source_id,
+            content=mc.content,
+            embedding=list(mc.embedding),
+            metadata=mc.metadata_json,
+            created_at=mc.created_at,
+        )
+        for mc in chunks
+        if mc.embedding is not None
+    ]
 
 # ========================= Constitutional Governance (minimal) =========================
 from functools import wraps
@@ -1106,6 +1999,7 @@ async def debate_one_on_one(req: DebateRequest):
 # ========================= Tool Orchestration (Human-AI Alignment) =========================
 # ZSCE Agent as Human-AI Alignment Coordinator, not direct executor
 _TOOL_REGISTRY: dict = {}
+_TOOL_VALIDATORS: dict = {}  # tool_name -> input_schema compiled at registration
 
 class ToolSpec(BaseModel):
     tool_name: str
@@ -1115,6 +2009,14 @@ class ToolSpec(BaseModel):
     capabilities: List[str]  # ['code_generation', 'testing', 'debugging', 'analysis']
     input_schema: dict = {}
     output_schema: dict = {}
+    cache_ttl_seconds: Optional[float] = None  # opt in to the result cache (idempotent tools only; ignored for built-ins)
+    # Where calls run (services/tool_executor_service.py): 'async' on the event loop,
+    # 'thread' for blocking I/O, 'process' for CPU-bound work; ignored for built-in tool names
+    execution_kind: str = "async"
+    max_concurrency: Optional[int] = None  # concurrent calls of this tool; None = unlimited
+    timeout_s: Optional[float] = None
+
+REGISTERED_TOOL_KINDS = ("async", "thread", "process")  # 'subprocess' needs a TOOL_COMMAND_*, built-ins only
 
 class ToolOrchestrationRequest(BaseModel):
     human_intent: str  # Original human request
@@ -1123,20 +2025,50 @@ class ToolOrchestrationRequest(BaseModel):
     quality_requirements: Optional[Dict[str, Any]] = None
 
 class ToolOrchestrationResponse(BaseModel):
-    orchestration_plan: List[Dict[str, Any]]  # Sequence of tool calls
+    orchestration_plan: List[Dict[str, Any]]  # Tool call steps; `depends_on` lists upstream step numbers
     estimated_confidence: float  # 0-1
     human_alignment_score: float  # 0-1
     suggested_refinements: List[str]
 
 @app.post("/tools/register")
 async def register_tool(spec: ToolSpec):
+    try:
+        validator = compile_schema(spec.input_schema)
+    except SchemaError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid input_schema: {e}")
+    if spec.execution_kind not in REGISTERED_TOOL_KINDS:
+        raise HTTPException(status_code=400, detail=f"execution_kind must be one of: {', '.join(REGISTERED_TOOL_KINDS)}")
+    if spec.max_concurrency is not None and spec.max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1")
+    if spec.timeout_s is not None and spec.timeout_s <= 0:
+        raise HTTPException(status_code=400, detail="timeout_s must be positive")
     _TOOL_REGISTRY[spec.tool_name] = spec.model_dump()
+    _TOOL_VALIDATORS[spec.tool_name] = validator
+    if spec.tool_name not in _BUILTINS:  # built-ins keep the policy declared at start-up
+        tool_executor.declare(spec.tool_name, spec.execution_kind, spec.max_concurrency, spec.timeout_s)
+    # Re-registering may change behaviour: drop cached results either way. Built-ins keep the
+    # cache policy set at start-up, and tools running a TOOL_COMMAND_* are never cached
+    tool_cache_service.invalidate(spec.tool_name)
+    if TOOL_COMMANDS.get(spec.tool_name):
+        tool_cache_service.disable(spec.tool_name)
+    elif spec.tool_name not in _BUILTINS:
+        if spec.cache_ttl_seconds:
+            tool_cache_service.enable(spec.tool_name, spec.cache_ttl_seconds)
+        else:
+            tool_cache_service.disable(spec.tool_name)
     return {"ok": True, "count": len(_TOOL_REGISTRY)}
 
 @app.get("/tools")
 async def list_tools():
     return list(_TOOL_REGISTRY.values())
 
+@app.get("/tools/{tool_name}/stats")
+async def tool_stats(tool_name: str):
+    """Latency histogram (p50/p95/p99) and error rate of /tools/execute and /orchestration/run calls since start-up"""
+    if tool_name not in _BUILTINS and tool_name not in _TOOL_REGISTRY:
+        raise HTTPException(status_code=404, detail="Tool not found")
+    return tool_metrics_service.stats(tool_name)
+
 @app.post("/orchestration/plan", response_model=ToolOrchestrationResponse)
 async def plan_tool_orchestration(request: ToolOrchestrationRequest):
     """Plan tool orchestration based on human intent and context"""
@@ -1158,37 +2090,43 @@ async def plan_tool_orchestration(request: ToolOrchestrationRequest):
                     "step": 1,
                     "tool": "web_search",
                     "purpose": "Research latest authentication best practices",
+                    "depends_on": [],
                     "input": {"query": "secure authentication best practices 2024 OWASP", "context": report}
                 },
                 {
                     "step": 2,
                     "tool": "code_generator_llm",
                     "purpose": "Generate authentication code structure",
-                    "input": {"task": "Create secure login system", "context": report, "best_practices": "from_web_search"}
+                    "depends_on": [1],
+                    "input": {"task": "Create secure login system", "context": report, "best_practices": "${steps.1.output.result}"}
                 },
                 {
                     "step": 3,
                     "tool": "test_generator_llm", 
                     "purpose": "Generate comprehensive security tests",
+                    "depends_on": [2],
                     "input": {"code_context": "authentication system", "test_requirements": "security, edge cases, penetration"}
                 },
                 {
                     "step": 4,
                     "tool": "security_analyzer",
                     "purpose": "Analyze security vulnerabilities",
-                    "input": {"code": "generated_auth_code", "security_standards": "OWASP", "scan_type": "comprehensive"}
+                    "depends_on": [2],
+                    "input": {"code": "${steps.2.output.result}", "security_standards": "OWASP", "scan_type": "comprehensive"}
                 },
                 {
                     "step": 5,
                     "tool": "code_reviewer_llm",
                     "purpose": "Review and suggest security improvements",
-                    "input": {"code": "auth_system", "review_criteria": "security, maintainability, performance", "focus": "security"}
+                    "depends_on": [2, 4],
+                    "input": {"code": "${steps.2.output.result}", "review_criteria": "security, maintainability, performance", "focus": "security", "findings": "${steps.4.output.result}"}
                 },
                 {
                     "step": 6,
                     "tool": "documentation_generator_llm",
                     "purpose": "Generate security documentation",
-                    "input": {"code": "auth_system", "doc_type": "security_guide", "audience": "developers"}
+                    "depends_on": [2],
+                    "input": {"code": "${steps.2.output.result}", "doc_type": "security_guide", "audience": "developers"}
                 }
             ]
         
@@ -1199,37 +2137,43 @@ async def plan_tool_orchestration(request: ToolOrchestrationRequest):
                     "step": 1,
                     "tool": "github_search",
                     "purpose": "Find similar API implementations",
+                    "depends_on": [],
                     "input": {"query": f"{intent_lower} API implementation", "language": "python", "context": report}
                 },
                 {
                     "step": 2,
                     "tool": "code_generator_llm",
                     "purpose": "Generate API structure and endpoints",
-                    "input": {"task": "Create REST API", "context": report, "examples": "from_github_search"}
+                    "depends_on": [1],
+                    "input": {"task": "Create REST API", "context": report, "examples": "${steps.1.output.result}"}
                 },
                 {
                     "step": 3,
                     "tool": "test_generator_llm",
                     "purpose": "Generate API tests",
+                    "depends_on": [2],
                     "input": {"code_context": "REST API", "test_requirements": "unit, integration, load"}
                 },
                 {
                     "step": 4,
                     "tool": "performance_analyzer",
                     "purpose": "Analyze API performance",
-                    "input": {"code": "api_code", "metrics": "response_time, throughput, memory"}
+                    "depends_on": [2],
+                    "input": {"code": "${steps.2.output.result}", "metrics": "response_time, throughput, memory"}
                 },
                 {
                     "step": 5,
                     "tool": "code_quality_analyzer",
                     "purpose": "Check API code quality",
-                    "input": {"code": "api_code", "standards": "REST, OpenAPI, error_handling"}
+                    "depends_on": [2],
+                    "input": {"code": "${steps.2.output.result}", "standards": "REST, OpenAPI, error_handling"}
                 },
                 {
                     "step": 6,
                     "tool": "documentation_generator_llm",
                     "purpose": "Generate API documentation",
-                    "input": {"code": "api_code", "doc_type": "openapi", "format": "yaml"}
+                    "depends_on": [2],
+                    "input": {"code": "${steps.2.output.result}", "doc_type": "openapi", "format": "yaml"}
                 }
             ]
         
@@ -1240,37 +2184,43 @@ async def plan_tool_orchestration(request: ToolOrchestrationRequest):
                     "step": 1,
                     "tool": "web_search",
                     "purpose": "Research UI/UX best practices",
+                    "depends_on": [],
                     "input": {"query": f"{intent_lower} UI UX best practices 2024", "context": report}
                 },
                 {
                     "step": 2,
                     "tool": "code_generator_llm",
                     "purpose": "Generate frontend components",
+                    "depends_on": [1],
                     "input": {"task": "Create frontend interface", "context": report, "framework": "react"}
                 },
                 {
                     "step": 3,
                     "tool": "test_generator_llm",
                     "purpose": "Generate frontend tests",
+                    "depends_on": [2],
                     "input": {"code_context": "frontend components", "test_requirements": "unit, integration, e2e"}
                 },
                 {
                     "step": 4,
                     "tool": "linter",
                     "purpose": "Lint frontend code",
-                    "input": {"code": "frontend_code", "rules": "eslint, prettier, accessibility"}
+                    "depends_on": [2],
+                    "input": {"code": "${steps.2.output.result}", "rules": "eslint, prettier, accessibility"}
                 },
                 {
                     "step": 5,
                     "tool": "build_tool",
                     "purpose": "Build and optimize frontend",
-                    "input": {"code": "frontend_code", "optimization": "bundle_size, performance"}
+                    "depends_on": [2, 4],
+                    "input": {"code": "${steps.2.output.result}", "optimization": "bundle_size, performance"}
                 },
                 {
                     "step": 6,
                     "tool": "code_reviewer_llm",
                     "purpose": "Review UI/UX implementation",
-                    "input": {"code": "frontend_code", "review_criteria": "usability, accessibility, performance"}
+                    "depends_on": [2],
+                    "input": {"code": "${steps.2.output.result}", "review_criteria": "usability, accessibility, performance"}
                 }
             ]
         
@@ -1281,37 +2231,43 @@ async def plan_tool_orchestration(request: ToolOrchestrationRequest):
                     "step": 1,
                     "tool": "web_search",
                     "purpose": "Research ML algorithms and approaches",
+                    "depends_on": [],
                     "input": {"query": f"{intent_lower} machine learning algorithms", "context": report}
                 },
                 {
                     "step": 2,
                     "tool": "github_search",
                     "purpose": "Find similar ML implementations",
+                    "depends_on": [],
                     "input": {"query": f"{intent_lower} machine learning implementation", "context": report}
                 },
                 {
                     "step": 3,
                     "tool": "code_generator_llm",
                     "purpose": "Generate ML pipeline code",
-                    "input": {"task": "Create ML pipeline", "context": report, "algorithms": "from_research"}
+                    "depends_on": [1, 2],
+                    "input": {"task": "Create ML pipeline", "context": report, "algorithms": "${steps.1.output.result}", "examples": "${steps.2.output.result}"}
                 },
                 {
                     "step": 4,
                     "tool": "test_generator_llm",
                     "purpose": "Generate ML tests",
+                    "depends_on": [3],
                     "input": {"code_context": "ML pipeline", "test_requirements": "unit, validation, cross_validation"}
                 },
                 {
                     "step": 5,
                     "tool": "performance_analyzer",
                     "purpose": "Analyze ML performance",
-                    "input": {"code": "ml_code", "metrics": "accuracy, precision, recall, training_time"}
+                    "depends_on": [3],
+                    "input": {"code": "${steps.3.output.result}", "metrics": "accuracy, precision, recall, training_time"}
                 },
                 {
                     "step": 6,
                     "tool": "documentation_generator_llm",
                     "purpose": "Generate ML documentation",
-                    "input": {"code": "ml_code", "doc_type": "model_card", "include": "metrics, limitations, bias"}
+                    "depends_on": [3, 5],
+                    "input": {"code": "${steps.3.output.result}", "doc_type": "model_card", "include": "metrics, limitations, bias", "metrics": "${steps.5.output.result}"}
                 }
             ]
         
@@ -1322,31 +2278,36 @@ async def plan_tool_orchestration(request: ToolOrchestrationRequest):
                     "step": 1,
                     "tool": "web_search",
                     "purpose": "Research best practices and solutions",
+                    "depends_on": [],
                     "input": {"query": f"{intent_lower} best practices", "context": report}
                 },
                 {
                     "step": 2,
                     "tool": "code_generator_llm",
                     "purpose": "Generate initial implementation",
-                    "input": {"task": request.human_intent, "context": report, "research": "from_web_search"}
+                    "depends_on": [1],
+                    "input": {"task": request.human_intent, "context": report, "research": "${steps.1.output.result}"}
                 },
                 {
                     "step": 3,
                     "tool": "test_generator_llm",
                     "purpose": "Generate comprehensive tests",
+                    "depends_on": [2],
                     "input": {"code_context": "generated_code", "test_requirements": "unit, integration, edge_cases"}
                 },
                 {
                     "step": 4,
                     "tool": "code_quality_analyzer",
                     "purpose": "Analyze code quality",
-                    "input": {"code": "generated_code", "standards": "clean_code, design_patterns"}
+                    "depends_on": [2],
+                    "input": {"code": "${steps.2.output.result}", "standards": "clean_code, design_patterns"}
                 },
                 {
                     "step": 5,
                     "tool": "code_reviewer_llm",
                     "purpose": "Review and suggest improvements",
-                    "input": {"code": "generated_code", "review_criteria": "maintainability, performance, security"}
+                    "depends_on": [2],
+                    "input": {"code": "${steps.2.output.result}", "review_criteria": "maintainability, performance, security"}
                 }
             ]
         
@@ -1403,11 +2364,13 @@ class ExecuteToolRequest(BaseModel):
     step_number: int = 1
     input: Optional[dict] = None
     mode: Optional[str] = "auto"  # 'auto' | 'user' | 'web'
+    use_cache: bool = True  # False forces a fresh run (the result still refreshes the cache)
 
 class ExecuteToolResponse(BaseModel):
     tool_name: str
     output: dict
     audited_call_id: str
+    cache_hit: bool = False
 
 # External Tool Integrations (ZSCE Agent coordinates these, doesn't execute directly)
 async def _tool_code_generator_llm(input_data: dict) -> dict:
@@ -1430,7 +2393,7 @@ async def _tool_test_generator_llm(input_data: dict) -> dict:
         "metadata": {"model": "claude-3", "tokens_used": 800}
     }
 
-async def _tool_security_analyzer(input_data: dict) -> dict:
+def _tool_security_analyzer(input_data: dict) -> dict:
     """Coordinate with external security analysis tool"""
     return {
         "tool_type": "analyzer",
@@ -1482,7 +2445,7 @@ async def _tool_refactoring_llm(input_data: dict) -> dict:
     }
 
 # Analysis Tools
-async def _tool_performance_analyzer(input_data: dict) -> dict:
+def _tool_performance_analyzer(input_data: dict) -> dict:
     """Coordinate with external performance analysis tool"""
     return {
         "tool_type": "analyzer",
@@ -1492,7 +2455,7 @@ async def _tool_performance_analyzer(input_data: dict) -> dict:
         "metadata": {"tool": "py-spy", "bottlenecks_found": 2, "optimization_suggestions": 5}
     }
 
-async def _tool_dependency_analyzer(input_data: dict) -> dict:
+def _tool_dependency_analyzer(input_data: dict) -> dict:
     """Coordinate with external dependency analysis tool"""
     return {
         "tool_type": "analyzer",
@@ -1502,7 +2465,7 @@ async def _tool_dependency_analyzer(input_data: dict) -> dict:
         "metadata": {"tool": "safety", "vulnerabilities": 0, "outdated_packages": 3}
     }
 
-async def _tool_code_quality_analyzer(input_data: dict) -> dict:
+def _tool_code_quality_analyzer(input_data: dict) -> dict:
     """Coordinate with external code quality analysis tool"""
     return {
         "tool_type": "analyzer",
@@ -1515,6 +2478,8 @@ async def _tool_code_quality_analyzer(input_data: dict) -> dict:
 # Execution Tools
 async def _tool_test_runner(input_data: dict) -> dict:
     """Coordinate with external test runner"""
+    if TOOL_COMMANDS.get("test_runner"):
+        return await _run_tool_command("test_runner", "executor", "test_execution", input_data)
     return {
         "tool_type": "executor",
         "provider": "local",
@@ -1525,6 +2490,8 @@ async def _tool_test_runner(input_data: dict) -> dict:
 
 async def _tool_linter(input_data: dict) -> dict:
     """Coordinate with external linter"""
+    if TOOL_COMMANDS.get("linter"):
+        return await _run_tool_command("linter", "executor", "code_linting", input_data)
     return {
         "tool_type": "executor",
         "provider": "local",
@@ -1535,6 +2502,8 @@ async def _tool_linter(input_data: dict) -> dict:
 
 async def _tool_formatter(input_data: dict) -> dict:
     """Coordinate with external code formatter"""
+    if TOOL_COMMANDS.get("formatter"):
+        return await _run_tool_command("formatter", "executor", "code_formatting", input_data)
     return {
         "tool_type": "executor",
         "provider": "local",
@@ -1545,6 +2514,8 @@ async def _tool_formatter(input_data: dict) -> dict:
 
 async def _tool_build_tool(input_data: dict) -> dict:
     """Coordinate with external build tool"""
+    if TOOL_COMMANDS.get("build_tool"):
+        return await _run_tool_command("build_tool", "executor", "build_execution", input_data)
     return {
         "tool_type": "executor",
         "provider": "local",
@@ -1575,7 +2546,7 @@ async def _tool_stackoverflow_search(input_data: dict) -> dict:
     }
 
 # File Operations
-async def _tool_file_reader(input_data: dict) -> dict:
+def _tool_file_reader(input_data: dict) -> dict:
     """Coordinate with file reading operations"""
     return {
         "tool_type": "file_ops",
@@ -1585,7 +2556,7 @@ async def _tool_file_reader(input_data: dict) -> dict:
         "metadata": {"file_path": input_data.get("path", ""), "size": "15KB", "lines": 450}
     }
 
-async def _tool_file_writer(input_data: dict) -> dict:
+def _tool_file_writer(input_data: dict) -> dict:
     """Coordinate with file writing operations"""
     return {
         "tool_type": "file_ops",
@@ -1597,6 +2568,8 @@ async def _tool_file_writer(input_data: dict) -> dict:
 
 async def _tool_git_operations(input_data: dict) -> dict:
     """Coordinate with Git operations"""
+    if TOOL_COMMANDS.get("git_operations"):
+        return await _run_tool_command("git_operations", "file_ops", "version_control", input_data)
     return {
         "tool_type": "file_ops",
         "provider": "local",
@@ -1605,6 +2578,54 @@ async def _tool_git_operations(input_data: dict) -> dict:
         "metadata": {"operation": input_data.get("operation", "commit"), "branch": "main", "commit_hash": "abc123"}
     }
 
+def _command_paths(tool_name: str, paths: Any) -> List[str]:
+    if isinstance(paths, str):
+        paths = [paths]
+    if not isinstance(paths, list) or not all(isinstance(p, str) and p for p in paths):
+        raise HTTPException(status_code=400, detail=f"{tool_name}: 'paths' must be a path or a list of paths")
+    for path in paths:
+        # Relative to TOOL_EXEC_WORKDIR and never read as an option by the command
+        if os.path.isabs(path) or ".." in path.split(os.sep) or path.startswith("-") or "\x00" in path:
+            raise HTTPException(status_code=400, detail=f"{tool_name}: path '{path}' must be relative to the working directory (no '..', no leading '-')")
+    return paths
+
+def _command_args(tool_name: str, input_data: dict) -> List[str]:
+    """Map validated input fields to argv appended to TOOL_COMMAND_<TOOL>; fields the command cannot take are rejected"""
+    unsupported = sorted(set(input_data) - COMMAND_TOOL_INPUTS[tool_name])
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{tool_name} runs TOOL_COMMAND_{tool_name.upper()} and does not accept: {', '.join(unsupported)} "
+                   f"(supported: {', '.join(sorted(COMMAND_TOOL_INPUTS[tool_name])) or 'none'})",
+        )
+    args: List[str] = []
+    if tool_name == "git_operations":
+        operation = input_data.get("operation", "status")
+        if operation not in GIT_READ_OPERATIONS:
+            raise HTTPException(status_code=400, detail=f"git operation must be one of: {', '.join(sorted(GIT_READ_OPERATIONS))}")
+        args.append(operation)
+    if "target" in input_data:
+        target = input_data["target"]
+        if not isinstance(target, str) or not COMMAND_TARGET_PATTERN.fullmatch(target):
+            raise HTTPException(status_code=400, detail=f"{tool_name}: 'target' must match {COMMAND_TARGET_PATTERN.pattern}")
+        args.append(target)
+    if "paths" in input_data:
+        paths = _command_paths(tool_name, input_data["paths"])
+        args += (["--"] + paths) if tool_name == "git_operations" else paths
+    return args
+
+async def _run_tool_command(tool_name: str, tool_type: str, capability: str, input_data: dict) -> dict:
+    """Run a tool's configured command (no shell) in TOOL_EXEC_WORKDIR; killed with its children on timeout/cancel"""
+    argv = TOOL_COMMANDS[tool_name] + _command_args(tool_name, input_data)
+    result = await tool_executor.run_subprocess(argv, cwd=TOOL_EXEC_WORKDIR or None)
+    return {
+        "tool_type": tool_type,
+        "provider": "local",
+        "capability": capability,
+        "result": result["stdout"],
+        "metadata": {k: result[k] for k in ("argv", "returncode", "stderr", "duration_ms")},
+    }
+
 # Enhanced Tool Registry - Hermes AI External Tool Coordination
 _BUILTINS: dict[str, Callable[[dict], Any]] = {
     # LLM Tools
@@ -1637,47 +2658,99 @@ _BUILTINS: dict[str, Callable[[dict], Any]] = {
     "git_operations": _tool_git_operations,
 }
 
-# Minimal JSON contract: {
+# Execution layer: tools that shell out run as subprocesses and blocking tools (plain `def` bodies)
+# in a thread pool, off the event loop, each with its own concurrency limit and timeout.
+# Registered tools declare their kind in ToolSpec.execution_kind
+TOOL_EXEC_THREADS = int(os.getenv("TOOL_EXEC_THREADS", "8"))
+TOOL_EXEC_PROCESSES = int(os.getenv("TOOL_EXEC_PROCESSES", "2"))
+TOOL_EXEC_MAX_CONCURRENCY = int(os.getenv("TOOL_EXEC_MAX_CONCURRENCY", "2"))  # per tool
+TOOL_EXEC_TIMEOUT_SECONDS = float(os.getenv("TOOL_EXEC_TIMEOUT_SECONDS", "300"))
+TOOL_EXEC_LIMITS = os.getenv("TOOL_EXEC_LIMITS", "")  # per-tool overrides: "test_runner=1:600,build_tool=1:900"
+TOOL_EXEC_WORKDIR = os.getenv("TOOL_EXEC_WORKDIR", "")
+SUBPROCESS_TOOLS = ("test_runner", "linter", "formatter", "build_tool", "git_operations")
+BLOCKING_TOOLS = ("security_analyzer", "performance_analyzer", "dependency_analyzer", "code_quality_analyzer", "file_reader", "file_writer")
+# TOOL_COMMAND_<TOOL>: argv (shell syntax, run without a shell); unset keeps the coordination stub
+TOOL_COMMANDS = {name: shlex.split(os.getenv(f"TOOL_COMMAND_{name.upper()}", "")) for name in SUBPROCESS_TOOLS}
+GIT_READ_OPERATIONS = {"status", "diff", "log", "show", "branch"}
+# Input fields each command takes, appended to its argv: paths (relative to TOOL_EXEC_WORKDIR), a build target,
+# a git read operation. Anything else is rejected with 400 rather than silently dropped
+COMMAND_TOOL_INPUTS = {
+    "test_runner": {"paths"},
+    "linter": {"paths"},
+    "formatter": {"paths"},
+    "build_tool": {"target"},
+    "git_operations": {"operation", "paths"},
+}
+COMMAND_TARGET_PATTERN = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.:/@+=-]*")
+
+def _parse_exec_limits(raw: str) -> Dict[str, tuple]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        name, _, value = item.partition("=")
+        concurrency, _, timeout = value.partition(":")
+        limits[name.strip()] = (int(concurrency or TOOL_EXEC_MAX_CONCURRENCY), float(timeout or TOOL_EXEC_TIMEOUT_SECONDS))
+    return limits
+
+tool_executor.configure(TOOL_EXEC_THREADS, TOOL_EXEC_PROCESSES)
+_exec_limits = _parse_exec_limits(TOOL_EXEC_LIMITS)
+for _name in SUBPROCESS_TOOLS:
+    tool_executor.declare(_name, "subprocess", *_exec_limits.get(_name, (TOOL_EXEC_MAX_CONCURRENCY, TOOL_EXEC_TIMEOUT_SECONDS)))
+for _name in BLOCKING_TOOLS:  # bounded by the thread pool unless TOOL_EXEC_LIMITS says otherwise
+    tool_executor.declare(_name, "thread", *_exec_limits.get(_name, (None, TOOL_EXEC_TIMEOUT_SECONDS)))
+
+async def _registered_tool_async(input_data: dict) -> dict:
+    return registered_tool_stub(input_data)
+
+@app.on_event("shutdown")
+def _shutdown_tool_executor():
+    tool_executor.shutdown()
+
+# Result cache for idempotent built-ins (registered tools opt in via ToolSpec.cache_ttl_seconds).
+# Tools running a TOOL_COMMAND_* are never cached: their output depends on TOOL_EXEC_WORKDIR, not the input
+TOOL_CACHE_TOOLS = [t.strip() for t in os.getenv(
+    "TOOL_CACHE_TOOLS", "security_analyzer,code_quality_analyzer,dependency_analyzer,web_search"
+).split(",") if t.strip()]
+TOOL_CACHE_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", "3600"))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1000"))
+TOOL_CACHE_DIR = os.getenv("TOOL_CACHE_DIR", "")  # empty: memory only
+
+tool_cache_service.configure(TOOL_CACHE_MAX_ENTRIES, TOOL_CACHE_DIR)
+for _name in TOOL_CACHE_TOOLS:
+    if TOOL_COMMANDS.get(_name):
+        logger.warning(f"Not caching '{_name}': it runs TOOL_COMMAND_{_name.upper()} against the working directory")
+        continue
+    tool_cache_service.enable(_name, TOOL_CACHE_TTL_SECONDS)
+
+# JSON contract: {
 #   tool_name, semantic_description,
-#   input_schema: { required: [..], properties: { field: {type: 'string'|'number'|'object'|'array'|'boolean'} } }
+#   input_schema: JSON Schema subset, nested to any depth (see services/tool_schema_service.py), e.g.
+#     { required: [..], properties: { field: {type: 'string'|'number'|'integer'|'object'|'array'|'boolean'|'null', ...} } }
 # }
 
-def _validate_input_against_schema(data: dict, schema: dict):
-    if not schema:
+def _validate_input(tool_name: str, data: dict):
+    """Run the validator compiled at /tools/register (tools without a schema accept any input)"""
+    validator = _TOOL_VALIDATORS.get(tool_name)
+    if validator is None:
         return
-    required = schema.get("required", [])
-    props = schema.get("properties", {})
-    for r in required:
-        if r not in data:
-            raise HTTPException(status_code=400, detail=f"Missing required field: {r}")
-    type_map = {
-        "string": str,
-        "number": (int, float),
-        "object": dict,
-        "array": list,
-        "boolean": bool,
-    }
-    for key, spec in props.items():
-        if key in data and "type" in spec:
-            pytype = type_map.get(spec["type"])  # STUB: no nested validation
-            if pytype and not isinstance(data[key], pytype):
-                raise HTTPException(status_code=400, detail=f"Field '{key}' expects type {spec['type']}")
+    try:
+        validator(data)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # Patch ToolSpec to include schema fields (already present)
 # Execution stays the same, add validation & governance on output
 
-@app.post("/tools/execute", response_model=ExecuteToolResponse)
+class ToolRun(BaseModel):
+    output: dict
+    latency_ms: float  # monotonic wall time of the tool call itself (of the lookup on a cache hit)
+    cache_hit: bool = False
+
 @governance_check
-async def execute_tool(req: ExecuteToolRequest, db: Session = Depends(get_db)):
-    tool_name = req.tool_name
-    input_data = req.input or {}
-    mode = (req.mode or "auto").lower()
+async def _invoke_tool(tool_name: str, input_data: dict, mode: str = "auto", use_cache: bool = True) -> ToolRun:
+    """Validate, apply the invocation-mode policy and run one tool (shared by /tools/execute and /orchestration/run)"""
+    mode = (mode or "auto").lower()
 
-    # Resolve schema
-    schema = None
-    if tool_name in _TOOL_REGISTRY:
-        schema = _TOOL_REGISTRY[tool_name].get("input_schema")
-    _validate_input_against_schema(input_data, schema or {})
+    _validate_input(tool_name, input_data)
 
     # Simple policy per invocation mode
     AUTO_ALLOWLIST = {"echo"}  # HARDCODED: safe-by-default tools
@@ -1688,12 +2761,37 @@ async def execute_tool(req: ExecuteToolRequest, db: Session = Depends(get_db)):
     # 'user' mode: user explicitly requested, we proceed without extra restriction beyond registration
 
     # Resolve tool: built-in first, then registry (STUB routing)
-    if tool_name in _BUILTINS:
-        output = await _BUILTINS[tool_name](input_data)
-    elif tool_name in _TOOL_REGISTRY:
-        output = {"result": "stub", "input": input_data}
-    else:
+    if tool_name not in _BUILTINS and tool_name not in _TOOL_REGISTRY:
         raise HTTPException(status_code=404, detail="Tool not found")
+    started = time.monotonic()
+    if use_cache:
+        cached = tool_cache_service.get(tool_name, input_data)
+        if cached is not None:
+            return ToolRun(output=cached, latency_ms=(time.monotonic() - started) * 1000, cache_hit=True)
+    try:
+        if tool_name in _BUILTINS:
+            output = await tool_executor.run(tool_name, _BUILTINS[tool_name], input_data)
+        else:
+            # Registered tools are not wired to providers yet (STUB); the body still runs under the declared kind
+            body = registered_tool_stub if tool_executor.policy(tool_name).kind in ("thread", "process") else _registered_tool_async
+            output = await tool_executor.run(tool_name, body, input_data)
+    except Exception as e:
+        tool_metrics_service.record(tool_name, time.monotonic() - started, ok=False)
+        if isinstance(e, ToolTimeoutError):
+            raise HTTPException(status_code=504, detail=str(e)) from e
+        raise
+    elapsed = time.monotonic() - started
+    tool_metrics_service.record(tool_name, elapsed)
+    tool_cache_service.put(tool_name, input_data, output)
+    return ToolRun(output=output, latency_ms=elapsed * 1000)
+
+@app.post("/tools/execute", response_model=ExecuteToolResponse)
+@governance_check
+async def execute_tool(req: ExecuteToolRequest, db: AsyncSession = Depends(get_async_db)):
+    tool_name = req.tool_name
+    input_data = req.input or {}
+    run = await _invoke_tool(tool_name, input_data, req.mode, req.use_cache)
+    output = run.output
 
     # Audit log to tool_calls table
     call = ToolCall(
@@ -1704,14 +2802,83 @@ async def execute_tool(req: ExecuteToolRequest, db: Session = Depends(get_db)):
         tool_name=tool_name,
         input=input_data,
         output=output,
-        latency_ms=0,  # STUB
+        latency_ms=round(run.latency_ms),
         status="success",
         created_at=datetime.utcnow(),
     )
     db.add(call)
-    db.commit()
+    await db.commit()
+
+    return ExecuteToolResponse(tool_name=tool_name, output=output, audited_call_id=call.id, cache_hit=run.cache_hit)
+
+class ToolCacheInvalidateRequest(BaseModel):
+    tool_name: Optional[str] = None  # omit to clear every tool
+    input: Optional[dict] = None  # with tool_name: only this input
+
+@app.post("/tools/cache/invalidate")
+async def invalidate_tool_cache(req: ToolCacheInvalidateRequest):
+    if req.input is not None and req.tool_name is None:
+        raise HTTPException(status_code=400, detail="input requires tool_name")
+    return {"invalidated": tool_cache_service.invalidate(req.tool_name, req.input)}
+
+# ========================= Orchestration DAG execution =========================
+ORCHESTRATION_MAX_CONCURRENCY = int(os.getenv("ORCHESTRATION_MAX_CONCURRENCY", "4"))
+dag_executor.configure(ORCHESTRATION_MAX_CONCURRENCY)
 
-    return ExecuteToolResponse(tool_name=tool_name, output=output, audited_call_id=call.id)
+class OrchestrationRunRequest(BaseModel):
+    orchestration_plan: List[Dict[str, Any]]  # as returned by /orchestration/plan
+    conversation_id: Optional[str] = None
+    message_id: Optional[str] = None
+    mode: Optional[str] = "auto"
+    max_concurrency: Optional[int] = None  # capped at ORCHESTRATION_MAX_CONCURRENCY
+    fail_fast: bool = False
+
+@app.post("/orchestration/run")
+async def run_orchestration(req: OrchestrationRunRequest):
+    """Execute a plan as a DAG: independent steps run concurrently, outputs flow through
+    "${steps.N.output...}" references. Streams one NDJSON status event per line; every
+    finished step is audited to tool_calls in one batch when the run ends."""
+    try:
+        normalize_plan(req.orchestration_plan)
+    except PlanError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if req.max_concurrency is not None and req.max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be positive")
+
+    inputs: Dict[int, Dict[str, Any]] = {}  # resolved per-step inputs, for the audit rows
+    latencies: Dict[int, float] = {}  # tool call time, excluding scheduling
+
+    async def invoke(step: Dict[str, Any], input_data: Dict[str, Any]) -> dict:
+        inputs[step["step"]] = input_data
+        run = await _invoke_tool(step["tool"], input_data, req.mode)
+        latencies[step["step"]] = run.latency_ms
+        return run.output
+
+    async def generate():
+        audit: List[Dict[str, Any]] = []
+        try:
+            async for event in dag_executor.run(req.orchestration_plan, invoke, req.max_concurrency, req.fail_fast):
+                if event["event"] in ("step_succeeded", "step_failed"):
+                    row = _tool_call_row(ToolCallCreate(
+                        conversation_id=req.conversation_id,
+                        message_id=req.message_id,
+                        step_number=event["step"],
+                        tool_name=event["tool"],
+                        input=inputs.get(event["step"]),
+                        output=event.get("output") if event["event"] == "step_succeeded" else {"error": event["error"]},
+                        latency_ms=round(latencies.get(event["step"], event["latency_ms"])),
+                        status="success" if event["event"] == "step_succeeded" else "failure",
+                    ), datetime.utcnow())
+                    audit.append(row)
+                    event["audited_call_id"] = row["id"]
+                yield json.dumps(event, default=str) + "\n"
+        finally:
+            if audit:
+                async with AsyncSessionLocal() as db:
+                    await db.run_sync(insert_transcript, [], audit)
+                    await db.commit()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 # ========================= Knowledge Graph CRUD =========================
 from models import KGNode, KGEdge
@@ -1727,7 +2894,7 @@ class KGNodeOut(BaseModel):
     created_at: datetime
 
 @app.post("/kg/nodes", response_model=KGNodeOut)
-async def create_kg_node(payload: KGNodeCreate, db: Session = Depends(get_db)):
+async def create_kg_node(payload: KGNodeCreate, db: AsyncSession = Depends(get_async_db)):
     node = KGNode(
         id=str(uuid4()),
         entity_type=payload.entity_type,
@@ -1735,13 +2902,12 @@ async def create_kg_node(payload: KGNodeCreate, db: Session = Depends(get_db)):
         created_at=datetime.utcnow(),
     )
     db.add(node)
-    db.commit()
-    db.refresh(node)
+    await db.commit()
     return KGNodeOut(id=node.id, entity_type=node.entity_type, properties=node.properties, created_at=node.created_at)
 
 @app.get("/kg/nodes/{node_id}", response_model=KGNodeOut)
-async def get_kg_node(node_id: str, db: Session = Depends(get_db)):
-    node = db.get(KGNode, node_id)
+async def get_kg_node(node_id: str, db: AsyncSession = Depends(get_async_db)):
+    node = await db.get(KGNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     return KGNodeOut(id=node.id, entity_type=node.entity_type, properties=node.properties, created_at=node.created_at)
@@ -1761,9 +2927,9 @@ class KGEdgeOut(BaseModel):
     created_at: datetime
 
 @app.post("/kg/edges", response_model=KGEdgeOut)
-async def create_kg_edge(payload: KGEdgeCreate, db: Session = Depends(get_db)):
+async def create_kg_edge(payload: KGEdgeCreate, db: AsyncSession = Depends(get_async_db)):
     # Basic validation
-    if not db.get(KGNode, payload.source_node_id) or not db.get(KGNode, payload.target_node_id):
+    if not await db.get(KGNode, payload.source_node_id) or not await db.get(KGNode, payload.target_node_id):
         raise HTTPException(status_code=400, detail="Invalid node references")
     edge = KGEdge(
         id=str(uuid4()),
@@ -1774,8 +2940,7 @@ async def create_kg_edge(payload: KGEdgeCreate, db: Session = Depends(get_db)):
         created_at=datetime.utcnow(),
     )
     db.add(edge)
-    db.commit()
-    db.refresh(edge)
+    await db.commit()
     return KGEdgeOut(
         id=edge.id,
         source_node_id=edge.source_node_id,
@@ -1786,8 +2951,10 @@ async def create_kg_edge(payload: KGEdgeCreate, db: Session = Depends(get_db)):
     )
 
 @app.get("/kg/nodes/{node_id}/edges", response_model=List[KGEdgeOut])
-async def list_node_edges(node_id: str, db: Session = Depends(get_db)):
-    edges: List[KGEdge] = db.query(KGEdge).filter((KGEdge.source_node_id == node_id) | (KGEdge.target_node_id == node_id)).all()
+async def list_node_edges(node_id: str, db: AsyncSession = Depends(get_async_db)):
+    edges = (await db.scalars(
+        select(KGEdge).where((KGEdge.source_node_id == node_id) | (KGEdge.target_node_id == node_id))
+    )).all()
     return [
         KGEdgeOut(
             id=e.id,
@@ -1800,6 +2967,61 @@ async def list_node_edges(node_id: str, db: Session = Depends(get_db)):
         for e in edges
     ]
 
+# Upper bounds for /kg/traverse requests
+KG_TRAVERSE_MAX_DEPTH = int(os.getenv("KG_TRAVERSE_MAX_DEPTH", "6"))
+KG_TRAVERSE_MAX_NODES = int(os.getenv("KG_TRAVERSE_MAX_NODES", "10000"))
+
+class KGTraverseRequest(BaseModel):
+    start_node_ids: List[str]
+    max_depth: int = 2
+    direction: str = "both"  # out | in | both
+    relationship_types: Optional[List[str]] = None
+    max_fanout: int = 50  # edges expanded per node, oldest first
+    max_nodes: int = 1000  # visit budget
+    target_node_id: Optional[str] = None  # shortest path mode
+
+class KGTraverseNode(BaseModel):
+    id: str
+    entity_type: str
+    properties: Optional[dict] = None
+    created_at: Optional[datetime] = None
+    depth: int
+    path: List[str]
+    via_edge: Optional[KGEdgeOut] = None
+
+class KGTraverseResponse(BaseModel):
+    nodes: List[KGTraverseNode]
+    path: Optional[List[str]] = None
+    visits: int
+    truncated: bool
+
+@app.post("/kg/traverse", response_model=KGTraverseResponse)
+async def traverse_kg(req: KGTraverseRequest, db: AsyncSession = Depends(get_async_db)):
+    """有界 BFS 邻域 / 最短路径（Postgres 上为单条递归 CTE 查询）"""
+    if not req.start_node_ids:
+        raise HTTPException(status_code=400, detail="start_node_ids is required")
+    if req.direction not in KG_DIRECTIONS:
+        raise HTTPException(status_code=400, detail=f"direction must be one of {', '.join(KG_DIRECTIONS)}")
+    if not 1 <= req.max_depth <= KG_TRAVERSE_MAX_DEPTH:
+        raise HTTPException(status_code=400, detail=f"max_depth must be between 1 and {KG_TRAVERSE_MAX_DEPTH}")
+    if req.max_fanout < 1:
+        raise HTTPException(status_code=400, detail="max_fanout must be positive")
+    if not 1 <= req.max_nodes <= KG_TRAVERSE_MAX_NODES:
+        raise HTTPException(status_code=400, detail=f"max_nodes must be between 1 and {KG_TRAVERSE_MAX_NODES}")
+    result = await db.run_sync(
+        kg_traverse,
+        req.start_node_ids,
+        req.max_depth,
+        req.direction,
+        req.relationship_types,
+        req.max_fanout,
+        req.max_nodes,
+        req.target_node_id,
+    )
+    if not result["nodes"] and req.target_node_id is None:
+        raise HTTPException(status_code=404, detail="Start nodes not found")
+    return KGTraverseResponse(**result)
+
 # ========================= V4.0 Core Modules =========================
 
 # MeditationModule - 问题框架化
@@ -2,7 +2,7 @@
 Database models for ZSCE Agent Web Application
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Text, ForeignKey, JSON, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -221,9 +221,24 @@ class Conversation(Base):
     purpose = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime)
+    # Running counters maintained on message insert (services.curator_service.record_message)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    token_total = Column(Integer, nullable=False, default=0, server_default="0")
+    # Curation watermark: messages up to (created_at, id) are covered by summaries
+    summarized_message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    summarized_token_total = Column(Integer, nullable=False, default=0, server_default="0")
+    summary_watermark_at = Column(DateTime)
+    summary_watermark_id = Column(String(36))
+
+# messages, tool_calls and summaries are range-partitioned by month on created_at in Postgres
+# (migration 4e6d8b0a2c19, services.retention_service); the database primary key is (id, created_at)
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination / streaming of a conversation's history in (created_at, id) order
+        Index("ix_messages_conversation_created", "conversation_id", "created_at", "id"),
+    )
     
     id = Column(String(36), primary_key=True, index=True)
     conversation_id = Column(String(36), ForeignKey("conversations.id", ondelete="CASCADE"))
@@ -231,13 +246,13 @@ class Message(Base):
     content = Column(Text, nullable=False)
     role = Column(String(50))
     token_count = Column(Integer)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # partition key
 
 class ToolCall(Base):
     __tablename__ = "tool_calls"
     
     id = Column(String(36), primary_key=True, index=True)
-    message_id = Column(String(36), ForeignKey("messages.id", ondelete="CASCADE"))
+    message_id = Column(String(36))  # messages.id; no FK into the partitioned table
     conversation_id = Column(String(36), ForeignKey("conversations.id"))
     step_number = Column(Integer, nullable=False)
     tool_name = Column(String(100), nullable=False)
@@ -245,28 +260,77 @@ class ToolCall(Base):
     output = Column(JSONB)
     latency_ms = Column(Integer)
     status = Column(String(20), nullable=False)  # 'success','failure','in_progress'
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # partition key
 
 class MemoryChunk(Base):
     __tablename__ = "memory_chunks"
-    
+    __table_args__ = (
+        Index("ix_memory_chunks_source", "source_type", "source_id"),
+        Index("ix_memory_chunks_created_at", "created_at"),
+        Index("ix_memory_chunks_metadata", "metadata", postgresql_using="gin", postgresql_ops={"metadata": "jsonb_path_ops"}),
+        # Keyset scan for reindex-missing only touches rows still lacking embeddings
+        Index("ix_memory_chunks_missing_embedding", "id", postgresql_where=text("embedding IS NULL")),
+        # Content-addressed dedupe: one row per (source scope, content); upsert target
+        Index("uq_memory_chunks_source_content", "source_type", "source_id", "content_sha256", unique=True),
+        # Cross-scope lookup so duplicate content can reuse an existing embedding
+        Index("ix_memory_chunks_content_sha256", "content_sha256"),
+    )
+
     id = Column(String(36), primary_key=True, index=True)
     source_type = Column(String(50), nullable=False)  # 'message','document','code'
     source_id = Column(String(36), nullable=False)
     content = Column(Text, nullable=False)
+    content_sha256 = Column(String(64), nullable=False)  # SHA-256 hex of content
     embedding = Column(Vector(1536))
     metadata_json = Column("metadata", JSONB)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # NOTE: content_tsv (generated tsvector + GIN index, migration 8d41f6a2c3e5) is Postgres-only
+    # and intentionally unmapped; hybrid search references it in raw SQL (services.vector_index)
 
 class Summary(Base):
     __tablename__ = "summaries"
+    __table_args__ = (
+        # Tree frontier (unmerged nodes) per conversation; legacy flat rows have level NULL
+        Index("ix_summaries_roots", "conversation_id", "level", "span_start_at", postgresql_where=text("parent_id IS NULL")),
+        Index("ix_summaries_parent", "parent_id"),
+    )
     
     id = Column(String(36), primary_key=True, index=True)
     conversation_id = Column(String(36), ForeignKey("conversations.id", ondelete="CASCADE"))
     summary = Column(Text, nullable=False)
     period = Column(String(20))  # 'hourly','daily','on_event'
     generated_by = Column(String(100))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # partition key
+    # Summary tree (services.summary_tree_service): level 0 = leaf over a message window
+    level = Column(Integer)
+    parent_id = Column(String(36))  # summaries.id; children may already be archived
+    span_start_at = Column(DateTime)  # first covered message (created_at, id)
+    span_start_id = Column(String(36))
+    span_end_at = Column(DateTime)  # last covered message (created_at, id)
+    span_end_id = Column(String(36))
+    message_count = Column(Integer)  # messages covered by this node
+    token_count = Column(Integer)  # tokens of the summary text itself
+
+class ArchiveManifest(Base):
+    """One compressed JSONL file holding a cold month of a partitioned table"""
+    __tablename__ = "archive_manifest"
+    __table_args__ = (
+        Index("ix_archive_manifest_table_range", "table_name", "range_start"),
+        Index("ix_archive_manifest_conversations", "conversation_ids", postgresql_using="gin"),
+    )
+
+    id = Column(String(36), primary_key=True)
+    table_name = Column(String(50), nullable=False)
+    partition_name = Column(String(80), nullable=False)
+    range_start = Column(DateTime, nullable=False)  # inclusive
+    range_end = Column(DateTime, nullable=False)  # exclusive
+    row_count = Column(Integer, nullable=False)
+    conversation_ids = Column(JSONB)  # distinct conversations with rows in the file
+    path = Column(Text, nullable=False)
+    compression = Column(String(10), nullable=False)  # 'zstd' | 'gzip'
+    bytes = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)  # of the compressed file
+    archived_at = Column(DateTime, default=datetime.utcnow)
 
 class KGNode(Base):
     __tablename__ = "kg_nodes"
@@ -278,7 +342,13 @@ class KGNode(Base):
 
 class KGEdge(Base):
     __tablename__ = "kg_edges"
-    
+    __table_args__ = (
+        # Adjacency in both directions for /kg/traverse (services.kg_service)
+        Index("ix_kg_edges_source", "source_node_id", "relationship_type", "target_node_id"),
+        Index("ix_kg_edges_target", "target_node_id", "relationship_type", "source_node_id"),
+        Index("ix_kg_edges_relationship_type", "relationship_type"),
+    )
+
     id = Column(String(36), primary_key=True, index=True)
     source_node_id = Column(String(36), ForeignKey("kg_nodes.id", ondelete="CASCADE"))
     target_node_id = Column(String(36), ForeignKey("kg_nodes.id", ondelete="CASCADE"))
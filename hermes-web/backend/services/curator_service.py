@@ -0,0 +1,212 @@
+"""
+Curator Service
+增量上下文整理 - 会话级运行计数器 + 摘要水位线，后台线程只摘要水位线之后的增量消息
+摘要写入层级摘要树 (services.summary_tree_service)
+"""
+
+import logging
+import queue
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from models import Conversation, Message, Summary
+from services.summary_tree_service import SummaryTreeService, summary_tree_service
+
+logger = logging.getLogger(__name__)
+
+
+def unsummarized_counts(conv: Conversation) -> Dict[str, int]:
+    """水位线之后的消息数 / token 数 (O(1)，来自计数器)"""
+    return {
+        "messages": (conv.message_count or 0) - (conv.summarized_message_count or 0),
+        "tokens": (conv.token_total or 0) - (conv.summarized_token_total or 0),
+    }
+
+
+def record_message(db: Session, conversation_id: str, token_count: int, at: Optional[datetime] = None) -> Optional[Conversation]:
+    """在当前事务内原子递增会话计数器（不提交），返回刷新后的会话"""
+    result = db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(
+            message_count=Conversation.message_count + 1,
+            token_total=Conversation.token_total + token_count,
+            updated_at=at or datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        return None
+    conv = db.get(Conversation, conversation_id)
+    db.refresh(conv)
+    return conv
+
+
+def record_messages(db: Session, deltas: Dict[str, Tuple[int, int, datetime]]) -> List[str]:
+    """批量版 record_message：每个会话一次 UPDATE (消息数, token 数, 最新时间)（不提交），返回存在的会话 id"""
+    updated: List[str] = []
+    for conversation_id, (count, tokens, at) in deltas.items():
+        result = db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(
+                message_count=Conversation.message_count + count,
+                token_total=Conversation.token_total + tokens,
+                updated_at=at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            updated.append(conversation_id)
+    return updated
+
+
+class CuratorService:
+    """后台整理 - 单工作线程，按会话去重排队"""
+
+    def __init__(self, tree: SummaryTreeService = summary_tree_service):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self.tree = tree
+        self.budget_messages = 50
+        self.budget_tokens = 8000
+        self.summarize_ratio = 0.6
+        self.enqueued = 0
+        self.runs = 0
+        self.summaries = 0  # tree nodes created (leaves + merged parents)
+        self.failures = 0
+
+    def configure(
+        self,
+        session_factory: Callable[[], Session],
+        budget_messages: int,
+        budget_tokens: int,
+        summarize_ratio: float = 0.6,
+    ) -> None:
+        """summarize/merge 回调与叶子窗口在 self.tree.configure 中设置"""
+        self._session_factory = session_factory
+        self.budget_messages = budget_messages
+        self.budget_tokens = budget_tokens
+        self.summarize_ratio = summarize_ratio
+
+    def over_budget(self, conv: Conversation) -> bool:
+        delta = unsummarized_counts(conv)
+        return delta["messages"] > self.budget_messages or delta["tokens"] > self.budget_tokens
+
+    def enqueue(self, conversation_id: str) -> bool:
+        """排队整理；同一会话已在队列中时不重复入队"""
+        with self._lock:
+            if conversation_id in self._pending:
+                return False
+            self._pending.add(conversation_id)
+            self.enqueued += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="curator", daemon=True)
+                self._thread.start()
+        self._queue.put(conversation_id)
+        return True
+
+    def drain(self) -> None:
+        """等待队列清空（测试/关停用）"""
+        self._queue.join()
+
+    def _worker(self) -> None:
+        while True:
+            conversation_id = self._queue.get()
+            with self._lock:
+                self._pending.discard(conversation_id)
+            db = self._session_factory()
+            try:
+                self.runs += 1
+                self.summaries += len(self.curate(db, conversation_id))
+            except Exception as e:
+                db.rollback()
+                self.failures += 1
+                logger.error(f"Curation failed for conversation {conversation_id}: {e}")
+            finally:
+                db.close()
+                self._queue.task_done()
+
+    def _next_window(self, db: Session, conv: Conversation, size: int) -> List[Message]:
+        q = db.query(Message).filter(Message.conversation_id == conv.id)
+        if conv.summary_watermark_at is not None:
+            q = q.filter(or_(
+                Message.created_at > conv.summary_watermark_at,
+                and_(Message.created_at == conv.summary_watermark_at, Message.id > conv.summary_watermark_id),
+            ))
+        return q.order_by(Message.created_at.asc(), Message.id.asc()).limit(size).all()
+
+    def curate(self, db: Session, conversation_id: str, force: bool = False) -> List[Summary]:
+        """把水位线之后的完整窗口写成叶子（向上合并）直到回到预算内，返回新建节点；未超预算时返回 []
+
+        仅当 token 预算先于一个完整窗口触发时，才把最早的 summarize_ratio 部分写成较短的叶子。
+        """
+        conv = db.get(Conversation, conversation_id)
+        if conv is None or not (force or self.over_budget(conv)):
+            db.rollback()
+            return []
+        # Summarize on a detached copy: the row is locked only for the final counter/watermark
+        # update, so record_message() on this conversation isn't blocked while summaries are written
+        db.expunge(conv)
+        start = (conv.summary_watermark_at, conv.summary_watermark_id)
+        created: List[Summary] = []
+        messages = tokens = 0
+        window = self.tree.leaf_window
+        while not created or self.over_budget(conv):
+            pending = unsummarized_counts(conv)["messages"]
+            if pending >= window:
+                size = window
+            elif not created:
+                size = max(1, int(pending * self.summarize_ratio))
+            else:
+                break
+            batch = self._next_window(db, conv, size)
+            if not batch:
+                break
+            created.extend(self.tree.add_leaf(db, conversation_id, batch))
+            last = batch[-1]
+            conv.summary_watermark_at = last.created_at
+            conv.summary_watermark_id = last.id
+            batch_tokens = sum(m.token_count or 0 for m in batch)
+            messages += len(batch)
+            tokens += batch_tokens
+            conv.summarized_message_count = (conv.summarized_message_count or 0) + len(batch)
+            conv.summarized_token_total = (conv.summarized_token_total or 0) + batch_tokens
+        if not created:
+            db.rollback()
+            return []
+        locked = (
+            db.query(Conversation)
+            .filter(Conversation.id == conversation_id)
+            .with_for_update()  # serialize with a concurrent /curate (or retention catch-up)
+            .one()
+        )
+        if (locked.summary_watermark_at, locked.summary_watermark_id) != start:
+            db.rollback()  # someone else summarized this range first; drop our nodes
+            return []
+        locked.summary_watermark_at = conv.summary_watermark_at
+        locked.summary_watermark_id = conv.summary_watermark_id
+        locked.summarized_message_count = (locked.summarized_message_count or 0) + messages
+        locked.summarized_token_total = (locked.summarized_token_total or 0) + tokens
+        db.commit()
+        return created
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "runs": self.runs,
+            "summaries": self.summaries,
+            "failures": self.failures,
+        }
+
+
+# 创建全局实例
+curator_service = CuratorService()
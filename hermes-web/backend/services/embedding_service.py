@@ -0,0 +1,134 @@
+"""
+Embedding Service
+本地确定性伪嵌入 (sha256 滚动哈希) - NumPy 向量化实现 + 内容哈希 LRU 缓存
+"""
+
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_EMBED_DIM = 1536
+
+# Binary batch frame: 16-byte little-endian header followed by count*dim row-major values
+#   magic b"HEMB" | version u8 | dtype u8 (1=float32, 2=float16) | reserved u16 | count u32 | dim u32
+FRAME_MAGIC = b"HEMB"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<4sBBHII")
+FRAME_DTYPES = {"f32": (1, "<f4"), "f16": (2, "<f2")}
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def _embed_digests(digests: Sequence[bytes], dim: int) -> np.ndarray:
+    """Vectorized port of the original per-float loop.
+
+    acc_i = (acc_{i-1} + h[i % 32]) % 256, v_i = acc_i / 255 * 2 - 1, then L2 normalize.
+    The running modulo equals cumsum(...) % 256, so rows come out identical to the loop
+    (up to summation order in the norm).
+    """
+    h = np.frombuffer(b"".join(digests), dtype=np.uint8).reshape(len(digests), -1)
+    cols = np.arange(dim) % h.shape[1]
+    acc = np.cumsum(h[:, cols], axis=1, dtype=np.int64) % 256
+    vals = (acc / 255.0) * 2.0 - 1.0
+    norms = np.sqrt(np.einsum("ij,ij->i", vals, vals))
+    norms[norms == 0] = 1.0
+    return vals / norms[:, None]
+
+
+class EmbeddingService:
+    """嵌入服务 - 按内容哈希缓存 (LRU, 容量上限, 命中/未命中计数)"""
+
+    method = "stub_sha256_norm"
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple[bytes, int], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, text: str, dim: int = DEFAULT_EMBED_DIM) -> np.ndarray:
+        """单条嵌入，返回只读 float64 向量"""
+        return self.embed_many([text], dim)[0]
+
+    def embed_many(self, texts: Sequence[str], dim: int = DEFAULT_EMBED_DIM) -> np.ndarray:
+        """批量嵌入，返回 (len(texts), dim) 矩阵；未命中部分一次性向量化计算"""
+        out = np.zeros((len(texts), dim), dtype=np.float64)
+        missing: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                if not text:
+                    continue  # empty text -> zero vector, never cached
+                key = (_digest(text), dim)
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    out[i] = cached
+                else:
+                    self.misses += 1
+                    missing.setdefault(key[0], []).append(i)
+        if missing:
+            digests = list(missing.keys())
+            computed = _embed_digests(digests, dim)
+            with self._lock:
+                for digest, row in zip(digests, computed):
+                    out[missing[digest]] = row
+                    if self.max_entries > 0:
+                        row = row.copy()  # don't pin the whole batch matrix
+                        row.setflags(write=False)
+                        self._cache[(digest, dim)] = row
+                        self._cache.move_to_end((digest, dim))
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        out.setflags(write=False)
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def encode_embeddings_frame(matrix: np.ndarray, dtype: str = "f32") -> bytes:
+    """将 (count, dim) 矩阵编码为二进制帧"""
+    if dtype not in FRAME_DTYPES:
+        raise ValueError(f"Unsupported frame dtype: {dtype}")
+    code, np_dtype = FRAME_DTYPES[dtype]
+    matrix = np.ascontiguousarray(matrix, dtype=np_dtype)
+    count, dim = matrix.shape
+    return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, code, 0, count, dim) + matrix.tobytes()
+
+
+def decode_embeddings_frame(data: bytes) -> np.ndarray:
+    """解码二进制帧为 (count, dim) 矩阵"""
+    magic, version, code, _, count, dim = FRAME_HEADER.unpack_from(data)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError("Not an embeddings frame")
+    np_dtype = next((d for c, d in FRAME_DTYPES.values() if c == code), None)
+    if np_dtype is None:
+        raise ValueError(f"Unknown frame dtype code: {code}")
+    return np.frombuffer(data, dtype=np_dtype, count=count * dim, offset=FRAME_HEADER.size).reshape(count, dim)
+
+
+# 创建全局实例
+embedding_service = EmbeddingService(max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")))
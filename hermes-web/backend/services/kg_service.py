@@ -0,0 +1,217 @@
+"""
+Knowledge Graph Service
+知识图谱遍历 - 有界多跳 BFS / 最短路径；Postgres 用递归 CTE 单条查询完成，其他方言逐层查询
+深度、每节点扇出、关系类型与访问预算均在库内限制 (ix_kg_edges_source / ix_kg_edges_target)
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.orm import Session
+
+from models import KGEdge, KGNode
+
+DIRECTIONS = ("out", "in", "both")
+
+
+def _edge_dict(edge_id, source, target, relationship_type, properties, created_at) -> Dict[str, Any]:
+    return {
+        "id": edge_id,
+        "source_node_id": source,
+        "target_node_id": target,
+        "relationship_type": relationship_type,
+        "properties": properties,
+        "created_at": created_at,
+    }
+
+
+def _steps_sql(direction: str, relationship_types: Optional[Sequence[str]]) -> str:
+    rel = " AND e.relationship_type = ANY(:rels)" if relationship_types else ""
+    branches = []
+    if direction in ("out", "both"):
+        branches.append(
+            "SELECT e.id AS edge_id, e.target_node_id AS node_id, e.created_at AS edge_at "
+            f"FROM kg_edges e WHERE e.source_node_id = w.node_id{rel}"
+        )
+    if direction in ("in", "both"):
+        branches.append(
+            "SELECT e.id AS edge_id, e.source_node_id AS node_id, e.created_at AS edge_at "
+            f"FROM kg_edges e WHERE e.target_node_id = w.node_id{rel}"
+        )
+    return " UNION ALL ".join(branches)
+
+
+def _traverse_postgres(
+    db: Session,
+    start_ids: List[str],
+    max_depth: int,
+    direction: str,
+    relationship_types: Optional[Sequence[str]],
+    max_fanout: int,
+    max_nodes: int,
+) -> Dict[str, Any]:
+    # walk enumerates simple paths level by level (the recursive term sees only the previous level),
+    # so the outer LIMIT stops the recursion after max_nodes visits; DISTINCT ON keeps each node's
+    # shallowest visit, i.e. its BFS depth and one shortest path to it. Columns are cast to plain
+    # varchar because both CTE terms must agree on the type modifier.
+    sql = text(f"""
+        WITH RECURSIVE walk(node_id, depth, path, edge_id) AS (
+            SELECT n.id::varchar, 0, ARRAY[n.id::text], NULL::varchar
+            FROM kg_nodes n
+            WHERE n.id = ANY(:start_ids)
+          UNION ALL
+            SELECT step.node_id::varchar, w.depth + 1, w.path || step.node_id::text, step.edge_id::varchar
+            FROM walk w
+            CROSS JOIN LATERAL (
+                {_steps_sql(direction, relationship_types)}
+                ORDER BY edge_at, edge_id
+                LIMIT :fanout
+            ) step
+            WHERE w.depth < :max_depth AND NOT step.node_id = ANY(w.path)
+        ),
+        bounded AS (
+            SELECT * FROM walk LIMIT :max_nodes
+        ),
+        first_visit AS (
+            SELECT DISTINCT ON (node_id) node_id, depth, path, edge_id
+            FROM bounded
+            ORDER BY node_id, depth, path
+        )
+        SELECT f.node_id, f.depth, f.path, n.entity_type, n.properties, n.created_at,
+               e.id AS edge_id, e.source_node_id, e.target_node_id, e.relationship_type,
+               e.properties AS edge_properties, e.created_at AS edge_created_at,
+               (SELECT count(*) FROM bounded) AS visits
+        FROM first_visit f
+        JOIN kg_nodes n ON n.id = f.node_id
+        LEFT JOIN kg_edges e ON e.id = f.edge_id
+        ORDER BY f.depth, f.node_id
+    """)
+    params: Dict[str, Any] = {
+        "start_ids": start_ids,
+        "max_depth": max_depth,
+        "fanout": max_fanout,
+        "max_nodes": max_nodes,
+    }
+    if relationship_types:
+        params["rels"] = list(relationship_types)
+    rows = db.execute(sql, params).mappings().all()
+    nodes = [
+        {
+            "id": r["node_id"],
+            "entity_type": r["entity_type"],
+            "properties": r["properties"],
+            "created_at": r["created_at"],
+            "depth": r["depth"],
+            "path": list(r["path"]),
+            "via_edge": _edge_dict(
+                r["edge_id"], r["source_node_id"], r["target_node_id"],
+                r["relationship_type"], r["edge_properties"], r["edge_created_at"],
+            ) if r["edge_id"] else None,
+        }
+        for r in rows
+    ]
+    visits = rows[0]["visits"] if rows else 0
+    return {"nodes": nodes, "visits": visits, "truncated": visits >= max_nodes}
+
+
+def _traverse_generic(
+    db: Session,
+    start_ids: List[str],
+    max_depth: int,
+    direction: str,
+    relationship_types: Optional[Sequence[str]],
+    max_fanout: int,
+    max_nodes: int,
+) -> Dict[str, Any]:
+    """逐层 BFS：每层一次邻接查询（而非每节点一次）"""
+    found = db.execute(select(KGNode.id).where(KGNode.id.in_(start_ids))).scalars().all()
+    visited: Dict[str, Dict[str, Any]] = {
+        node_id: {"depth": 0, "path": [node_id], "edge": None} for node_id in sorted(found)
+    }
+    frontier = list(visited)
+    visits = len(frontier)
+    truncated = visits >= max_nodes
+    depth = 0
+    while frontier and depth < max_depth and not truncated:
+        depth += 1
+        conditions = []
+        if direction in ("out", "both"):
+            conditions.append(KGEdge.source_node_id.in_(frontier))
+        if direction in ("in", "both"):
+            conditions.append(KGEdge.target_node_id.in_(frontier))
+        q = select(KGEdge).where(or_(*conditions))
+        if relationship_types:
+            q = q.where(KGEdge.relationship_type.in_(list(relationship_types)))
+        steps: Dict[str, List[tuple]] = {node_id: [] for node_id in frontier}
+        for edge in db.execute(q).scalars():
+            if direction in ("out", "both") and edge.source_node_id in steps:
+                steps[edge.source_node_id].append((edge, edge.target_node_id))
+            if direction in ("in", "both") and edge.target_node_id in steps:
+                steps[edge.target_node_id].append((edge, edge.source_node_id))
+        next_frontier: List[str] = []
+        for node_id in frontier:
+            path = visited[node_id]["path"]
+            expanded = sorted(steps[node_id], key=lambda s: (s[0].created_at or datetime.min, s[0].id))
+            for edge, neighbour in expanded[:max_fanout]:
+                if neighbour in path:
+                    continue
+                visits += 1
+                if neighbour not in visited:
+                    visited[neighbour] = {"depth": depth, "path": path + [neighbour], "edge": edge}
+                    next_frontier.append(neighbour)
+                if visits >= max_nodes:
+                    truncated = True
+                    break
+            if truncated:
+                break
+        frontier = next_frontier
+    details = {
+        n.id: n for n in db.execute(select(KGNode).where(KGNode.id.in_(list(visited)))).scalars()
+    }
+    nodes = []
+    for node_id, v in sorted(visited.items(), key=lambda kv: (kv[1]["depth"], kv[0])):
+        node, edge = details[node_id], v["edge"]
+        nodes.append({
+            "id": node_id,
+            "entity_type": node.entity_type,
+            "properties": node.properties,
+            "created_at": node.created_at,
+            "depth": v["depth"],
+            "path": v["path"],
+            "via_edge": _edge_dict(
+                edge.id, edge.source_node_id, edge.target_node_id,
+                edge.relationship_type, edge.properties, edge.created_at,
+            ) if edge is not None else None,
+        })
+    return {"nodes": nodes, "visits": visits, "truncated": truncated}
+
+
+def traverse(
+    db: Session,
+    start_ids: Sequence[str],
+    max_depth: int = 2,
+    direction: str = "both",
+    relationship_types: Optional[Sequence[str]] = None,
+    max_fanout: int = 50,
+    max_nodes: int = 1000,
+    target_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """从 start_ids 出发的有界 BFS
+
+    每个节点按边的创建时间最多展开 max_fanout 条边；max_nodes 为访问预算（含重复到达），
+    用尽时 truncated=True。节点按 (depth, id) 排序，path 为一条最短路径，via_edge 为到达它的边。
+    指定 target_id 时只返回该最短路径上的节点，path 为路径节点 id（不可达时为 None）。
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+    start_ids = list(dict.fromkeys(start_ids))
+    run = _traverse_postgres if db.get_bind().dialect.name == "postgresql" else _traverse_generic
+    result = run(db, start_ids, max_depth, direction, relationship_types, max_fanout, max_nodes)
+    result["path"] = None
+    if target_id is not None:
+        by_id = {n["id"]: n for n in result["nodes"]}
+        hit = by_id.get(target_id)
+        result["path"] = hit["path"] if hit else None
+        result["nodes"] = [by_id[node_id] for node_id in hit["path"]] if hit else []
+    return result
@@ -0,0 +1,205 @@
+"""
+Memory Ingest Service
+MemoryNexus 批量写入 - Postgres COPY (psycopg3 / asyncpg) / 多行 INSERT 回退，单事务
+内容寻址去重 - (source_type, source_id, content_sha256) 唯一，重复内容共享嵌入
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, literal_column, select, text, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+from models import MemoryChunk
+
+# Column order for COPY; must match _copy_row()
+COPY_COLUMNS = ("id", "source_type", "source_id", "content", "content_sha256", "embedding", "metadata", "created_at")
+DEDUPE_COLUMNS = ("source_type", "source_id", "content_sha256")
+UPSERT_BATCH_ROWS = 1000
+
+ChunkKey = Tuple[str, str, str]
+
+
+def content_sha256(content: str) -> str:
+    """内容哈希 (hex)，与迁移中的回填表达式一致"""
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def chunk_key(row: Dict[str, Any]) -> ChunkKey:
+    return (row["source_type"], row["source_id"], row["content_sha256"])
+
+
+def _vector_literal(embedding: Sequence[float]) -> str:
+    return "[" + ",".join(repr(float(v)) for v in embedding) + "]"
+
+
+def _copy_row(row: Dict[str, Any]) -> tuple:
+    embedding = row.get("embedding")
+    metadata = row.get("metadata_json")
+    return (
+        row["id"],
+        row["source_type"],
+        row["source_id"],
+        row["content"],
+        row["content_sha256"],
+        _vector_literal(embedding) if embedding is not None else None,
+        json.dumps(metadata) if metadata is not None else None,
+        row["created_at"],
+    )
+
+
+def _copy_driver(db: Session) -> Optional[str]:
+    """能走 COPY 的驱动：psycopg (同步 Session) / asyncpg (AsyncSession.run_sync)；其余返回 None"""
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql" and bind.dialect.driver in ("psycopg", "asyncpg"):
+        return bind.dialect.driver
+    return None
+
+
+def find_shared_embeddings(db: Session, hashes: Iterable[str]) -> Dict[str, List[float]]:
+    """按 content_sha256 查找已有嵌入，供重复内容复用 (ix_memory_chunks_content_sha256)"""
+    hashes = list({h for h in hashes if h})
+    if not hashes:
+        return {}
+    stmt = (
+        select(MemoryChunk.content_sha256, MemoryChunk.embedding)
+        .where(MemoryChunk.content_sha256.in_(hashes), MemoryChunk.embedding.isnot(None))
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = stmt.distinct(MemoryChunk.content_sha256)  # DISTINCT ON: one row per hash
+    shared: Dict[str, List[float]] = {}
+    for h, emb in db.execute(stmt).all():
+        shared.setdefault(h, list(emb))
+    return shared
+
+
+def upsert_chunks(db: Session, rows: List[Dict[str, Any]]) -> Tuple[List[str], str, int]:
+    """在当前事务内按 (source_type, source_id, content_sha256) upsert（不提交）
+
+    rows use ORM attribute names (id, source_type, source_id, content, content_sha256,
+    embedding, metadata_json, created_at). Returns (ids aligned with rows, write method
+    'copy' | 'insert', number of newly inserted rows). Duplicates - within the payload or
+    against stored rows - resolve to the existing id; a stored row keeps its embedding and
+    only picks up metadata / a missing embedding from the duplicate.
+    """
+    if not rows:
+        return [], "noop", 0
+    unique: Dict[ChunkKey, Dict[str, Any]] = {}
+    for row in rows:
+        unique.setdefault(chunk_key(row), row)
+    distinct_rows = list(unique.values())
+
+    if db.get_bind().dialect.name == "postgresql":
+        resolved, inserted, method = _upsert_postgres(db, distinct_rows)
+    else:
+        resolved, inserted, method = _upsert_generic(db, distinct_rows)
+    return [resolved[chunk_key(r)] for r in rows], method, inserted
+
+
+_ON_CONFLICT = """
+    ON CONFLICT (source_type, source_id, content_sha256) DO UPDATE SET
+        metadata = COALESCE(EXCLUDED.metadata, memory_chunks.metadata),
+        embedding = COALESCE(memory_chunks.embedding, EXCLUDED.embedding)
+    RETURNING id, source_type, source_id, content_sha256, (xmax = 0) AS inserted
+"""
+
+
+# asyncpg COPY is binary-only and the vector / jsonb columns only have text codecs on our
+# connections (core.database), so its staging table holds them as text and the INSERT casts
+_ASYNCPG_STAGE = """
+    CREATE TEMP TABLE IF NOT EXISTS memory_chunks_stage_text (
+        id varchar(36), source_type varchar, source_id varchar, content text, content_sha256 varchar(64),
+        embedding text, metadata text, created_at timestamp
+    ) ON COMMIT DELETE ROWS
+"""
+_ASYNCPG_SELECT = (
+    "SELECT id, source_type, source_id, content, content_sha256, embedding::vector, metadata::jsonb, created_at "
+    "FROM memory_chunks_stage_text"
+)
+
+
+def _upsert_postgres(db: Session, rows: List[Dict[str, Any]]) -> Tuple[Dict[ChunkKey, str], int, str]:
+    columns = ", ".join(COPY_COLUMNS)
+    driver = _copy_driver(db)
+    if driver == "asyncpg":
+        db.execute(text(_ASYNCPG_STAGE))
+        raw = db.connection().connection.driver_connection
+        # run_sync executes in a greenlet; await_only hands the coroutine back to the event loop
+        await_only(raw.copy_records_to_table(
+            "memory_chunks_stage_text", records=[_copy_row(row) for row in rows], columns=list(COPY_COLUMNS)
+        ))
+        result = db.execute(text(f"INSERT INTO memory_chunks ({columns}) {_ASYNCPG_SELECT}" + _ON_CONFLICT)).all()
+        db.execute(text("TRUNCATE memory_chunks_stage_text"))
+        method = "copy"
+    elif driver == "psycopg":
+        # COPY into a transaction-scoped staging table, then one INSERT ... SELECT ... ON CONFLICT
+        db.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS memory_chunks_stage "
+            "(LIKE memory_chunks INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        ))
+        raw = db.connection().connection.driver_connection
+        with raw.cursor() as cur:
+            with cur.copy(f"COPY memory_chunks_stage ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(_copy_row(row))
+        result = db.execute(text(
+            f"INSERT INTO memory_chunks ({columns}) SELECT {columns} FROM memory_chunks_stage" + _ON_CONFLICT
+        )).all()
+        db.execute(text("TRUNCATE memory_chunks_stage"))
+        method = "copy"
+    else:
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        result = []
+        # Multi-row VALUES per statement, kept well under the 65535 bind-parameter limit
+        for start in range(0, len(rows), UPSERT_BATCH_ROWS):
+            stmt = pg_insert(MemoryChunk).values(rows[start:start + UPSERT_BATCH_ROWS])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(DEDUPE_COLUMNS),
+                set_={
+                    "metadata": text("COALESCE(EXCLUDED.metadata, memory_chunks.metadata)"),
+                    "embedding": text("COALESCE(memory_chunks.embedding, EXCLUDED.embedding)"),
+                },
+            ).returning(
+                MemoryChunk.id, MemoryChunk.source_type, MemoryChunk.source_id, MemoryChunk.content_sha256,
+                literal_column("xmax = 0").label("inserted"),
+            )
+            result.extend(db.execute(stmt).all())
+        method = "insert"
+    resolved = {(r.source_type, r.source_id, r.content_sha256): r.id for r in result}
+    return resolved, sum(1 for r in result if r.inserted), method
+
+
+def _upsert_generic(db: Session, rows: List[Dict[str, Any]]) -> Tuple[Dict[ChunkKey, str], int, str]:
+    keys = [chunk_key(r) for r in rows]
+    existing: Dict[ChunkKey, Tuple[str, Optional[Any]]] = {}
+    for start in range(0, len(keys), 500):
+        part = keys[start:start + 500]
+        for r in db.execute(
+            select(
+                MemoryChunk.id, MemoryChunk.source_type, MemoryChunk.source_id,
+                MemoryChunk.content_sha256, MemoryChunk.embedding,
+            ).where(tuple_(MemoryChunk.source_type, MemoryChunk.source_id, MemoryChunk.content_sha256).in_(part))
+        ).all():
+            existing[(r.source_type, r.source_id, r.content_sha256)] = (r.id, r.embedding)
+    resolved: Dict[ChunkKey, str] = {}
+    new_rows: List[Dict[str, Any]] = []
+    for key, row in zip(keys, rows):
+        if key in existing:
+            chunk_id, embedding = existing[key]
+            resolved[key] = chunk_id
+            values: Dict[str, Any] = {}
+            if row.get("metadata_json") is not None:
+                values["metadata_json"] = row["metadata_json"]
+            if embedding is None and row.get("embedding") is not None:
+                values["embedding"] = row["embedding"]
+            if values:
+                db.query(MemoryChunk).filter(MemoryChunk.id == chunk_id).update(values, synchronize_session=False)
+        else:
+            resolved[key] = row["id"]
+            new_rows.append(row)
+    if new_rows:
+        # Executemany with insertmanyvalues batching -> multi-row INSERT statements
+        db.execute(insert(MemoryChunk), new_rows)
+    return resolved, len(new_rows), "insert"
@@ -0,0 +1,246 @@
+"""
+Orchestration Service
+工具编排 DAG 执行 - 步骤按 depends_on 边并发运行（有界并发），上游输出通过 "${steps.N.output.key}" 引用传入下游
+端到端耗时为关键路径，而不是各步耗时之和
+"""
+
+import asyncio
+import re
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+# Whole-value reference to an upstream step's output (optionally a nested key path)
+STEP_REF = re.compile(r"^\$\{steps\.(\d+)\.output((?:\.[A-Za-z0-9_\-]+)*)\}$")
+
+InvokeFn = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class PlanError(ValueError):
+    """编排计划不合法（重复步骤、未知依赖、环、引用了非依赖步骤）"""
+
+
+def step_refs(value: Any) -> Set[int]:
+    """输入中引用到的上游步骤号"""
+    if isinstance(value, str):
+        m = STEP_REF.match(value)
+        return {int(m.group(1))} if m else set()
+    if isinstance(value, dict):
+        return set().union(*(step_refs(v) for v in value.values()))
+    if isinstance(value, list):
+        return set().union(*(step_refs(v) for v in value))
+    return set()
+
+
+def resolve_refs(value: Any, outputs: Dict[int, Any]) -> Any:
+    """把 "${steps.N.output.a.b}" 替换为步骤 N 输出中的对应值（缺失的键为 None）"""
+    if isinstance(value, str):
+        m = STEP_REF.match(value)
+        if not m:
+            return value
+        resolved = outputs.get(int(m.group(1)))
+        for key in filter(None, m.group(2).split(".")):
+            resolved = resolved.get(key) if isinstance(resolved, dict) else None
+        return resolved
+    if isinstance(value, dict):
+        return {k: resolve_refs(v, outputs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_refs(v, outputs) for v in value]
+    return value
+
+
+def normalize_plan(plan: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """校验计划并按拓扑序返回 {step: step_dict}；缺少 depends_on 的步骤依赖前一步（兼容线性计划）"""
+    steps: Dict[int, Dict[str, Any]] = {}
+    previous: Optional[int] = None
+    for raw in plan:
+        if "step" not in raw or "tool" not in raw:
+            raise PlanError("Each step needs 'step' and 'tool'")
+        n = int(raw["step"])
+        if n in steps:
+            raise PlanError(f"Duplicate step {n}")
+        step = dict(raw, step=n)
+        if "depends_on" not in raw:
+            step["depends_on"] = [previous] if previous is not None else []
+        step["depends_on"] = sorted({int(d) for d in step["depends_on"]})
+        steps[n] = step
+        previous = n
+    for n, step in steps.items():
+        for d in step["depends_on"]:
+            if d == n:
+                raise PlanError(f"Step {n} depends on itself")
+            if d not in steps:
+                raise PlanError(f"Step {n} depends on unknown step {d}")
+        missing = step_refs(step.get("input") or {}) - set(step["depends_on"])
+        if missing:
+            raise PlanError(f"Step {n} references step(s) {sorted(missing)} without depending on them")
+    # Kahn's algorithm; leftovers form a cycle
+    indegree = {n: len(s["depends_on"]) for n, s in steps.items()}
+    ready = sorted(n for n, d in indegree.items() if d == 0)
+    order: List[int] = []
+    while ready:
+        n = ready.pop(0)
+        order.append(n)
+        for m, s in steps.items():
+            if n in s["depends_on"]:
+                indegree[m] -= 1
+                if indegree[m] == 0:
+                    ready.append(m)
+    if len(order) != len(steps):
+        raise PlanError(f"Dependency cycle among steps {sorted(set(steps) - set(order))}")
+    return {n: steps[n] for n in order}
+
+
+def critical_path(steps: Dict[int, Dict[str, Any]], durations: Dict[int, float]) -> Dict[str, Any]:
+    """已执行步骤中耗时最长的依赖链 (steps 需为拓扑序)"""
+    best: Dict[int, float] = {}
+    via: Dict[int, Optional[int]] = {}
+    for n, step in steps.items():
+        if n not in durations:
+            continue
+        parents = [d for d in step["depends_on"] if d in best]
+        parent = max(parents, key=lambda d: best[d]) if parents else None
+        best[n] = durations[n] + (best[parent] if parent is not None else 0.0)
+        via[n] = parent
+    if not best:
+        return {"steps": [], "ms": 0.0}
+    n: Optional[int] = max(best, key=lambda k: best[k])
+    total = best[n]
+    chain: List[int] = []
+    while n is not None:
+        chain.append(n)
+        n = via[n]
+    return {"steps": chain[::-1], "ms": round(total, 3)}
+
+
+class DagExecutor:
+    """DAG 执行器 - 依赖全部成功的步骤立即调度，信号量限制同时运行的步骤数"""
+
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max_concurrency
+        self.runs = 0
+        self.steps_run = 0
+        self.steps_failed = 0
+
+    def configure(self, max_concurrency: int) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def run(
+        self,
+        plan: List[Dict[str, Any]],
+        invoke: InvokeFn,
+        max_concurrency: Optional[int] = None,
+        fail_fast: bool = False,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """执行计划并逐条产出状态事件：run_started, step_started, step_succeeded / step_failed / step_skipped, run_finished
+
+        失败步骤的下游全部跳过，其余分支继续；fail_fast 时取消所有运行中的步骤。计划不合法时在首个事件前抛出 PlanError。
+        """
+        steps = normalize_plan(plan)
+        limit = max(1, min(max_concurrency or self.max_concurrency, self.max_concurrency))
+        semaphore = asyncio.Semaphore(limit)
+        queue: "asyncio.Queue[tuple]" = asyncio.Queue()
+        waiting = {n: set(s["depends_on"]) for n, s in steps.items()}
+        dependents: Dict[int, List[int]] = {n: [] for n in steps}
+        for n, s in steps.items():
+            for d in s["depends_on"]:
+                dependents[d].append(n)
+        outputs: Dict[int, Any] = {}
+        durations: Dict[int, float] = {}
+        status: Dict[int, str] = {}
+        tasks: Dict[int, asyncio.Task] = {}
+        started = time.monotonic()
+
+        async def run_step(n: int) -> None:
+            step = steps[n]
+            async with semaphore:
+                queue.put_nowait(("started", n, None))
+                t0 = time.monotonic()
+                try:
+                    output = await invoke(step, resolve_refs(step.get("input") or {}, outputs))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    queue.put_nowait(("failed", n, (e, (time.monotonic() - t0) * 1000)))
+                    return
+                queue.put_nowait(("succeeded", n, (output, (time.monotonic() - t0) * 1000)))
+
+        def launch(n: int) -> None:
+            tasks[n] = asyncio.create_task(run_step(n), name=f"orchestration-step-{n}")
+
+        def descendants(n: int) -> List[int]:
+            seen: List[int] = []
+            stack = list(dependents[n])
+            while stack:
+                m = stack.pop()
+                if m not in seen:
+                    seen.append(m)
+                    stack.extend(dependents[m])
+            return [m for m in steps if m in seen]  # topological order
+
+        def event(kind: str, n: int, **extra) -> Dict[str, Any]:
+            return {"event": kind, "step": n, "tool": steps[n]["tool"], **extra}
+
+        self.runs += 1
+        yield {"event": "run_started", "steps": list(steps), "max_concurrency": limit}
+        try:
+            for n, deps in waiting.items():
+                if not deps:
+                    launch(n)
+            while len(status) < len(steps):
+                kind, n, payload = await queue.get()
+                if n in status:
+                    continue  # late event from a step cancelled by fail_fast
+                if kind == "started":
+                    yield event("step_started", n, depends_on=steps[n]["depends_on"])
+                    continue
+                tasks.pop(n, None)
+                self.steps_run += 1
+                if kind == "succeeded":
+                    output, ms = payload
+                    outputs[n], durations[n], status[n] = output, ms, "succeeded"
+                    yield event("step_succeeded", n, output=output, latency_ms=round(ms, 3))
+                    for m in dependents[n]:
+                        waiting[m].discard(n)
+                        if not waiting[m] and m not in status:
+                            launch(m)
+                    continue
+                error, ms = payload
+                durations[n], status[n] = ms, "failed"
+                self.steps_failed += 1
+                yield event("step_failed", n, error=str(getattr(error, "detail", None) or error) or error.__class__.__name__, latency_ms=round(ms, 3))
+                if fail_fast:
+                    for m, task in list(tasks.items()):
+                        task.cancel()
+                    skipped = [m for m in steps if m not in status]
+                    reason = f"cancelled after step {n} failed"
+                else:
+                    skipped = [m for m in descendants(n) if m not in status]
+                    reason = f"upstream step {n} failed"
+                for m in skipped:
+                    status[m] = "skipped"
+                    tasks.pop(m, None)
+                    yield event("step_skipped", m, reason=reason)
+        finally:
+            # Client went away (generator closed) or fail_fast: don't leave steps running
+            for task in tasks.values():
+                task.cancel()
+        elapsed = (time.monotonic() - started) * 1000
+        yield {
+            "event": "run_finished",
+            "status": "succeeded" if all(s == "succeeded" for s in status.values()) else "failed",
+            "elapsed_ms": round(elapsed, 3),
+            "sum_latency_ms": round(sum(durations.values()), 3),
+            "critical_path": critical_path(steps, durations),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "runs": self.runs,
+            "steps_run": self.steps_run,
+            "steps_failed": self.steps_failed,
+        }
+
+
+# 创建全局实例
+dag_executor = DagExecutor()
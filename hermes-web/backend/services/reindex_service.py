@@ -0,0 +1,239 @@
+"""
+Reindex Service
+缺失嵌入的后台重建任务 - 键集分页流式读取、线程池批量嵌入、逐批批量 UPDATE 提交
+相同内容 (content_sha256) 复用已有嵌入，每批内每种内容只嵌入一次
+rebuild 模式不嵌入：按同样的键集分页把已有嵌入交给 on_batch（切换到进程内向量索引后回填）
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from models import MemoryChunk
+from services.memory_ingest_service import find_shared_embeddings
+
+logger = logging.getLogger(__name__)
+
+EmbedManyFn = Callable[[Sequence[str]], List[List[float]]]
+# Called after each committed batch with (session, [{"id","source_type","source_id","content","embedding","metadata","created_at"}])
+BatchHook = Callable[[Session, List[dict]], None]
+
+
+@dataclass
+class ReindexJob:
+    """重建任务状态"""
+    id: str
+    batch_size: int
+    workers: int
+    mode: str = "missing"  # missing: embed rows without one | rebuild: replay stored embeddings to on_batch
+    status: str = "pending"  # pending | running | completed | cancelled | failed
+    total: int = 0
+    updated: int = 0
+    shared: int = 0  # rows filled from an existing embedding of identical content
+    batches: int = 0
+    last_id: Optional[str] = None  # keyset cursor; resume continues after it
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    elapsed_seconds: float = 0.0
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _thread: Optional[threading.Thread] = field(default=None, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("pending", "running")
+
+    def progress(self) -> Dict[str, object]:
+        rate = self.updated / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+        remaining = max(0, self.total - self.updated)
+        return {
+            "job_id": self.id,
+            "mode": self.mode,
+            "status": self.status,
+            "total": self.total,
+            "updated": self.updated,
+            "shared": self.shared,
+            "batches": self.batches,
+            "batch_size": self.batch_size,
+            "workers": self.workers,
+            "last_id": self.last_id,
+            "percent": round(100.0 * self.updated / self.total, 2) if self.total else 100.0,
+            "rows_per_second": round(rate, 2),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 and self.active else None,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ReindexService:
+    """重建任务管理 - 同一时间仅允许一个活动任务"""
+
+    def __init__(self):
+        self.jobs: Dict[str, ReindexJob] = {}
+        self._lock = threading.Lock()
+
+    def active_job(self) -> Optional[ReindexJob]:
+        return next((j for j in self.jobs.values() if j.active), None)
+
+    def get(self, job_id: str) -> Optional[ReindexJob]:
+        return self.jobs.get(job_id)
+
+    def start(
+        self,
+        session_factory: Callable[[], Session],
+        embed_many: EmbedManyFn,
+        batch_size: int = 500,
+        workers: int = 4,
+        on_batch: Optional[BatchHook] = None,
+        rebuild: bool = False,
+    ) -> ReindexJob:
+        """启动新任务；已有活动任务时直接返回该任务"""
+        with self._lock:
+            job = self.active_job()
+            if job is not None:
+                return job
+            job = ReindexJob(
+                id=str(uuid.uuid4()), batch_size=batch_size, workers=workers, mode="rebuild" if rebuild else "missing"
+            )
+            self.jobs[job.id] = job
+            self._launch(job, session_factory, embed_many, on_batch)
+            return job
+
+    def resume(
+        self,
+        job_id: str,
+        session_factory: Callable[[], Session],
+        embed_many: EmbedManyFn,
+        on_batch: Optional[BatchHook] = None,
+    ) -> Optional[ReindexJob]:
+        """从 last_id 游标继续已取消/失败的任务"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.active or job.status == "completed":
+                return job
+            active = self.active_job()
+            if active is not None:
+                return active
+            job.status = "pending"
+            job.error = None
+            job.finished_at = None
+            job._cancel = threading.Event()
+            self._launch(job, session_factory, embed_many, on_batch)
+            return job
+
+    def cancel(self, job_id: str) -> Optional[ReindexJob]:
+        """请求取消；当前批次提交后停止"""
+        job = self.jobs.get(job_id)
+        if job is not None and job.active:
+            job._cancel.set()
+        return job
+
+    def _launch(self, job: ReindexJob, session_factory, embed_many, on_batch) -> None:
+        job._thread = threading.Thread(
+            target=self._run,
+            args=(job, session_factory, embed_many, on_batch),
+            name=f"reindex-{job.id[:8]}",
+            daemon=True,
+        )
+        job._thread.start()
+
+    @staticmethod
+    def _embed_batch(db: Session, rows, pool: ThreadPoolExecutor, embed_many: EmbedManyFn, workers: int):
+        """嵌入一批缺失行并提交批量 UPDATE；返回 (复用行数, 嵌入列表)"""
+        by_digest = find_shared_embeddings(db, [r.content_sha256 for r in rows])
+        reused = sum(1 for r in rows if r.content_sha256 in by_digest)
+        todo: Dict[str, str] = {}
+        for r in rows:
+            if r.content_sha256 not in by_digest:
+                todo.setdefault(r.content_sha256, r.content or "")
+        if todo:
+            digests, contents = list(todo.keys()), list(todo.values())
+            step = max(1, -(-len(contents) // max(1, workers)))
+            slices = [contents[i:i + step] for i in range(0, len(contents), step)]
+            computed = [emb for part in pool.map(embed_many, slices) for emb in part]
+            by_digest.update(zip(digests, computed))
+        embeddings = [by_digest[r.content_sha256] for r in rows]
+        params = [{"id": r.id, "embedding": emb} for r, emb in zip(rows, embeddings)]
+        db.execute(update(MemoryChunk), params)  # ORM bulk UPDATE by primary key
+        db.commit()
+        return reused, embeddings
+
+    def _run(self, job: ReindexJob, session_factory, embed_many: EmbedManyFn, on_batch: Optional[BatchHook]) -> None:
+        job.status = "running"
+        job.started_at = job.started_at or datetime.utcnow()
+        run_started = time.monotonic()
+        elapsed_before = job.elapsed_seconds
+        rebuild = job.mode == "rebuild"
+        pending = MemoryChunk.embedding.is_not(None) if rebuild else MemoryChunk.embedding.is_(None)
+        db = session_factory()
+        try:
+            missing = db.query(func.count(MemoryChunk.id)).filter(pending).scalar() or 0
+            job.total = job.updated + missing
+            db.rollback()  # don't hold the snapshot open between batches
+            with ThreadPoolExecutor(max_workers=max(1, job.workers), thread_name_prefix="reindex-embed") as pool:
+                while not job._cancel.is_set():
+                    q = db.query(
+                        MemoryChunk.id,
+                        MemoryChunk.source_type,
+                        MemoryChunk.source_id,
+                        MemoryChunk.content,
+                        MemoryChunk.content_sha256,
+                        MemoryChunk.metadata_json,
+                        MemoryChunk.created_at,
+                        *((MemoryChunk.embedding,) if rebuild else ()),
+                    ).filter(pending)
+                    if job.last_id is not None:
+                        q = q.filter(MemoryChunk.id > job.last_id)
+                    rows = q.order_by(MemoryChunk.id.asc()).limit(job.batch_size).all()
+                    if not rows:
+                        break
+                    if rebuild:
+                        # Stored embeddings only feed the hook: no embedding calls, no UPDATE
+                        db.rollback()
+                        reused = 0
+                        embeddings = [list(r.embedding) for r in rows]
+                    else:
+                        reused, embeddings = self._embed_batch(db, rows, pool, embed_many, job.workers)
+                    if on_batch is not None:
+                        on_batch(db, [
+                            {
+                                "id": r.id,
+                                "source_type": r.source_type,
+                                "source_id": r.source_id,
+                                "content": r.content,
+                                "embedding": emb,
+                                "metadata": r.metadata_json,
+                                "created_at": r.created_at,
+                            }
+                            for r, emb in zip(rows, embeddings)
+                        ])
+                    job.updated += len(rows)
+                    job.shared += reused
+                    job.batches += 1
+                    job.last_id = rows[-1].id
+                    job.elapsed_seconds = elapsed_before + (time.monotonic() - run_started)
+            job.status = "cancelled" if job._cancel.is_set() else "completed"
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e).splitlines()[0][:500] if str(e) else e.__class__.__name__
+            logger.error(f"Reindex job {job.id} failed after {job.updated} rows: {e}")
+        finally:
+            db.close()
+            job.elapsed_seconds = elapsed_before + (time.monotonic() - run_started)
+            job.finished_at = datetime.utcnow()
+
+
+# 创建全局实例
+reindex_service = ReindexService()
@@ -0,0 +1,507 @@
+"""
+Retention Service
+冷数据归档 - messages / tool_calls / summaries 按月分区 (Postgres)，超过保留期的月份
+从仍挂载的分区流式导出压缩 JSONL (zstd 可选，回退 gzip) -> 短事务内分离分区、记录清单、删除分区
+摘要树根节点留在热表；开启自动整理时，宽限期内未整理的消息也留在热表 (pinned_clause)。
+归档掉的未整理消息计入会话的已整理计数并推进水位线
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from sqlalchemy import Table, all_, and_, bindparam, delete, exists, func, or_, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from models import ArchiveManifest, Conversation, Message, Summary, ToolCall
+
+logger = logging.getLogger(__name__)
+
+# Archived in this order; all share created_at as the monthly partition key
+PARTITIONED_TABLES: Dict[str, Table] = {
+    "messages": Message.__table__,
+    "tool_calls": ToolCall.__table__,
+    "summaries": Summary.__table__,
+}
+ARCHIVE_FETCH_ROWS = 5000  # server-side cursor batch while copying a partition out
+# DETACH takes ACCESS EXCLUSIVE on the parent; give up quickly instead of queueing every
+# conversation read/write behind a long-running query (the month is retried on the next run).
+# DETACH ... CONCURRENTLY is not an option: Postgres refuses it while a default partition exists.
+DETACH_LOCK_TIMEOUT_MS = 2000
+# pg_try_advisory_lock key: only the process holding it runs the scheduled DDL (one per cluster)
+LEADER_LOCK_KEY = 0x4845524D  # "HERM"
+
+try:
+    import zstandard  # optional dependency
+except ImportError:  # pragma: no cover - depends on environment
+    zstandard = None
+
+
+def month_start(at: datetime) -> datetime:
+    return datetime(at.year, at.month, 1)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    """分区命名约定 (与迁移 4e6d8b0a2c19 一致): messages_p202501"""
+    return f"{table}_p{month:%Y%m}"
+
+
+def unsummarized_clause():
+    """消息在所属会话的整理水位线之后（尚未被摘要覆盖）"""
+    t, c = Message.__table__, Conversation.__table__
+    return exists().where(
+        c.c.id == t.c.conversation_id,
+        or_(
+            c.c.summary_watermark_at.is_(None),
+            t.c.created_at > c.c.summary_watermark_at,
+            and_(t.c.created_at == c.c.summary_watermark_at, t.c.id > c.c.summary_watermark_id),
+        ),
+    )
+
+
+def pinned_clause(table: str, pin_unsummarized: bool = True):
+    """仍在热路径上、不能随月份归档的行：摘要树根节点 (/context 与覆盖逻辑依赖)；pin_unsummarized 时还有未整理的消息
+
+    归档时这些行留在热表（Postgres 上回插父表，落入 default 分区），整理 / 合并之后的运行再归档。
+    旧版平铺摘要 (level 为 NULL) 不属于摘要树，照常归档。
+    """
+    t = PARTITIONED_TABLES[table]
+    if table == "messages":
+        return unsummarized_clause() if pin_unsummarized else None
+    if table == "summaries":
+        return and_(t.c.parent_id.is_(None), t.c.level.is_not(None))
+    return None
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Unserializable archive value: {type(value).__name__}")
+
+
+def resolve_compression(compression: str = "auto") -> str:
+    if compression == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("ARCHIVE_COMPRESSION=zstd requires the zstandard package")
+    if compression not in ("zstd", "gzip"):
+        raise ValueError(f"Unknown archive compression: {compression}")
+    return compression
+
+
+def _open_writer(path: str, compression: str):
+    if compression == "zstd":
+        raw = zstandard.ZstdCompressor(level=10).stream_writer(open(path, "wb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return gzip.open(path, "wt", encoding="utf-8")
+
+
+def _open_reader(path: str, compression: str):
+    if compression == "zstd":
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_archive(entry: ArchiveManifest, conversation_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """流式读取归档文件中的行 (可按会话过滤)；时间字段保持 ISO 字符串"""
+    with _open_reader(entry.path, entry.compression) as f:
+        for line in f:
+            row = json.loads(line)
+            if conversation_id is None or row.get("conversation_id") == conversation_id:
+                yield row
+
+
+class RetentionService:
+    """保留期任务 - 预建未来月份分区，归档并删除超过 retain_months 的月份"""
+
+    def __init__(self, archive_dir: str = "./data/archive", retain_months: int = 6, months_ahead: int = 3, compression: str = "auto"):
+        self.archive_dir = archive_dir
+        self.retain_months = retain_months
+        self.months_ahead = months_ahead
+        self.compression = compression
+        self.pin_unsummarized = False
+        self.pin_grace_months = 6
+        self.runs = 0
+        self.archived_partitions = 0
+        self.archived_rows = 0
+        self.failures = 0
+        self.last_run_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._leader: Optional[Any] = None  # connection holding LEADER_LOCK_KEY
+
+    def configure(
+        self,
+        archive_dir: str,
+        retain_months: int,
+        months_ahead: int,
+        compression: str,
+        pin_unsummarized: bool = False,
+        pin_grace_months: int = 6,
+    ) -> None:
+        """pin_unsummarized: 只在有整理任务推进水位线时开启；否则未整理的消息永远不会解除固定"""
+        resolve_compression(compression)  # fail at startup rather than on the first run
+        self.archive_dir = archive_dir
+        self.retain_months = max(1, retain_months)
+        self.months_ahead = max(1, months_ahead)
+        self.compression = compression
+        self.pin_unsummarized = pin_unsummarized
+        self.pin_grace_months = max(0, pin_grace_months)
+
+    @staticmethod
+    def _is_postgres(db: Session) -> bool:
+        return db.get_bind().dialect.name == "postgresql"
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """早于该月初的月份为冷数据 (当月 + 前 retain_months-1 个月保留在热表)"""
+        return add_months(month_start(now or datetime.utcnow()), -(self.retain_months - 1))
+
+    def pins_month(self, month: datetime, now: Optional[datetime] = None) -> bool:
+        """未整理的消息在该月是否仍被固定：开启固定且未超过保留期之外的宽限月数"""
+        return self.pin_unsummarized and month >= add_months(self.cutoff(now), -self.pin_grace_months)
+
+    def ensure_partitions(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """为每张表预建当月到未来 months_ahead 个月的分区（仅 Postgres，不提交），返回新建分区名"""
+        if not self._is_postgres(db):
+            return []
+        existing = self._partitions(db)
+        created: List[str] = []
+        month = month_start(now or datetime.utcnow())
+        for _ in range(self.months_ahead + 1):
+            upper = add_months(month, 1)
+            for table in PARTITIONED_TABLES:
+                name = partition_name(table, month)
+                if name in existing.get(table, {}):
+                    continue
+                self._create_partition(db, table, name, month, upper)
+                created.append(name)
+            month = upper
+        return created
+
+    def _create_partition(self, db: Session, table: str, name: str, month: datetime, upper: datetime) -> None:
+        bounds = f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        default = f"{table}_default"
+        window = {"lo": month, "hi": upper}
+        stray = False
+        if db.execute(text("SELECT to_regclass(:name)"), {"name": default}).scalar() is not None:
+            stray = db.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= :lo AND created_at < :hi)"
+            ), window).scalar()
+        if not stray:
+            db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} {bounds}"))
+            return
+        # Rows written while the month had no partition sit in the default partition, and Postgres
+        # refuses to create an overlapping partition; move them into a new table and attach it
+        db.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        db.execute(text(
+            f"WITH moved AS (DELETE FROM {default} WHERE created_at >= :lo AND created_at < :hi RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), window)
+        db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {bounds}"))
+        logger.info(f"Moved {table} rows for {month:%Y-%m} out of {default} into {name}")
+
+    def maintain(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """只预建分区并提交（归档为手动时的定时任务）"""
+        created = self.ensure_partitions(db, now)
+        db.commit()
+        return created
+
+    def _partitions(self, db: Session) -> Dict[str, Dict[str, datetime]]:
+        """{table: {partition_name: month}} - 只识别命名约定内的月分区，不含 default 分区"""
+        rows = db.execute(text(
+            "SELECT parent.relname AS parent, child.relname AS child "
+            "FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = ANY(:tables)"
+        ), {"tables": list(PARTITIONED_TABLES)}).all()
+        out: Dict[str, Dict[str, datetime]] = {}
+        for parent, child in rows:
+            suffix = child[len(parent) + 2:]
+            if child.startswith(f"{parent}_p") and len(suffix) == 6 and suffix.isdigit():
+                out.setdefault(parent, {})[child] = datetime(int(suffix[:4]), int(suffix[4:]), 1)
+        return out
+
+    def cold_months(self, db: Session, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """待归档的 (表, 月份)；Postgres 按现有分区，其他方言按数据中出现的月份"""
+        cutoff = self.cutoff(now)
+        candidates: List[Dict[str, Any]] = []
+        if self._is_postgres(db):
+            partitions = self._partitions(db)
+            for table in PARTITIONED_TABLES:
+                months = {month: name for name, month in partitions.get(table, {}).items() if month < cutoff}
+                # Rows kept back by earlier runs (pinned_clause) live in the default partition
+                for (month,) in db.execute(text(
+                    f"SELECT DISTINCT date_trunc('month', created_at) FROM {table}_default WHERE created_at < :cutoff"
+                ), {"cutoff": cutoff}).all():
+                    months.setdefault(month, partition_name(table, month))
+                for month in sorted(months):
+                    candidates.append({"table": table, "partition": months[month], "month": month})
+            return candidates
+        for table, t in PARTITIONED_TABLES.items():
+            first = db.execute(select(func.min(t.c.created_at))).scalar()
+            if first is None:
+                continue
+            month = month_start(first)
+            while month < cutoff:
+                candidates.append({"table": table, "partition": partition_name(table, month), "month": month})
+                month = add_months(month, 1)
+        return candidates
+
+    def _export(self, db: Session, source, path: str, compression: str) -> Tuple[int, Set[str], Set[str], Dict[str, list]]:
+        """写出未固定的行；返回 (行数, 会话 id, 被固定而留下的行 id, 归档的未整理消息 {会话: [条数, token, 最后时间, 最后 id]})
+        ——同一条语句判定，快照一致"""
+        rows = 0
+        conversations: Set[str] = set()
+        pinned: Set[str] = set()
+        unsummarized: Dict[str, list] = {}
+        with _open_writer(path, compression) as out:
+            result = db.execute(source.execution_options(yield_per=ARCHIVE_FETCH_ROWS)).mappings()
+            for row in result:
+                row = dict(row)
+                if row.pop("_pinned", False):
+                    pinned.add(row["id"])
+                    continue
+                if row.pop("_unsummarized", False):
+                    # Rows come ordered by (created_at, id): the last one seen is the new watermark
+                    n, tokens, _, _ = unsummarized.get(row["conversation_id"], (0, 0, None, None))
+                    unsummarized[row["conversation_id"]] = [n + 1, tokens + (row.get("token_count") or 0), row["created_at"], row["id"]]
+                out.write(json.dumps(row, default=_json_default, ensure_ascii=False))
+                out.write("\n")
+                rows += 1
+                if row.get("conversation_id"):
+                    conversations.add(row["conversation_id"])
+        return rows, conversations, pinned, unsummarized
+
+    @staticmethod
+    def _catch_up(db: Session, unsummarized: Dict[str, list]) -> None:
+        """归档的未整理消息算作已处理：计入已整理计数并把水位线推进到其后，未整理计数与整理起点保持一致"""
+        c = Conversation.__table__
+        for conversation_id, (n, tokens, last_at, last_id) in unsummarized.items():
+            db.execute(
+                c.update()
+                .where(
+                    c.c.id == conversation_id,
+                    # The curator may have moved past these rows meanwhile (and counted them)
+                    or_(
+                        c.c.summary_watermark_at.is_(None),
+                        c.c.summary_watermark_at < last_at,
+                        and_(c.c.summary_watermark_at == last_at, c.c.summary_watermark_id < last_id),
+                    ),
+                )
+                .values(
+                    summarized_message_count=func.coalesce(c.c.summarized_message_count, 0) + n,
+                    summarized_token_total=func.coalesce(c.c.summarized_token_total, 0) + tokens,
+                    summary_watermark_at=last_at,
+                    summary_watermark_id=last_id,
+                )
+            )
+
+    def archive_month(self, db: Session, table: str, month: datetime, now: Optional[datetime] = None) -> Optional[ArchiveManifest]:
+        """归档一个月的数据并提交；没有可归档的行时返回 None
+
+        导出在普通读事务中进行（分区仍挂载，按范围读取只命中该分区，不锁父表）；之后的短事务才分离分区、
+        核对行数、回插固定行 (pinned_clause)、写清单并删除分区。导出期间该月又有写入时核对失败并回滚
+        （分区保持挂载，下次重试）。失败时删除已写出的文件。没有月分区的月份（default 分区中的遗留行、
+        其他方言）按行删除。
+        """
+        t = PARTITIONED_TABLES[table]
+        name = partition_name(table, month)
+        upper = add_months(month, 1)
+        compression = resolve_compression(self.compression)
+        suffix = "zst" if compression == "zstd" else "gz"
+        directory = os.path.join(self.archive_dir, table)
+        os.makedirs(directory, exist_ok=True)
+        archive_id = str(uuid4())
+        path = os.path.join(directory, f"{name}-{archive_id[:8]}.jsonl.{suffix}")
+        tmp_path = path + ".tmp"
+        postgres = self._is_postgres(db)
+        attached = postgres and name in self._partitions(db).get(table, {})
+        in_range = and_(t.c.created_at >= month, t.c.created_at < upper)
+        pinned_expr = pinned_clause(table, self.pins_month(month, now))
+        columns = [t] if pinned_expr is None else [t, pinned_expr.label("_pinned")]
+        if table == "messages":
+            columns.append(unsummarized_clause().label("_unsummarized"))
+        source = select(*columns).where(in_range).order_by(t.c.created_at, t.c.id)
+        try:
+            rows, conversations, pinned, unsummarized = self._export(db, source, tmp_path, compression)
+            db.rollback()  # end the read transaction before touching the parent table
+            if rows:
+                os.replace(tmp_path, path)
+                size, sha256 = os.path.getsize(path), _file_sha256(path)
+            else:
+                os.remove(tmp_path)
+
+            # Short final transaction: detach, verify, keep pinned rows, record, drop
+            if attached:
+                db.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT_MS}ms'"))
+                db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                remaining = db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+            else:
+                remaining = db.execute(select(func.count()).select_from(t).where(in_range)).scalar()
+            if remaining != rows + len(pinned):
+                raise RuntimeError(f"{name} changed during export ({rows + len(pinned)} rows read, {remaining} now)")
+            if attached and pinned:
+                # The month's range is detached now, so these route to the default partition
+                db.execute(
+                    text(f"INSERT INTO {table} SELECT * FROM {name} WHERE id = ANY(:ids)"),
+                    {"ids": sorted(pinned)},
+                )
+            entry = None
+            if rows:
+                entry = ArchiveManifest(
+                    id=archive_id,
+                    table_name=table,
+                    partition_name=name,
+                    range_start=month,
+                    range_end=upper,
+                    row_count=rows,
+                    conversation_ids=sorted(conversations),
+                    path=path,
+                    compression=compression,
+                    bytes=size,
+                    sha256=sha256,
+                    archived_at=datetime.utcnow(),
+                )
+                db.add(entry)
+            self._catch_up(db, unsummarized)
+            if attached:
+                db.execute(text(f"DROP TABLE {name}"))
+            elif rows:
+                stmt = delete(t).where(in_range)
+                if pinned and postgres:
+                    stmt = stmt.where(t.c.id != all_(bindparam("pinned", sorted(pinned), type_=ARRAY(t.c.id.type))))
+                elif pinned:
+                    stmt = stmt.where(t.c.id.not_in(sorted(pinned)))
+                deleted = db.execute(stmt).rowcount
+                if deleted != rows:
+                    raise RuntimeError(f"{name} changed during export ({rows} rows exported, {deleted} deleted)")
+            db.commit()
+        except Exception:
+            db.rollback()
+            for leftover in (tmp_path, path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+        if entry is not None:
+            with self._lock:
+                self.archived_partitions += 1
+                self.archived_rows += rows
+        return entry
+
+    def run(self, db: Session, now: Optional[datetime] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """一次完整保留期任务：预建分区 + 逐月归档（每月单独提交）"""
+        candidates = self.cold_months(db, now)
+        if dry_run:
+            db.rollback()
+            return {"partitions_created": [], "candidates": candidates, "archived": []}
+        created = self.ensure_partitions(db, now)
+        db.commit()
+        archived: List[ArchiveManifest] = []
+        for c in candidates:
+            try:
+                entry = self.archive_month(db, c["table"], c["month"], now)
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                logger.error(f"Archiving {c['partition']} failed: {e}")
+                continue
+            if entry is not None:
+                archived.append(entry)
+        with self._lock:
+            self.runs += 1
+            self.last_run_at = datetime.utcnow()
+        return {"partitions_created": created, "candidates": candidates, "archived": archived}
+
+    def start(self, session_factory: Callable[[], Session], interval_seconds: float, archive: bool = True) -> None:
+        """后台定时执行 run()（archive=False 时只执行 maintain()），启动时立即执行一次；interval_seconds <= 0 时不启动"""
+        if interval_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+
+        def loop():
+            while True:
+                db = session_factory()
+                try:
+                    if not self._lead(db):
+                        logger.debug("Another process holds the retention lock; skipping this run")
+                    elif archive:
+                        self.run(db)
+                    else:
+                        self.maintain(db)
+                except Exception as e:
+                    logger.error(f"Retention {'run' if archive else 'partition maintenance'} failed: {e}")
+                finally:
+                    db.close()
+                if self._stop.wait(interval_seconds):
+                    self._resign()
+                    return
+
+        self._thread = threading.Thread(target=loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def _lead(self, db: Session) -> bool:
+        """每个集群只有一个进程执行定时 DDL：在一条专用连接上持有会话级 advisory lock（直到 stop / 进程退出）"""
+        if not self._is_postgres(db):
+            return True
+        if self._leader is not None and not self._leader.closed:
+            return True
+        conn = db.get_bind().connect()
+        if conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY}).scalar():
+            conn.commit()  # the lock is session-level; end the transaction, keep the connection
+            self._leader = conn
+            return True
+        conn.close()
+        return False
+
+    def _resign(self) -> None:
+        if self._leader is not None:
+            try:
+                # The connection goes back to the pool, not away: release the lock explicitly
+                self._leader.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LEADER_LOCK_KEY})
+                self._leader.commit()
+            finally:
+                self._leader.close()
+                self._leader = None
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "retain_months": self.retain_months,
+                "compression": self.compression,
+                "runs": self.runs,
+                "archived_partitions": self.archived_partitions,
+                "archived_rows": self.archived_rows,
+                "failures": self.failures,
+                "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            }
+
+
+# 创建全局实例
+retention_service = RetentionService()
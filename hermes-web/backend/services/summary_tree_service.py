@@ -0,0 +1,156 @@
+"""
+Summary Tree Service
+层级滚动摘要 - 叶子覆盖固定消息窗口，每 fanout 个未合并节点合并为父节点
+每次整理只新增叶子 + O(log n) 合并路径；任意时间范围由少量节点覆盖
+"""
+
+from datetime import datetime
+from typing import Callable, List, Optional
+from uuid import uuid4
+
+from sqlalchemy.orm import Session
+
+from models import Message, Summary
+from services.tokenizer_service import tokenizer_service
+
+SummarizeFn = Callable[[List[Message], int], str]
+MergeFn = Callable[[List[Summary], int], str]
+
+
+class SummaryTreeService:
+    """摘要树 - 未合并节点 (parent_id IS NULL) 构成前沿，每层最多 fanout-1 个"""
+
+    def __init__(self, leaf_window: int = 32, fanout: int = 4, target_tokens: int = 256):
+        self.leaf_window = leaf_window
+        self.fanout = fanout
+        self.target_tokens = target_tokens
+        self.generated_by = "summary_tree_v1"
+        self._summarize: Optional[SummarizeFn] = None
+        self._merge: Optional[MergeFn] = None
+
+    def configure(
+        self,
+        summarize: SummarizeFn,
+        merge: MergeFn,
+        leaf_window: Optional[int] = None,
+        fanout: Optional[int] = None,
+        target_tokens: Optional[int] = None,
+    ) -> None:
+        self._summarize = summarize
+        self._merge = merge
+        self.leaf_window = max(1, leaf_window or self.leaf_window)
+        self.fanout = max(2, fanout or self.fanout)
+        self.target_tokens = target_tokens or self.target_tokens
+
+    def _node(self, conversation_id: str, level: int, text: str, first, last, message_count: int) -> Summary:
+        return Summary(
+            id=str(uuid4()),
+            conversation_id=conversation_id,
+            summary=text,
+            period="on_event",
+            generated_by=self.generated_by,
+            created_at=datetime.utcnow(),
+            level=level,
+            span_start_at=first[0],
+            span_start_id=first[1],
+            span_end_at=last[0],
+            span_end_id=last[1],
+            message_count=message_count,
+            token_count=tokenizer_service.count(text) if text else 0,
+        )
+
+    def add_leaf(self, db: Session, conversation_id: str, messages: List[Message]) -> List[Summary]:
+        """为一个消息窗口写入叶子并向上合并（不提交），返回新建节点 [leaf, parent, ...]"""
+        leaf = self._node(
+            conversation_id,
+            0,
+            self._summarize(messages, self.target_tokens),
+            (messages[0].created_at, messages[0].id),
+            (messages[-1].created_at, messages[-1].id),
+            len(messages),
+        )
+        db.add(leaf)
+        db.flush()
+        return [leaf] + self._merge_up(db, conversation_id, 0)
+
+    def _merge_up(self, db: Session, conversation_id: str, level: int) -> List[Summary]:
+        # Like a base-`fanout` counter carry: each level holds < fanout orphans afterwards
+        created: List[Summary] = []
+        while True:
+            orphans = (
+                db.query(Summary)
+                .filter(
+                    Summary.conversation_id == conversation_id,
+                    Summary.level == level,
+                    Summary.parent_id.is_(None),
+                )
+                .order_by(Summary.span_start_at.asc(), Summary.span_start_id.asc())
+                .limit(self.fanout)
+                .all()
+            )
+            if len(orphans) < self.fanout:
+                return created
+            parent = self._node(
+                conversation_id,
+                level + 1,
+                self._merge(orphans, self.target_tokens),
+                (orphans[0].span_start_at, orphans[0].span_start_id),
+                (orphans[-1].span_end_at, orphans[-1].span_end_id),
+                sum(c.message_count or 0 for c in orphans),
+            )
+            db.add(parent)
+            db.flush()
+            for child in orphans:
+                child.parent_id = parent.id
+            db.flush()
+            created.append(parent)
+            level += 1
+
+    def roots(self, db: Session, conversation_id: str) -> List[Summary]:
+        """前沿节点 - 按时间顺序覆盖水位线之前的全部历史"""
+        return (
+            db.query(Summary)
+            .filter(
+                Summary.conversation_id == conversation_id,
+                Summary.level.isnot(None),
+                Summary.parent_id.is_(None),
+            )
+            .order_by(Summary.span_start_at.asc(), Summary.span_start_id.asc())
+            .all()
+        )
+
+    def cover(
+        self,
+        db: Session,
+        conversation_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Summary]:
+        """覆盖 [start, end) 的最少节点：完全落入范围的节点整体返回，部分重叠的向下展开到叶子"""
+        result: List[Summary] = []
+        for node in self.roots(db, conversation_id):
+            self._cover_node(db, node, start, end, result)
+        return result
+
+    def _cover_node(self, db: Session, node: Summary, start, end, result: List[Summary]) -> None:
+        if (end is not None and node.span_start_at >= end) or (start is not None and node.span_end_at < start):
+            return
+        inside = (start is None or node.span_start_at >= start) and (end is None or node.span_end_at < end)
+        if inside or not node.level:
+            result.append(node)
+            return
+        children = (
+            db.query(Summary)
+            .filter(Summary.parent_id == node.id)
+            .order_by(Summary.span_start_at.asc(), Summary.span_start_id.asc())
+            .all()
+        )
+        if not children:
+            result.append(node)  # children already archived (services.retention_service)
+            return
+        for child in children:
+            self._cover_node(db, child, start, end, result)
+
+
+# 创建全局实例
+summary_tree_service = SummaryTreeService()
@@ -0,0 +1,206 @@
+"""
+Tokenizer Service
+可插拔 token 计数 - tiktoken (可选) / 纯 Python BPE (本地 .tiktoken 词表，离线可用) / 正则启发式回退
+按内容哈希 LRU 缓存计数
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# cl100k_base pre-tokenizer. Python's `re` has no \p{L}/\p{N}; [^\W\d_] (letters) and \d are
+# close equivalents, so the stdlib pattern splits the same way on typical text.
+_PRETOKENIZE = re.compile(
+    r"'(?i:[sdmt]|ll|ve|re)|[^\r\n\w]?[^\W\d_]+|\d{1,3}| ?[^\s\w]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"
+)
+
+
+class Tokenizer(ABC):
+    """分词器抽象 - 只需计数"""
+
+    name: str = "abstract"
+    exact: bool = True  # False: an estimate, not the model's real token count
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """返回 text 的 token 数"""
+
+
+class TiktokenTokenizer(Tokenizer):
+    """tiktoken 后端 (需要已安装且编码文件可用)"""
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        import tiktoken  # optional dependency
+        self._encoding = tiktoken.get_encoding(encoding)
+        self.name = f"tiktoken:{encoding}"
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+class BPETokenizer(Tokenizer):
+    """纯 Python 字节级 BPE - 读取 tiktoken 格式词表 (每行: base64(token) rank)"""
+
+    def __init__(self, ranks: Dict[bytes, int], name: str = "bpe"):
+        self.ranks = ranks
+        self.name = name
+
+    @classmethod
+    def from_file(cls, path: str) -> "BPETokenizer":
+        ranks: Dict[bytes, int] = {}
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                token, rank = line.split()
+                ranks[base64.b64decode(token)] = int(rank)
+        return cls(ranks, name=f"bpe:{os.path.basename(path)}")
+
+    def _merge_count(self, piece: bytes) -> int:
+        if piece in self.ranks:
+            return 1
+        parts = [piece[i:i + 1] for i in range(len(piece))]
+        while len(parts) > 1:
+            best_idx, best_rank = -1, None
+            for i in range(len(parts) - 1):
+                rank = self.ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_idx, best_rank = i, rank
+            if best_rank is None:
+                break
+            parts[best_idx:best_idx + 2] = [parts[best_idx] + parts[best_idx + 1]]
+        return len(parts)
+
+    def count(self, text: str) -> int:
+        return sum(self._merge_count(m.group().encode("utf-8")) for m in _PRETOKENIZE.finditer(text))
+
+
+class HeuristicTokenizer(Tokenizer):
+    """无词表回退 - 按预分词切分，每段约 5 字节一个 token (常见英文词计为 1)"""
+
+    name = "heuristic"
+    exact = False
+
+    def count(self, text: str) -> int:
+        return sum(max(1, round(len(m.group().encode("utf-8")) / 5)) for m in _PRETOKENIZE.finditer(text))
+
+
+def load_tokenizer(backend: str = "auto", encoding: str = "cl100k_base", bpe_file: str = "") -> Tokenizer:
+    """按配置加载分词器；auto: tiktoken -> 本地 BPE 词表 -> 启发式"""
+    if backend in ("auto", "tiktoken"):
+        try:
+            return TiktokenTokenizer(encoding)
+        except Exception as e:
+            if backend == "tiktoken":
+                raise
+            logger.info(f"tiktoken unavailable ({e.__class__.__name__}); falling back")
+    if backend in ("auto", "bpe") and bpe_file:
+        if os.path.exists(bpe_file) or backend == "bpe":
+            return BPETokenizer.from_file(bpe_file)
+    if backend == "bpe":
+        raise ValueError("TOKENIZER_BACKEND=bpe requires TOKENIZER_BPE_FILE")
+    if backend not in ("auto", "heuristic"):
+        raise ValueError(f"Unknown tokenizer backend: {backend}")
+    if backend == "auto":
+        # No vocabulary ships with the repo: budgets and counters drift from the model's real counts
+        missing = f"TOKENIZER_BPE_FILE {bpe_file!r} not found" if bpe_file else "no TOKENIZER_BPE_FILE"
+        logger.warning(f"tiktoken unavailable and {missing}; token counts are heuristic estimates")
+    return HeuristicTokenizer()
+
+
+class TokenizerService:
+    """token 计数服务 - 延迟加载分词器，按内容哈希 LRU 缓存 (命中/未命中计数)"""
+
+    def __init__(self, backend: str = "auto", encoding: str = "cl100k_base", bpe_file: str = "", max_entries: int = 50000):
+        self.backend = backend
+        self.encoding = encoding
+        self.bpe_file = bpe_file
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._tokenizer: Optional[Tokenizer] = None
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def tokenizer(self) -> Tokenizer:
+        # Lazy: tiktoken may fetch its encoding file on first load
+        if self._tokenizer is None:
+            with self._lock:
+                if self._tokenizer is None:
+                    self._tokenizer = load_tokenizer(self.backend, self.encoding, self.bpe_file)
+        return self._tokenizer
+
+    def set_tokenizer(self, tokenizer: Tokenizer) -> None:
+        with self._lock:
+            self._tokenizer = tokenizer
+            self._cache.clear()
+
+    @property
+    def method(self) -> str:
+        return self.tokenizer.name
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        """批量计数；相同内容只分词一次"""
+        tokenizer = self.tokenizer
+        out = [0] * len(texts)
+        missing: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                if not text:
+                    continue
+                key = hashlib.sha256(text.encode("utf-8")).digest()
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    out[i] = cached
+                else:
+                    self.misses += 1
+                    missing.setdefault(key, []).append(i)
+        if missing:
+            computed = {key: tokenizer.count(texts[idx[0]]) for key, idx in missing.items()}
+            with self._lock:
+                for key, n in computed.items():
+                    for i in missing[key]:
+                        out[i] = n
+                    if self.max_entries > 0:
+                        self._cache[key] = n
+                        self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return out
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "method": self._tokenizer.name if self._tokenizer else None,  # None until the first count
+                "exact": self._tokenizer.exact if self._tokenizer else None,
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# 创建全局实例
+tokenizer_service = TokenizerService(
+    backend=os.getenv("TOKENIZER_BACKEND", "auto").lower(),
+    encoding=os.getenv("TOKENIZER_ENCODING", "cl100k_base"),
+    bpe_file=os.getenv("TOKENIZER_BPE_FILE", ""),
+    max_entries=int(os.getenv("TOKEN_CACHE_SIZE", "50000")),
+)
@@ -0,0 +1,193 @@
+"""
+Tool Cache Service
+幂等工具结果缓存 - 按 (tool_name, 规范化 JSON 输入的 sha256) 缓存输出，按工具开启并设置 TTL
+内存 LRU 一级 + 可选磁盘二级 (JSON 文件，进程重启后仍可命中)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CacheKey = Tuple[str, str]
+SAFE_DIR_NAME = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+
+def canonical_input_hash(input_data: Any) -> str:
+    """键顺序、空白无关的输入哈希 (hex)"""
+    canonical = json.dumps(input_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ToolCacheService:
+    """工具结果缓存 - 只缓存已开启工具的成功输出；条目以 JSON 文本保存，命中时返回新副本"""
+
+    def __init__(self, max_entries: int = 1000, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._ttl: Dict[str, float] = {}  # tool_name -> ttl seconds (opt-in)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def configure(self, max_entries: int, disk_dir: Optional[str] = None) -> None:
+        self.max_entries = max(0, max_entries)
+        self.disk_dir = disk_dir or None
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def enable(self, tool_name: str, ttl_seconds: float) -> None:
+        with self._lock:
+            self._ttl[tool_name] = ttl_seconds
+
+    def disable(self, tool_name: str) -> None:
+        with self._lock:
+            self._ttl.pop(tool_name, None)
+        self.invalidate(tool_name)
+
+    def enabled(self, tool_name: str) -> bool:
+        return tool_name in self._ttl
+
+    def _tool_dir(self, tool_name: str) -> str:
+        # Registered tool names are user input; never let them shape the path
+        name = tool_name if SAFE_DIR_NAME.match(tool_name) else "h_" + hashlib.sha256(tool_name.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.disk_dir, name)
+
+    def _path(self, key: CacheKey) -> str:
+        tool_name, digest = key
+        return os.path.join(self._tool_dir(tool_name), f"{digest}.json")
+
+    def _read_disk(self, key: CacheKey, now: float) -> Optional[Tuple[float, str]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("expires_at", 0) <= now:
+            self._remove_disk(key)
+            return None
+        return record["expires_at"], json.dumps(record["output"])
+
+    def _write_disk(self, key: CacheKey, expires_at: float, output: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "output": output}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _remove_disk(self, key: CacheKey) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, tool_name: str, input_data: Any) -> Optional[Any]:
+        """命中时返回输出副本；未开启、未命中或已过期返回 None"""
+        if not self.enabled(tool_name):
+            return None
+        key = (tool_name, canonical_input_hash(input_data))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[1])
+        if self.disk_dir:
+            entry = self._read_disk(key, now)
+            if entry is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._store(key, entry)
+                return json.loads(entry[1])
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, tool_name: str, input_data: Any, output: Any) -> bool:
+        """缓存一次成功输出（输出必须可 JSON 序列化）；工具未开启时忽略"""
+        ttl = self._ttl.get(tool_name)
+        if ttl is None:
+            return False
+        try:
+            serialized = json.dumps(output, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return False
+        key = (tool_name, canonical_input_hash(input_data))
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store(key, (expires_at, serialized))
+        if self.disk_dir:
+            self._write_disk(key, expires_at, output)
+        return True
+
+    def _store(self, key: CacheKey, entry: Tuple[float, str]) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1  # the disk tier (if any) keeps evicted entries until they expire
+
+    def invalidate(self, tool_name: Optional[str] = None, input_data: Any = None) -> int:
+        """删除条目：指定 input 时只删该输入，否则删该工具（或全部）；返回删除的内存条目数"""
+        if tool_name is not None and input_data is not None:
+            keys = [(tool_name, canonical_input_hash(input_data))]
+        else:
+            with self._lock:
+                keys = [k for k in self._entries if tool_name is None or k[0] == tool_name]
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    removed += 1
+        if self.disk_dir:
+            if tool_name is not None and input_data is not None:
+                self._remove_disk(keys[0])
+            else:
+                if tool_name is not None:
+                    directories = [self._tool_dir(tool_name)]
+                else:
+                    directories = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir)]
+                for directory in directories:
+                    if not os.path.isdir(directory):
+                        continue
+                    for filename in os.listdir(directory):
+                        if filename.endswith(".json"):
+                            os.remove(os.path.join(directory, filename))
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_dir": self.disk_dir,
+                "tools": dict(self._ttl),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# 创建全局实例
+tool_cache_service = ToolCacheService()
@@ -0,0 +1,234 @@
+"""
+Tool Executor Service
+工具执行层 - 按声明的执行类型把工具调用移出事件循环：
+async (直接 await) / thread (阻塞 I/O，线程池) / process (CPU 密集，进程池) / subprocess (asyncio 子进程)
+每个工具可设并发上限与超时；取消或超时会杀掉子进程（整个进程组）
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+KINDS = ("async", "thread", "process", "subprocess")
+MAX_OUTPUT_BYTES = 64 * 1024  # stdout / stderr tail kept per subprocess run
+
+
+class ToolTimeoutError(Exception):
+    """工具调用超过其超时时间（已取消；子进程已被杀掉）"""
+
+    def __init__(self, tool_name: str, timeout_s: float):
+        super().__init__(f"Tool '{tool_name}' timed out after {timeout_s:g}s")
+        self.tool_name = tool_name
+        self.timeout_s = timeout_s
+
+
+@dataclass
+class ToolPolicy:
+    kind: str = "async"
+    max_concurrency: Optional[int] = None  # None: unlimited
+    timeout_s: Optional[float] = None  # None: no timeout
+
+
+def registered_tool_stub(input_data: dict) -> dict:
+    """/tools/register 注册的工具尚未接入提供方时的占位执行体（模块级，可在线程 / 进程池中运行）"""
+    return {"result": "stub", "input": input_data}
+
+
+def _tail(data: bytes, limit: int = MAX_OUTPUT_BYTES) -> str:
+    return data[-limit:].decode("utf-8", errors="replace")
+
+
+def _kill(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is not None:
+        return
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signal.SIGKILL)  # started in its own session: take the children too
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class ToolExecutor:
+    """按工具策略执行调用；线程池 / 进程池按需创建，进程池用 spawn 避免在带线程的进程里 fork"""
+
+    def __init__(self, max_threads: int = 8, max_processes: int = 2):
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self._policies: Dict[str, ToolPolicy] = {}
+        self._limits: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def configure(self, max_threads: int, max_processes: int) -> None:
+        self.shutdown()
+        self.max_threads = max(1, max_threads)
+        self.max_processes = max(1, max_processes)
+
+    def declare(self, tool_name: str, kind: str = "async", max_concurrency: Optional[int] = None, timeout_s: Optional[float] = None) -> None:
+        if kind not in KINDS:
+            raise ValueError(f"Unknown execution kind '{kind}' (expected one of {', '.join(KINDS)})")
+        with self._lock:
+            self._policies[tool_name] = ToolPolicy(kind, max_concurrency or None, timeout_s or None)
+            self._limits.pop(tool_name, None)
+
+    def policy(self, tool_name: str) -> ToolPolicy:
+        return self._policies.get(tool_name) or ToolPolicy()
+
+    def _limit(self, tool_name: str, max_concurrency: int) -> asyncio.Semaphore:
+        # Semaphores bind to the loop they first block on; keep one per running loop
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._limits.get(tool_name)
+            if entry is None or entry[0] is not loop:
+                entry = self._limits[tool_name] = (loop, asyncio.Semaphore(max_concurrency))
+            return entry[1]
+
+    def _pool(self, kind: str):
+        with self._lock:
+            if kind == "thread":
+                if self._threads is None:
+                    self._threads = ThreadPoolExecutor(self.max_threads, thread_name_prefix="tool")
+                return self._threads
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(self.max_processes, mp_context=multiprocessing.get_context("spawn"))
+            return self._processes
+
+    def _count(self, tool_name: str, field: str, delta: int = 1) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(
+                tool_name, {"running": 0, "waiting": 0, "completed": 0, "failed": 0, "timeouts": 0, "cancelled": 0}
+            )
+            counters[field] += delta
+
+    async def run(self, tool_name: str, fn: Callable[[dict], Any], input_data: dict) -> Any:
+        """按工具策略执行 fn(input_data)
+
+        async / subprocess 类型的 fn 是协程函数（subprocess 工具在内部调用 run_subprocess）；
+        thread / process 类型的 fn 是普通函数，process 类型还要求 fn 与参数可 pickle（模块级函数）。
+        线程 / 进程中已开始的调用在超时后无法中断，只是不再等待其结果；
+        其并发名额（与 running 计数）保留到调用真正结束后才释放。
+        """
+        policy = self.policy(tool_name)
+        if policy.kind in ("thread", "process") and asyncio.iscoroutinefunction(fn):
+            raise TypeError(f"Tool '{tool_name}' is declared '{policy.kind}' but its body is a coroutine function")
+        limit = self._limit(tool_name, policy.max_concurrency) if policy.max_concurrency else None
+        if limit is not None:
+            self._count(tool_name, "waiting")
+            try:
+                await limit.acquire()
+            finally:
+                self._count(tool_name, "waiting", -1)
+        self._count(tool_name, "running")
+        loop = asyncio.get_running_loop()
+        work = None
+        try:
+            if policy.kind in ("thread", "process"):
+                work = self._pool(policy.kind).submit(fn, input_data)
+                call = asyncio.wrap_future(work)  # cancelling it cancels work that hasn't started yet
+            else:
+                call = fn(input_data)
+            if policy.timeout_s:
+                result = await asyncio.wait_for(call, policy.timeout_s)
+            else:
+                result = await call
+        except asyncio.TimeoutError:
+            self._count(tool_name, "timeouts")
+            raise ToolTimeoutError(tool_name, policy.timeout_s) from None
+        except asyncio.CancelledError:
+            self._count(tool_name, "cancelled")
+            raise
+        except Exception:
+            self._count(tool_name, "failed")
+            raise
+        finally:
+            if work is not None and not work.done():
+                # Timed out or cancelled, but the worker can't be interrupted: keep its slot
+                # until it actually finishes so max_concurrency bounds real pool usage
+                work.add_done_callback(lambda _: self._release_later(loop, tool_name, limit))
+            else:
+                self._release(tool_name, limit)
+        self._count(tool_name, "completed")
+        return result
+
+    def _release(self, tool_name: str, limit: Optional[asyncio.Semaphore]) -> None:
+        self._count(tool_name, "running", -1)
+        if limit is not None:
+            limit.release()
+
+    def _release_later(self, loop: asyncio.AbstractEventLoop, tool_name: str, limit: Optional[asyncio.Semaphore]) -> None:
+        # Runs on the worker thread (or the process pool's manager thread)
+        try:
+            loop.call_soon_threadsafe(self._release, tool_name, limit)
+        except RuntimeError:  # loop already closed: nobody is left waiting on the semaphore
+            self._count(tool_name, "running", -1)
+
+    async def run_subprocess(
+        self,
+        argv: Sequence[str],
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        stdin: Optional[bytes] = None,
+    ) -> Dict[str, Any]:
+        """运行子进程（不经 shell）并收集输出尾部；被取消时杀掉整个进程组后再抛出"""
+        started = time.monotonic()
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            cwd=cwd,
+            env=env,
+            stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        try:
+            stdout, stderr = await proc.communicate(stdin)
+        except BaseException:
+            _kill(proc)
+            await proc.wait()
+            raise
+        return {
+            "argv": list(argv),
+            "returncode": proc.returncode,
+            "stdout": _tail(stdout),
+            "stderr": _tail(stderr),
+            "duration_ms": round((time.monotonic() - started) * 1000, 3),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_threads": self.max_threads,
+                "max_processes": self.max_processes,
+                "tools": {
+                    name: {
+                        "kind": policy.kind,
+                        "max_concurrency": policy.max_concurrency,
+                        "timeout_s": policy.timeout_s,
+                        **self._counters.get(name, {}),
+                    }
+                    for name, policy in self._policies.items()
+                },
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            threads, processes = self._threads, self._processes
+            self._threads = self._processes = None
+        if threads is not None:
+            threads.shutdown(wait=False, cancel_futures=True)
+        if processes is not None:
+            processes.shutdown(wait=False, cancel_futures=True)
+
+
+# 创建全局实例
+tool_executor = ToolExecutor()
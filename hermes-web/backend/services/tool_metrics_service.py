@@ -0,0 +1,110 @@
+"""
+Tool Metrics Service
+工具调用耗时统计 - 每个 tool_name 一个 HDR 风格对数分桶直方图 (p50/p95/p99) + 错误率
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+SUB_BUCKETS = 64  # per power-of-two range; relative bucket width <= 2 / SUB_BUCKETS (~3%)
+
+
+def bucket_index(value: int, sub_buckets: int = SUB_BUCKETS) -> int:
+    """值 (微秒) -> 桶号：< sub_buckets 时每个整数一个桶，之后每个 2 的幂区间 sub_buckets/2 个线性子桶"""
+    if value < sub_buckets:
+        return max(0, value)
+    half = sub_buckets // 2
+    shift = value.bit_length() - sub_buckets.bit_length() + 1
+    return sub_buckets + (shift - 1) * half + ((value >> shift) - half)
+
+
+def bucket_bounds(index: int, sub_buckets: int = SUB_BUCKETS) -> Tuple[int, int]:
+    """桶号 -> [lower, upper) 微秒"""
+    if index < sub_buckets:
+        return index, index + 1
+    half = sub_buckets // 2
+    shift, offset = divmod(index - sub_buckets, half)
+    shift += 1
+    sub = offset + half
+    return sub << shift, (sub + 1) << shift
+
+
+class LatencyHistogram:
+    """稀疏对数分桶直方图（微秒精度），分位数取桶中点"""
+
+    def __init__(self, sub_buckets: int = SUB_BUCKETS):
+        self.sub_buckets = sub_buckets
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.errors = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        us = max(0, int(seconds * 1_000_000))
+        index = bucket_index(us, self.sub_buckets)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.errors += 0 if ok else 1
+        self.total_us += us
+        self.min_us = us if self.min_us is None else min(self.min_us, us)
+        self.max_us = max(self.max_us, us)
+
+    def percentile(self, q: float) -> float:
+        """q in (0, 1]；返回毫秒"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                lower, upper = bucket_bounds(index, self.sub_buckets)
+                return min((lower + upper - 1) / 2, self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.count, 4) if self.count else 0.0,
+            "total_ms": round(self.total_us / 1000, 3),
+            "mean_ms": round(self.total_us / self.count / 1000, 3) if self.count else 0.0,
+            "min_ms": round((self.min_us or 0) / 1000, 3),
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max_us / 1000, 3),
+        }
+
+
+class ToolMetricsService:
+    """按工具名聚合调用耗时（进程内，重启清零）"""
+
+    def __init__(self, sub_buckets: int = SUB_BUCKETS):
+        self.sub_buckets = sub_buckets
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool_name: str, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            histogram = self._histograms.get(tool_name)
+            if histogram is None:
+                histogram = self._histograms[tool_name] = LatencyHistogram(self.sub_buckets)
+            histogram.record(seconds, ok)
+
+    def stats(self, tool_name: str) -> Dict[str, Any]:
+        with self._lock:
+            histogram = self._histograms.get(tool_name) or LatencyHistogram(self.sub_buckets)
+            return {"tool_name": tool_name, **histogram.summary()}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """全部工具，按累计耗时降序（占用工作流时间最多的在前）"""
+        with self._lock:
+            summaries = {name: h.summary() for name, h in self._histograms.items()}
+        return dict(sorted(summaries.items(), key=lambda kv: kv[1]["total_ms"], reverse=True))
+
+
+# 创建全局实例
+tool_metrics_service = ToolMetricsService()
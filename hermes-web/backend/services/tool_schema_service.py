@@ -0,0 +1,345 @@
+"""
+Tool Schema Service
+工具输入 JSON Schema 编译 - 注册时把 schema 编译成嵌套闭包，执行时只跑闭包不再解释 schema 字典
+支持 type (含多类型) / enum / const / properties / required / additionalProperties / items (含元组形式) /
+minItems / maxItems / minLength / maxLength / pattern / minimum / maximum / exclusiveMinimum / exclusiveMaximum /
+allOf / anyOf / oneOf；其余关键字（如 $ref、format）与 JSON Schema 一样忽略
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Union
+
+Validator = Callable[[Any], None]
+PathPart = Union[str, int]
+
+
+class SchemaError(ValueError):
+    """schema 本身无效（注册时报错）"""
+
+
+class ValidationError(ValueError):
+    """输入不符合 schema；path 由外层闭包在异常上抛途中补全，成功路径上不拼接路径"""
+
+    def __init__(self, reason: str, path: Optional[List[PathPart]] = None, missing: bool = False):
+        super().__init__(reason)
+        self.reason = reason
+        self.path: List[PathPart] = path or []
+        self.missing = missing
+
+    @property
+    def location(self) -> str:
+        out = ""
+        for part in self.path:
+            out += f"[{part}]" if isinstance(part, int) else (f".{part}" if out else part)
+        return out
+
+    def __str__(self) -> str:
+        if self.missing:
+            return f"Missing required field: {self.location}"
+        if not self.path:
+            return f"Input {self.reason}"
+        return f"Field '{self.location}' {self.reason}"
+
+
+def _is_integer(v: Any) -> bool:
+    return (isinstance(v, int) and not isinstance(v, bool)) or (isinstance(v, float) and v.is_integer())
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+# Plain isinstance classes; number / integer also have to rule out bool
+TYPE_CLASSES = {"string": str, "boolean": bool, "object": dict, "array": list, "null": type(None)}
+
+TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "number": _is_number,
+    "integer": _is_integer,
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+
+
+def _accept(value: Any) -> None:
+    return None
+
+
+def _number(schema: dict, key: str) -> Optional[float]:
+    if key not in schema:
+        return None
+    value = schema[key]
+    if not _is_number(value):
+        raise SchemaError(f"'{key}' must be a number")
+    return value
+
+
+def _count(schema: dict, key: str) -> Optional[int]:
+    if key not in schema:
+        return None
+    value = schema[key]
+    if not _is_integer(value) or value < 0:
+        raise SchemaError(f"'{key}' must be a non-negative integer")
+    return int(value)
+
+
+def _compile_type(schema: dict) -> Optional[Validator]:
+    if "type" not in schema:
+        return None
+    names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+    unknown = [n for n in names if n not in TYPE_CHECKS]
+    if unknown or not names:
+        raise SchemaError(f"Unknown type {unknown[0] if unknown else '[]'!r} (expected one of {', '.join(TYPE_CHECKS)})")
+    reason = f"expects type {' | '.join(names)}"
+    if all(n in TYPE_CLASSES for n in names):
+        classes = tuple(TYPE_CLASSES[n] for n in names)
+
+        def check_type(v):
+            if not isinstance(v, classes):
+                raise ValidationError(reason)
+    elif len(names) == 1:
+        check = TYPE_CHECKS[names[0]]
+
+        def check_type(v):
+            if not check(v):
+                raise ValidationError(reason)
+    else:
+        checks = tuple(TYPE_CHECKS[n] for n in names)
+
+        def check_type(v):
+            for check in checks:
+                if check(v):
+                    return
+            raise ValidationError(reason)
+    return check_type
+
+
+def _compile_values(schema: dict) -> List[Validator]:
+    checks: List[Validator] = []
+    if "enum" in schema:
+        options = schema["enum"]
+        if not isinstance(options, list) or not options:
+            raise SchemaError("'enum' must be a non-empty array")
+        reason = f"must be one of {options}"
+
+        def check_enum(v):
+            # 1 == True in Python; JSON keeps booleans and numbers apart
+            if not any(v == o and isinstance(v, bool) == isinstance(o, bool) for o in options):
+                raise ValidationError(reason)
+        checks.append(check_enum)
+    if "const" in schema:
+        const = schema["const"]
+        reason = f"must equal {const!r}"
+
+        def check_const(v):
+            if v != const or isinstance(v, bool) != isinstance(const, bool):
+                raise ValidationError(reason)
+        checks.append(check_const)
+    return checks
+
+
+def _compile_string(schema: dict) -> List[Validator]:
+    checks: List[Validator] = []
+    min_len, max_len = _count(schema, "minLength"), _count(schema, "maxLength")
+    if min_len is not None or max_len is not None:
+        lo, hi = min_len or 0, max_len
+
+        def check_length(v):
+            if isinstance(v, str) and (len(v) < lo or (hi is not None and len(v) > hi)):
+                raise ValidationError(f"length must be {'between %d and %d' % (lo, hi) if hi is not None else 'at least %d' % lo}")
+        checks.append(check_length)
+    if "pattern" in schema:
+        try:
+            search = re.compile(schema["pattern"]).search
+        except (re.error, TypeError) as e:
+            raise SchemaError(f"Invalid pattern {schema['pattern']!r}: {e}") from None
+        reason = f"must match pattern {schema['pattern']!r}"
+
+        def check_pattern(v):
+            if isinstance(v, str) and search(v) is None:
+                raise ValidationError(reason)
+        checks.append(check_pattern)
+    return checks
+
+
+def _compile_numeric(schema: dict) -> List[Validator]:
+    bounds = []
+    for key, fails, word in (
+        ("minimum", lambda v, b: v < b, ">="),
+        ("maximum", lambda v, b: v > b, "<="),
+        ("exclusiveMinimum", lambda v, b: v <= b, ">"),
+        ("exclusiveMaximum", lambda v, b: v >= b, "<"),
+    ):
+        bound = _number(schema, key)
+        if bound is not None:
+            bounds.append((fails, bound, f"must be {word} {bound}"))
+    if not bounds:
+        return []
+    bounds = tuple(bounds)
+
+    def check_range(v):
+        if _is_number(v):
+            for fails, bound, reason in bounds:
+                if fails(v, bound):
+                    raise ValidationError(reason)
+    return [check_range]
+
+
+def _compile_object(schema: dict) -> List[Validator]:
+    properties = schema.get("properties", {})
+    required = schema.get("required", [])
+    additional = schema.get("additionalProperties", True)
+    if not isinstance(properties, dict):
+        raise SchemaError("'properties' must be an object")
+    if not isinstance(required, list) or not all(isinstance(r, str) for r in required):
+        raise SchemaError("'required' must be an array of strings")
+    compiled = tuple((key, v) for key, v in ((key, _compile(s)) for key, s in properties.items()) if v is not _accept)
+    names = frozenset(properties)
+    required = tuple(required)
+    if additional is True or additional == {}:
+        extra = None
+    elif additional is False:
+        extra = False
+    else:
+        extra = _compile(additional)
+    if not compiled and not required and extra is None:
+        return []
+
+    def check_object(v):
+        if not isinstance(v, dict):
+            return
+        for key in required:
+            if key not in v:
+                raise ValidationError("missing", [key], missing=True)
+        key = None
+        try:
+            # One try around the loops: the failing key is still bound when the error surfaces
+            for key, validator in compiled:
+                if key in v:
+                    validator(v[key])
+            if extra is not None:
+                for key in v:
+                    if key not in names:
+                        if extra is False:
+                            raise ValidationError("is not allowed")
+                        extra(v[key])
+        except ValidationError as e:
+            e.path.insert(0, key)
+            raise
+    return [check_object]
+
+
+def _compile_array(schema: dict) -> List[Validator]:
+    checks: List[Validator] = []
+    items = schema.get("items")
+    if isinstance(items, list):
+        prefix = tuple(_compile(s) for s in items)
+
+        def check_prefix(v):
+            if isinstance(v, list):
+                i = 0
+                try:
+                    for i, (validator, item) in enumerate(zip(prefix, v)):
+                        validator(item)
+                except ValidationError as e:
+                    e.path.insert(0, i)
+                    raise
+        checks.append(check_prefix)
+    elif items is not None:
+        item_validator = _compile(items)
+        if item_validator is not _accept:
+            def check_items(v):
+                if isinstance(v, list):
+                    i = 0
+                    try:
+                        for item in v:
+                            item_validator(item)
+                            i += 1
+                    except ValidationError as e:
+                        e.path.insert(0, i)
+                        raise
+            checks.append(check_items)
+    min_items, max_items = _count(schema, "minItems"), _count(schema, "maxItems")
+    if min_items is not None or max_items is not None:
+        lo, hi = min_items or 0, max_items
+
+        def check_size(v):
+            if isinstance(v, list) and (len(v) < lo or (hi is not None and len(v) > hi)):
+                raise ValidationError(f"must have {'between %d and %d' % (lo, hi) if hi is not None else 'at least %d' % lo} items")
+        checks.append(check_size)
+    return checks
+
+
+def _compile_combinators(schema: dict) -> List[Validator]:
+    checks: List[Validator] = []
+    for key in ("allOf", "anyOf", "oneOf"):
+        if key not in schema:
+            continue
+        if not isinstance(schema[key], list) or not schema[key]:
+            raise SchemaError(f"'{key}' must be a non-empty array")
+        branches = tuple(_compile(s) for s in schema[key])
+        if key == "allOf":
+            checks.extend(branches)
+            continue
+
+        def passes(validator, v):
+            try:
+                validator(v)
+            except ValidationError:
+                return False
+            return True
+
+        if key == "anyOf":
+            def check_any(v, branches=branches):
+                if not any(passes(b, v) for b in branches):
+                    raise ValidationError("does not match any allowed schema (anyOf)")
+            checks.append(check_any)
+        else:
+            def check_one(v, branches=branches):
+                if sum(passes(b, v) for b in branches) != 1:
+                    raise ValidationError("must match exactly one schema (oneOf)")
+            checks.append(check_one)
+    return checks
+
+
+def _compile(schema: Any) -> Validator:
+    if schema is True or schema == {}:
+        return _accept
+    if not isinstance(schema, dict):
+        raise SchemaError(f"Schema must be an object, got {type(schema).__name__}")
+    checks: List[Validator] = []
+    check_type = _compile_type(schema)
+    if check_type is not None:
+        checks.append(check_type)
+    # Type first: later checks only look at values of their own type
+    for part in (_compile_values, _compile_string, _compile_numeric, _compile_object, _compile_array, _compile_combinators):
+        checks.extend(part(schema))
+    if not checks:
+        return _accept
+    if len(checks) == 1:
+        return checks[0]
+    if len(checks) == 2:
+        first, second = checks
+
+        def validate(v):
+            first(v)
+            second(v)
+        return validate
+    checks = tuple(checks)
+
+    def validate(v):
+        for check in checks:
+            check(v)
+    return validate
+
+
+def compile_schema(schema: Optional[dict]) -> Validator:
+    """编译 schema；返回 validator(data)，不符合时抛 ValidationError，schema 无效时抛 SchemaError"""
+    if not schema:
+        return _accept
+    try:
+        return _compile(schema)
+    except RecursionError:
+        raise SchemaError("Schema is nested too deeply") from None
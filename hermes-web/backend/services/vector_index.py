@@ -0,0 +1,791 @@
+"""
+Vector Index Service
+MemoryNexus 向量检索后端 - pgvector (数据库) 与 NumPy 内存映射 (本地/边缘部署)
+可选量化存储 (pgvector halfvec / NumPy int8) + 全精度重排
+"""
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from models import MemoryChunk
+
+
+@dataclass
+class VectorRecord:
+    """待写入索引的向量记录"""
+    id: str
+    source_type: str
+    source_id: str
+    content: str
+    embedding: Sequence[float]
+    metadata: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+
+
+@dataclass
+class VectorHit:
+    """检索命中结果"""
+    id: str
+    source_type: str
+    source_id: str
+    content: str
+    score: float
+
+
+def _json_contains(doc: Any, sub: Any) -> bool:
+    """Python equivalent of JSONB ``doc @> sub``"""
+    if isinstance(sub, dict):
+        return isinstance(doc, dict) and all(k in doc and _json_contains(doc[k], v) for k, v in sub.items())
+    if isinstance(sub, list):
+        if not isinstance(doc, list):
+            return False
+        return all(any(_json_contains(d, v) for d in doc) for v in sub)
+    if isinstance(doc, list):
+        return any(_json_contains(d, sub) for d in doc)
+    return doc == sub
+
+
+@dataclass
+class SearchFilters:
+    """检索过滤条件 - 对应 (source_type, source_id) B-tree、metadata GIN、created_at B-tree 索引"""
+    source_type: Optional[str] = None
+    source_id: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None  # JSONB containment: metadata @> filter
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    def __post_init__(self):
+        # created_at is naive UTC (timestamp without time zone); asyncpg refuses to bind an aware
+        # datetime against it and the in-memory backend cannot compare the two
+        for name in ("created_after", "created_before"):
+            value = getattr(self, name)
+            if value is not None and value.tzinfo is not None:
+                setattr(self, name, value.astimezone(timezone.utc).replace(tzinfo=None))
+
+    def is_empty(self) -> bool:
+        return not (self.source_type or self.source_id or self.metadata
+                    or self.created_after or self.created_before)
+
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        """内存后端逐条过滤"""
+        if self.source_type and entry.get("source_type") != self.source_type:
+            return False
+        if self.source_id and entry.get("source_id") != self.source_id:
+            return False
+        if self.metadata and not _json_contains(entry.get("metadata") or {}, self.metadata):
+            return False
+        if self.created_after or self.created_before:
+            created = entry.get("created_at")
+            if not created:
+                return False
+            created = datetime.fromisoformat(created)
+            if self.created_after and created < self.created_after:
+                return False
+            if self.created_before and created >= self.created_before:
+                return False
+        return True
+
+
+def _merge_filters(source_type: Optional[str], filters: Optional[SearchFilters]) -> SearchFilters:
+    filters = SearchFilters(**vars(filters)) if filters else SearchFilters()
+    if source_type and not filters.source_type:
+        filters.source_type = source_type
+    return filters
+
+
+class VectorIndex(ABC):
+    """向量索引抽象 - /memory/chunks/search 背后的可插拔后端"""
+
+    name: str = "abstract"
+
+    @abstractmethod
+    def upsert(self, records: Iterable[VectorRecord]) -> int:
+        """写入或覆盖记录，返回写入数量"""
+
+    @abstractmethod
+    def remove(self, ids: Iterable[str]) -> int:
+        """删除记录，返回删除数量"""
+
+    @abstractmethod
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int = 5,
+        source_type: Optional[str] = None,
+        filters: Optional[SearchFilters] = None,
+        **options,
+    ) -> List[VectorHit]:
+        """按余弦相似度返回 top_k 命中"""
+
+    def search_hybrid(
+        self,
+        query: Sequence[float],
+        query_text: str,
+        top_k: int = 5,
+        source_type: Optional[str] = None,
+        rrf_k: int = 60,
+        candidates: Optional[int] = None,
+        filters: Optional[SearchFilters] = None,
+        **options,
+    ) -> List[VectorHit]:
+        """词法 + 向量混合检索 (RRF 融合)"""
+        raise NotImplementedError(f"Hybrid search is not supported by the {self.name} backend")
+
+
+# 'halfvec': ANN over the half-precision expression index, exact re-rank on the vector column
+PG_QUANTIZATION_MODES = {"none", "halfvec"}
+# Index each pgvector quantization mode searches (migrations 5b7e2c1d9a40 / f7c3a8e1d254)
+PG_ANN_INDEXES = {"none": "ix_memory_chunks_embedding_ann", "halfvec": "ix_memory_chunks_embedding_halfvec_ann"}
+# 'int8': symmetric scalar quantization with one float32 scale per vector
+NUMPY_QUANTIZATION_MODES = {"none", "int8"}
+
+
+# pgvector >= 0.8: keep scanning the HNSW graph until enough rows pass the filters
+# ('relaxed_order' | 'strict_order'); empty leaves the server default (off)
+_ITERATIVE_SCAN_MODES = {"relaxed_order", "strict_order", "off"}
+
+
+def apply_ann_search_settings(
+    db: Session,
+    ef_search: Optional[int],
+    probes: Optional[int],
+    iterative_scan: Optional[str] = None,
+) -> None:
+    """Scope ANN tuning knobs to the current transaction (SET LOCAL)."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    # SET does not accept bind params; values are validated ints / whitelisted names
+    if ef_search:
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+    if probes:
+        db.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+    if iterative_scan in _ITERATIVE_SCAN_MODES:
+        db.execute(text(f"SET LOCAL hnsw.iterative_scan = {iterative_scan}"))
+        db.execute(text(f"SET LOCAL ivfflat.iterative_scan = {'off' if iterative_scan == 'off' else 'relaxed_order'}"))
+
+
+def check_vector_config(backend: str, quantization: str) -> None:
+    """后端与量化方式的组合在启动时校验，而不是每次检索返回 400"""
+    modes = {"pgvector": PG_QUANTIZATION_MODES, "numpy": NUMPY_QUANTIZATION_MODES}.get(backend)
+    if modes is None:
+        raise ValueError(f"Unknown vector index backend: {backend}")
+    if quantization not in modes:
+        raise ValueError(
+            f"MEMORY_ANN_QUANTIZATION={quantization} is not supported by the {backend} backend "
+            f"(expected one of: {', '.join(sorted(modes))})"
+        )
+
+
+def check_ann_index(db: Session, quantization: str) -> None:
+    """Fail fast when the ANN index the configured mode searches is missing: every search would scan sequentially.
+
+    Migration f7c3a8e1d254 keeps exactly one of them, chosen by MEMORY_ANN_QUANTIZATION when it ran.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    found = db.execute(
+        text("SELECT 1 FROM pg_indexes WHERE tablename = 'memory_chunks' AND indexname = :name"),
+        {"name": PG_ANN_INDEXES[quantization]},
+    ).first()
+    if found is None:
+        raise RuntimeError(
+            f"MEMORY_ANN_QUANTIZATION={quantization} but index {PG_ANN_INDEXES[quantization]} does not exist; "
+            "run migration f7c3a8e1d254 with the same MEMORY_ANN_QUANTIZATION (downgrade and upgrade it to switch)"
+        )
+
+
+def _orm_filter_clauses(filters: SearchFilters) -> list:
+    clauses = []
+    if filters.source_type:
+        clauses.append(MemoryChunk.source_type == filters.source_type)
+    if filters.source_id:
+        clauses.append(MemoryChunk.source_id == filters.source_id)
+    if filters.metadata:
+        clauses.append(MemoryChunk.metadata_json.contains(filters.metadata))
+    if filters.created_after:
+        clauses.append(MemoryChunk.created_at >= filters.created_after)
+    if filters.created_before:
+        clauses.append(MemoryChunk.created_at < filters.created_before)
+    return clauses
+
+
+def _sql_filter_fragment(filters: SearchFilters) -> Tuple[str, Dict[str, Any], list]:
+    """Raw-SQL equivalent of _orm_filter_clauses for the hybrid CTE query."""
+    parts: List[str] = []
+    params: Dict[str, Any] = {}
+    binds = []
+    if filters.source_type:
+        parts.append("source_type = :f_source_type")
+        params["f_source_type"] = filters.source_type
+    if filters.source_id:
+        parts.append("source_id = :f_source_id")
+        params["f_source_id"] = filters.source_id
+    if filters.metadata:
+        parts.append("metadata @> :f_metadata")
+        params["f_metadata"] = filters.metadata
+        binds.append(bindparam("f_metadata", type_=JSONB))
+    if filters.created_after:
+        parts.append("created_at >= :f_created_after")
+        params["f_created_after"] = filters.created_after
+    if filters.created_before:
+        parts.append("created_at < :f_created_before")
+        params["f_created_before"] = filters.created_before
+    return "".join(f" AND {p}" for p in parts), params, binds
+
+
+class PgVectorIndex(VectorIndex):
+    """pgvector 后端 - memory_chunks 表本身即索引，写入由 ORM 完成
+
+    quantization='halfvec' searches the half-precision expression index
+    (migration f7c3a8e1d254, pgvector >= 0.7.0) for ``top_k * rerank_factor`` candidates,
+    then re-ranks them by exact distance against the full-precision column.
+    """
+
+    name = "pgvector"
+
+    def __init__(self, db: Session, quantization: str = "none", rerank_factor: int = 4):
+        if quantization not in PG_QUANTIZATION_MODES:
+            raise ValueError(f"Unknown pgvector quantization: {quantization}")
+        self.db = db
+        self.quantization = quantization
+        self.rerank_factor = max(1, rerank_factor)
+
+    def _ann_order(self, param: str) -> str:
+        """ORDER BY expression that matches the ANN index for the configured storage."""
+        if self.quantization == "halfvec":
+            dim = MemoryChunk.embedding.type.dim
+            return f"embedding::halfvec({dim}) <=> CAST(:{param} AS halfvec({dim}))"
+        return f"embedding <=> :{param}"
+
+    def upsert(self, records: Iterable[VectorRecord]) -> int:
+        # Rows (and their embeddings) are persisted by the ORM handlers
+        return 0
+
+    def remove(self, ids: Iterable[str]) -> int:
+        return 0
+
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int = 5,
+        source_type: Optional[str] = None,
+        filters: Optional[SearchFilters] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        iterative_scan: Optional[str] = None,
+        **options,
+    ) -> List[VectorHit]:
+        filters = _merge_filters(source_type, filters)
+        if self.quantization != "none":
+            return self._search_reranked(query, top_k, filters, ef_search, probes, iterative_scan)
+        apply_ann_search_settings(self.db, ef_search, probes, iterative_scan if not filters.is_empty() else None)
+        # ORDER BY the bare `<=>` operator so the planner can use the HNSW/IVFFlat index;
+        # sorting by an expression over it (1 - distance) forces a sequential scan.
+        distance = MemoryChunk.embedding.cosine_distance(list(query))
+        q = self.db.query(
+            MemoryChunk.id,
+            MemoryChunk.source_type,
+            MemoryChunk.source_id,
+            MemoryChunk.content,
+            distance.label("distance"),
+        ).filter(MemoryChunk.embedding.isnot(None), *_orm_filter_clauses(filters))
+        rows = q.order_by(distance).limit(top_k).all()
+        return [
+            VectorHit(
+                id=r.id,
+                source_type=r.source_type,
+                source_id=r.source_id,
+                content=r.content,
+                score=1.0 - float(r.distance) if r.distance is not None else 0.0,
+            )
+            for r in rows
+        ]
+
+    def _search_reranked(
+        self,
+        query: Sequence[float],
+        top_k: int,
+        filters: SearchFilters,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        iterative_scan: Optional[str],
+    ) -> List[VectorHit]:
+        """ANN over the compact index, exact re-rank of the candidates in the same query."""
+        candidates = top_k * self.rerank_factor
+        apply_ann_search_settings(
+            self.db,
+            max(ef_search or 0, candidates),
+            probes,
+            iterative_scan if not filters.is_empty() else None,
+        )
+        source_filter, filter_params, filter_binds = _sql_filter_fragment(filters)
+        sql = text(f"""
+            SELECT m.id, m.source_type, m.source_id, m.content,
+                   m.embedding <=> :query_embedding AS distance
+            FROM (
+                SELECT id
+                FROM memory_chunks
+                WHERE embedding IS NOT NULL{source_filter}
+                ORDER BY {self._ann_order("query_embedding")}
+                LIMIT :candidates
+            ) ann
+            JOIN memory_chunks m ON m.id = ann.id
+            ORDER BY distance
+            LIMIT :top_k
+        """).bindparams(bindparam("query_embedding", type_=MemoryChunk.embedding.type), *filter_binds)
+        params = {"query_embedding": list(query), "candidates": candidates, "top_k": top_k, **filter_params}
+        return [
+            VectorHit(
+                id=r.id,
+                source_type=r.source_type,
+                source_id=r.source_id,
+                content=r.content,
+                score=1.0 - float(r.distance),
+            )
+            for r in self.db.execute(sql, params).all()
+        ]
+
+    def search_hybrid(
+        self,
+        query: Sequence[float],
+        query_text: str,
+        top_k: int = 5,
+        source_type: Optional[str] = None,
+        rrf_k: int = 60,
+        candidates: Optional[int] = None,
+        filters: Optional[SearchFilters] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        iterative_scan: Optional[str] = None,
+        **options,
+    ) -> List[VectorHit]:
+        """One query: ANN candidates (HNSW) and full-text candidates (GIN on content_tsv),
+        fused with reciprocal rank fusion: score = sum(1 / (rrf_k + rank)).
+        Vector candidates are ranked by exact distance even when the ANN scan is quantized."""
+        filters = _merge_filters(source_type, filters)
+        candidates = max(candidates or top_k * 4, top_k)
+        apply_ann_search_settings(
+            self.db,
+            max(ef_search or 0, candidates) or None,
+            probes,
+            iterative_scan if not filters.is_empty() else None,
+        )
+        source_filter, filter_params, filter_binds = _sql_filter_fragment(filters)
+        sql = text(f"""
+            WITH vec AS (
+                SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                FROM (
+                    SELECT id, embedding <=> :query_embedding AS distance
+                    FROM memory_chunks
+                    WHERE embedding IS NOT NULL{source_filter}
+                    ORDER BY {self._ann_order("query_embedding")}
+                    LIMIT :candidates
+                ) v
+            ),
+            lex AS (
+                SELECT id, row_number() OVER (ORDER BY lexical_rank DESC) AS rank
+                FROM (
+                    SELECT id, ts_rank_cd(content_tsv, tsq) AS lexical_rank
+                    FROM memory_chunks, websearch_to_tsquery('simple', :query_text) AS tsq
+                    WHERE content_tsv @@ tsq{source_filter}
+                    ORDER BY lexical_rank DESC
+                    LIMIT :candidates
+                ) l
+            )
+            SELECT m.id, m.source_type, m.source_id, m.content,
+                   COALESCE(1.0 / (:rrf_k + vec.rank), 0) + COALESCE(1.0 / (:rrf_k + lex.rank), 0) AS score
+            FROM vec
+            FULL OUTER JOIN lex ON lex.id = vec.id
+            JOIN memory_chunks m ON m.id = COALESCE(vec.id, lex.id)
+            ORDER BY score DESC
+            LIMIT :top_k
+        """).bindparams(bindparam("query_embedding", type_=MemoryChunk.embedding.type), *filter_binds)
+        params = {
+            "query_embedding": list(query),
+            "query_text": query_text,
+            "candidates": candidates,
+            "rrf_k": rrf_k,
+            "top_k": top_k,
+            **filter_params,
+        }
+        rows = self.db.execute(sql, params).all()
+        return [
+            VectorHit(
+                id=r.id,
+                source_type=r.source_type,
+                source_id=r.source_id,
+                content=r.content,
+                score=float(r.score),
+            )
+            for r in rows
+        ]
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """对称标量量化 - 每个向量一个 float32 缩放因子: v ≈ codes * scale"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype("<f4")
+
+
+class NumpyVectorIndex(VectorIndex):
+    """NumPy 后端 - 内存映射 float32 矩阵 + 暴力 top-k (批量矩阵乘 + argpartition)
+
+    On-disk layout (append-only, persisted incrementally):
+      vectors.f32  raw little-endian float32 rows of ``dim`` (L2-normalized)
+      meta.jsonl   one JSON line per row write / tombstone; last write per row wins
+      vectors.i8   (quantization='int8') int8 codes per row, scanned instead of vectors.f32
+      scales.f32   (quantization='int8') one float32 scale per row
+
+    With int8 the scan touches a quarter of the bytes; the best ``top_k * rerank_factor``
+    rows are then re-scored exactly from vectors.f32, so only those pages are read.
+    """
+
+    name = "numpy"
+    VECTORS_FILE = "vectors.f32"
+    META_FILE = "meta.jsonl"
+    CODES_FILE = "vectors.i8"
+    SCALES_FILE = "scales.f32"
+    # Rows cast to float32 per step when scanning int8 codes (bounds the temporary copy)
+    CODES_CAST_ROWS = 8192
+
+    def __init__(self, path: str, dim: int, block_rows: int = 65536, quantization: str = "none", rerank_factor: int = 4):
+        if quantization not in NUMPY_QUANTIZATION_MODES:
+            raise ValueError(f"Unknown numpy index quantization: {quantization}")
+        self.path = path
+        self.dim = dim
+        self.block_rows = block_rows
+        self.quantization = quantization
+        self.rerank_factor = max(1, rerank_factor)
+        self._lock = threading.RLock()
+        self._rows = 0
+        self._row_by_id: Dict[str, int] = {}
+        self._meta: List[Optional[dict]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._source_codes = np.zeros(0, dtype=np.int32)
+        self._source_type_codes: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._codes: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, self.VECTORS_FILE)
+        self._meta_path = os.path.join(path, self.META_FILE)
+        self._codes_path = os.path.join(path, self.CODES_FILE)
+        self._scales_path = os.path.join(path, self.SCALES_FILE)
+        self._load()
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    # ---------- persistence ----------
+    def _load(self) -> None:
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        # A torn trailing row (crash mid-append) is ignored
+        self._rows = size // row_bytes
+        self._meta = [None] * self._rows
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn trailing line
+                    row = entry.get("row")
+                    if row is None or row >= self._rows:
+                        continue
+                    self._meta[row] = None if entry.get("deleted") else entry
+        self._alive = np.zeros(self._rows, dtype=bool)
+        self._source_codes = np.zeros(self._rows, dtype=np.int32)
+        self._row_by_id = {}
+        for row, entry in enumerate(self._meta):
+            if entry is None:
+                continue
+            previous = self._row_by_id.get(entry["id"])
+            if previous is not None:
+                self._alive[previous] = False
+            self._row_by_id[entry["id"]] = row
+            self._alive[row] = True
+            self._source_codes[row] = self._source_code(entry.get("source_type") or "")
+        if self.quantization == "int8":
+            self._sync_codes()
+        self._remap()
+
+    def _sync_codes(self) -> None:
+        """(Re)build int8 codes when missing or behind vectors.f32, e.g. quantization just enabled."""
+        have = min(
+            os.path.getsize(self._codes_path) // self.dim if os.path.exists(self._codes_path) else 0,
+            os.path.getsize(self._scales_path) // 4 if os.path.exists(self._scales_path) else 0,
+        )
+        if have >= self._rows:
+            return
+        matrix = np.memmap(self._vectors_path, dtype="<f4", mode="r", shape=(self._rows, self.dim))
+        with open(self._codes_path, "r+b" if have else "wb") as cf, open(self._scales_path, "r+b" if have else "wb") as sf:
+            cf.seek(have * self.dim)
+            sf.seek(have * 4)
+            for start in range(have, self._rows, self.block_rows):
+                codes, scales = quantize_int8(matrix[start:start + self.block_rows])
+                cf.write(codes.tobytes())
+                sf.write(scales.tobytes())
+        del matrix
+
+    def _remap(self) -> None:
+        self._matrix = None
+        self._codes = None
+        self._scales = None
+        if self._rows:
+            self._matrix = np.memmap(self._vectors_path, dtype="<f4", mode="r", shape=(self._rows, self.dim))
+            if self.quantization == "int8":
+                self._codes = np.memmap(self._codes_path, dtype=np.int8, mode="r", shape=(self._rows, self.dim))
+                self._scales = np.memmap(self._scales_path, dtype="<f4", mode="r", shape=(self._rows,))
+
+    def _source_code(self, source_type: str) -> int:
+        code = self._source_type_codes.get(source_type)
+        if code is None:
+            code = len(self._source_type_codes) + 1
+            self._source_type_codes[source_type] = code
+        return code
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype("<f4", copy=False)
+
+    # ---------- writes ----------
+    def upsert(self, records: Iterable[VectorRecord]) -> int:
+        records = list(records)
+        if not records:
+            return 0
+        vectors = np.asarray([r.embedding for r in records], dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of dim {self.dim}")
+        vectors = self._normalize(vectors)
+        quantized = self.quantization == "int8"
+        if quantized:
+            codes, scales = quantize_int8(vectors)
+        with self._lock:
+            appended: List[int] = []
+            mode = "r+b" if self._rows else "wb"
+            with ExitStack() as files:
+                vf = files.enter_context(open(self._vectors_path, mode))
+                mf = files.enter_context(open(self._meta_path, "a", encoding="utf-8"))
+                if quantized:
+                    cf = files.enter_context(open(self._codes_path, mode))
+                    sf = files.enter_context(open(self._scales_path, mode))
+                for i, (rec, vec) in enumerate(zip(records, vectors)):
+                    row = self._row_by_id.get(rec.id)
+                    if row is None:
+                        row = self._rows + len(appended)
+                        appended.append(row)
+                    vf.seek(row * self.dim * 4)
+                    vf.write(vec.tobytes())
+                    if quantized:
+                        cf.seek(row * self.dim)
+                        cf.write(codes[i].tobytes())
+                        sf.seek(row * 4)
+                        sf.write(scales[i].tobytes())
+                    entry = {
+                        "row": row,
+                        "id": rec.id,
+                        "source_type": rec.source_type,
+                        "source_id": rec.source_id,
+                        "content": rec.content,
+                        "metadata": rec.metadata,
+                        "created_at": rec.created_at.isoformat() if rec.created_at else None,
+                    }
+                    mf.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    self._row_by_id[rec.id] = row
+                    if row >= len(self._meta):
+                        self._meta.append(entry)
+                    else:
+                        self._meta[row] = entry
+                vf.flush()
+                mf.flush()
+                if quantized:
+                    cf.flush()
+                    sf.flush()
+            self._rows += len(appended)
+            if appended:
+                self._alive = np.concatenate([self._alive, np.zeros(len(appended), dtype=bool)])
+                self._source_codes = np.concatenate([self._source_codes, np.zeros(len(appended), dtype=np.int32)])
+            for rec in records:
+                row = self._row_by_id[rec.id]
+                self._alive[row] = True
+                self._source_codes[row] = self._source_code(rec.source_type or "")
+            self._remap()
+        return len(records)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            with open(self._meta_path, "a", encoding="utf-8") as mf:
+                for chunk_id in ids:
+                    row = self._row_by_id.pop(chunk_id, None)
+                    if row is None:
+                        continue
+                    mf.write(json.dumps({"row": row, "deleted": True}) + "\n")
+                    self._meta[row] = None
+                    self._alive[row] = False
+                    removed += 1
+        return removed
+
+    # ---------- search ----------
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int = 5,
+        source_type: Optional[str] = None,
+        filters: Optional[SearchFilters] = None,
+        **options,
+    ) -> List[VectorHit]:
+        return self.search_batch([query], top_k=top_k, source_type=source_type, filters=filters)[0]
+
+    def search_batch(
+        self,
+        queries: Sequence[Sequence[float]],
+        top_k: int = 5,
+        source_type: Optional[str] = None,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[List[VectorHit]]:
+        filters = _merge_filters(source_type, filters)
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim != 2 or q.shape[1] != self.dim:
+            raise ValueError(f"Expected query embeddings of dim {self.dim}")
+        q = self._normalize(q)
+        with self._lock:
+            matrix, codes, scales, meta, rows = self._matrix, self._codes, self._scales, self._meta, self._rows
+            mask = self._alive.copy()
+            if filters.source_type:
+                code = self._source_type_codes.get(filters.source_type)
+                mask &= self._source_codes == code if code is not None else False
+            residual = SearchFilters(**{**vars(filters), "source_type": None})
+            if not residual.is_empty():
+                # STUB: linear scan over metadata; fine for dev/edge index sizes
+                for row in np.flatnonzero(mask):
+                    if not residual.matches(meta[row]):
+                        mask[row] = False
+        if matrix is None or top_k <= 0 or not mask.any():
+            return [[] for _ in range(len(q))]
+
+        quantized = codes is not None
+        scan_k = top_k * self.rerank_factor if quantized else top_k
+        best_idx = np.empty((len(q), 0), dtype=np.int64)
+        best_scores = np.empty((len(q), 0), dtype=np.float32)
+        for start in range(0, rows, self.block_rows):
+            end = min(start + self.block_rows, rows)
+            block_mask = mask[start:end]
+            if not block_mask.any():
+                continue
+            if quantized:
+                scores = self._approx_scores(q, codes, scales, start, end)
+            else:
+                scores = q @ matrix[start:end].T  # (queries, block)
+            scores[:, ~block_mask] = -np.inf
+            idx = np.broadcast_to(np.arange(start, end), scores.shape)
+            cand_scores = np.concatenate([best_scores, scores], axis=1)
+            cand_idx = np.concatenate([best_idx, idx], axis=1)
+            if cand_scores.shape[1] > scan_k:
+                part = np.argpartition(-cand_scores, scan_k - 1, axis=1)[:, :scan_k]
+                cand_scores = np.take_along_axis(cand_scores, part, axis=1)
+                cand_idx = np.take_along_axis(cand_idx, part, axis=1)
+            best_scores, best_idx = cand_scores, cand_idx
+        if quantized:
+            best_scores, best_idx = self._rerank(q, matrix, best_scores, best_idx, top_k)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_idx = np.take_along_axis(best_idx, order, axis=1)
+        results: List[List[VectorHit]] = []
+        for scores_row, idx_row in zip(best_scores, best_idx):
+            hits: List[VectorHit] = []
+            for score, row in zip(scores_row, idx_row):
+                entry = meta[row]
+                if not np.isfinite(score) or entry is None:
+                    continue
+                hits.append(VectorHit(
+                    id=entry["id"],
+                    source_type=entry["source_type"],
+                    source_id=entry["source_id"],
+                    content=entry["content"],
+                    score=float(score),
+                ))
+            results.append(hits)
+        return results
+
+    def _approx_scores(self, q: np.ndarray, codes: np.ndarray, scales: np.ndarray, start: int, end: int) -> np.ndarray:
+        """q · (codes * scale) over rows [start, end), casting codes in bounded steps."""
+        scores = np.empty((len(q), end - start), dtype=np.float32)
+        for s in range(start, end, self.CODES_CAST_ROWS):
+            e = min(s + self.CODES_CAST_ROWS, end)
+            scores[:, s - start:e - start] = (q @ codes[s:e].astype(np.float32).T) * scales[s:e]
+        return scores
+
+    def _rerank(
+        self, q: np.ndarray, matrix: np.ndarray, cand_scores: np.ndarray, cand_idx: np.ndarray, top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact float32 re-scoring of the quantized candidates; keeps top_k per query."""
+        k = min(top_k, cand_scores.shape[1])
+        out_scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+        out_idx = np.zeros((len(q), k), dtype=np.int64)
+        for i in range(len(q)):
+            rows = np.sort(cand_idx[i][np.isfinite(cand_scores[i])])  # ascending -> sequential page reads
+            if not rows.size:
+                continue
+            exact = np.asarray(matrix[rows]) @ q[i]
+            top = np.argsort(-exact)[:k]
+            out_scores[i, :len(top)] = exact[top]
+            out_idx[i, :len(top)] = rows[top]
+        return out_scores, out_idx
+
+    def stats(self) -> Dict[str, Any]:
+        """索引规模与每次全量扫描读取的字节数"""
+        scan_row_bytes = self.dim + 4 if self.quantization == "int8" else self.dim * 4
+        return {
+            "rows": self._rows,
+            "alive": len(self),
+            "dim": self.dim,
+            "quantization": self.quantization,
+            "rerank_factor": self.rerank_factor if self.quantization != "none" else None,
+            "scan_bytes": self._rows * scan_row_bytes,
+            "full_precision_bytes": self._rows * self.dim * 4,
+        }
+
+
+_local_indexes: Dict[str, NumpyVectorIndex] = {}
+_local_indexes_lock = threading.Lock()
+
+
+def get_vector_index(
+    backend: str,
+    db: Optional[Session] = None,
+    path: str = "",
+    dim: int = 1536,
+    quantization: str = "none",
+    rerank_factor: int = 4,
+) -> VectorIndex:
+    """按配置返回向量索引后端 ('pgvector' | 'numpy')"""
+    if backend == "numpy":
+        with _local_indexes_lock:
+            index = _local_indexes.get(path)
+            if index is None:
+                index = NumpyVectorIndex(path, dim, quantization=quantization, rerank_factor=rerank_factor)
+                _local_indexes[path] = index
+            return index
+    if backend == "pgvector":
+        if db is None:
+            raise ValueError("pgvector backend requires a database session")
+        return PgVectorIndex(db, quantization=quantization, rerank_factor=rerank_factor)
+    raise ValueError(f"Unknown vector index backend: {backend}")
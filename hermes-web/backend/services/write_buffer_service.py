@@ -0,0 +1,227 @@
+"""
+Write Buffer Service
+高频会话写入合并 - 消息 / 工具调用多行 INSERT，会话计数器按会话合并为一次 UPDATE
+可选后台 write-behind 缓冲：每 flush_ms 毫秒或满 max_rows 行落库一次
+ack=buffer 时队列超过 max_queue_rows 行即退回同步确认（调用方等待 flush 提交），形成背压
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models import Message, ToolCall
+from services.curator_service import record_messages
+
+logger = logging.getLogger(__name__)
+
+# Called after each committed flush with (session, conversation ids whose counters changed)
+FlushHook = Callable[[Session, List[str]], None]
+
+ACK_MODES = {"buffer", "flush"}
+
+
+def insert_transcript(db: Session, messages: Sequence[dict], tool_calls: Sequence[dict]) -> List[str]:
+    """多行插入消息与工具调用并合并更新会话计数器（不提交），返回计数器变化的会话 id
+
+    messages 先于 tool_calls 插入，同一批内的工具调用可以引用本批消息。
+    """
+    if messages:
+        db.execute(insert(Message), list(messages))
+    if tool_calls:
+        db.execute(insert(ToolCall), list(tool_calls))
+    deltas: Dict[str, list] = {}
+    for m in messages:
+        if not m.get("conversation_id"):
+            continue
+        d = deltas.setdefault(m["conversation_id"], [0, 0, m["created_at"]])
+        d[0] += 1
+        d[1] += m.get("token_count") or 0
+        d[2] = max(d[2], m["created_at"])
+    return record_messages(db, {cid: tuple(d) for cid, d in deltas.items()})
+
+
+@dataclass
+class _Pending:
+    messages: List[dict]
+    tool_calls: List[dict]
+    acked: bool = False  # acknowledged at enqueue time (ack=buffer, queue under max_queue_rows)
+    future: Future = field(default_factory=Future)
+
+    @property
+    def rows(self) -> int:
+        return len(self.messages) + len(self.tool_calls)
+
+
+class WriteBufferService:
+    """write-behind 缓冲 - 单刷写线程按 FIFO 合并，确认模式 buffer (入队即返回) / flush (落库后返回)"""
+
+    def __init__(self, flush_ms: int = 5, max_rows: int = 500, ack: str = "flush", max_queue_rows: int = 10000):
+        self.flush_ms = flush_ms
+        self.max_rows = max_rows
+        self.ack = ack
+        self.max_queue_rows = max_queue_rows  # 0 = unbounded
+        self.enabled = False
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._on_flush: Optional[FlushHook] = None
+        self._queue: List[_Pending] = []
+        self._rows = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._inflight = 0
+        self.submitted_rows = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped_rows = 0  # rows acknowledged at buffer time whose flush failed
+        self.backpressured = 0  # ack=buffer submissions made to wait for their flush (queue full)
+
+    def configure(
+        self,
+        session_factory: Callable[[], Session],
+        enabled: bool,
+        flush_ms: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        ack: Optional[str] = None,
+        on_flush: Optional[FlushHook] = None,
+        max_queue_rows: Optional[int] = None,
+    ) -> None:
+        if ack is not None and ack not in ACK_MODES:
+            raise ValueError(f"Unknown write buffer ack mode: {ack}")
+        self._session_factory = session_factory
+        self.enabled = enabled
+        self.flush_ms = flush_ms if flush_ms is not None else self.flush_ms
+        self.max_rows = max(1, max_rows or self.max_rows)
+        self.ack = ack or self.ack
+        self.max_queue_rows = max(0, max_queue_rows if max_queue_rows is not None else self.max_queue_rows)
+        self._on_flush = on_flush
+
+    def submit(self, messages: Sequence[dict] = (), tool_calls: Sequence[dict] = ()) -> Future:
+        """入队一组行（整组在同一次 flush 中落库），返回 flush 提交后完成的 Future"""
+        return self.submit_with_ack(messages, tool_calls)[0]
+
+    def submit_with_ack(self, messages: Sequence[dict] = (), tool_calls: Sequence[dict] = ()) -> Tuple[Future, bool]:
+        """同 submit，另返回是否可立即确认；False 时调用方须等待 Future（ack=flush 或队列已满）"""
+        pending = _Pending(list(messages), list(tool_calls))
+        with self._cond:
+            if self.ack == "buffer":
+                pending.acked = not self.max_queue_rows or self._rows + pending.rows <= self.max_queue_rows
+                if not pending.acked:
+                    self.backpressured += 1
+            self._queue.append(pending)
+            self._rows += pending.rows
+            self.submitted_rows += pending.rows
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="write-buffer", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return pending.future, pending.acked
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """等待已入队的行全部落库（测试/关停用）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _take(self) -> List[_Pending]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # Linger up to flush_ms so a burst coalesces, unless max_rows is already buffered
+            deadline = time.monotonic() + self.flush_ms / 1000.0
+            while self._rows < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch: List[_Pending] = []
+            rows = 0
+            while self._queue and (not batch or rows + self._queue[0].rows <= self.max_rows):
+                pending = self._queue.pop(0)
+                batch.append(pending)
+                rows += pending.rows
+            self._rows -= rows
+            self._inflight += 1
+            return batch
+
+    def _worker(self) -> None:
+        while True:
+            batch = self._take()
+            try:
+                self._flush(batch)
+            finally:
+                with self._cond:
+                    self._inflight -= 1
+                    self._cond.notify_all()
+
+    def _flush(self, batch: List[_Pending]) -> None:
+        rows = sum(p.rows for p in batch)
+        db = self._session_factory()
+        try:
+            touched = insert_transcript(
+                db,
+                [m for p in batch for m in p.messages],
+                [t for p in batch for t in p.tool_calls],
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            db.close()
+            if len(batch) > 1:
+                # One bad submission (e.g. unknown conversation FK) must not fail its neighbours
+                for p in batch:
+                    self._flush([p])
+                return
+            self.failures += 1
+            if batch[0].acked:
+                self.dropped_rows += rows
+            logger.error(f"Write buffer flush of {rows} rows failed: {e}")
+            for p in batch:
+                p.future.set_exception(e)
+            return
+        self.flushes += 1
+        self.flushed_rows += rows
+        for p in batch:
+            p.future.set_result(None)
+        try:
+            if self._on_flush is not None and touched:
+                self._on_flush(db, touched)
+        except Exception as e:
+            logger.error(f"Write buffer flush hook failed: {e}")
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            buffered = self._rows
+            queued = len(self._queue)
+        return {
+            "enabled": self.enabled,
+            "ack": self.ack,
+            "flush_ms": self.flush_ms,
+            "max_rows": self.max_rows,
+            "max_queue_rows": self.max_queue_rows,
+            "buffered_rows": buffered,
+            "queued_submissions": queued,
+            "backpressured": self.backpressured,
+            "submitted_rows": self.submitted_rows,
+            "flushed_rows": self.flushed_rows,
+            "flushes": self.flushes,
+            "rows_per_flush": round(self.flushed_rows / self.flushes, 2) if self.flushes else 0.0,
+            "failures": self.failures,
+            "dropped_rows": self.dropped_rows,
+        }
+
+
+# 创建全局实例
+write_buffer_service = WriteBufferService()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+CuratorService tests - running counters and incremental (watermarked) curation
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Conversation, Message, Summary
+from services.curator_service import CuratorService, record_message, unsummarized_counts
+from services.summary_tree_service import SummaryTreeService
+
+@pytest.fixture
+def session_factory(make_session_factory):
+    factory = make_session_factory(Conversation, Message, Summary)
+    db = factory()
+    db.add(Conversation(id="conv", user_id="u", agent_name="agent"))
+    db.commit()
+    db.close()
+    return factory
+
+def _add_messages(db, start: int, count: int, tokens: int = 10):
+    base = datetime(2025, 1, 1)
+    for i in range(start, start + count):
+        at = base + timedelta(seconds=i)
+        db.add(Message(id=f"m-{i:05d}", conversation_id="conv", sender="user", content=f"message {i}. more", token_count=tokens, created_at=at))
+        record_message(db, "conv", tokens, at)
+    db.commit()
+
+def _summarized_ids(summaries):
+    return sorted(int(line.split("message ")[1]) for s in summaries for line in s.summary.splitlines()[1:])
+
+def _curator(factory, budget_messages=10, leaf_window=4):
+    tree = SummaryTreeService()
+    tree.configure(
+        lambda msgs, target: "header\n" + "\n".join(m.content.split(". ")[0] for m in msgs),
+        lambda children, target: "merged\n" + "\n".join(l for c in children for l in c.summary.splitlines()[1:]),
+        leaf_window=leaf_window,
+        fanout=4,
+    )
+    curator = CuratorService(tree)
+    curator.configure(factory, budget_messages, 10**6)
+    return curator
+
+class TestCuratorService:
+    """Counters stay O(1); each run only summarizes messages past the watermark"""
+
+    def test_record_message_updates_counters(self, session_factory):
+        db = session_factory()
+        _add_messages(db, 0, 3, tokens=7)
+        conv = db.get(Conversation, "conv")
+        assert conv.message_count == 3
+        assert conv.token_total == 21
+        assert unsummarized_counts(conv) == {"messages": 3, "tokens": 21}
+        assert record_message(db, "missing", 5) is None
+
+    def test_curate_advances_watermark_over_delta_only(self, session_factory):
+        db = session_factory()
+        curator = _curator(session_factory)
+        _add_messages(db, 0, 10)
+        assert curator.curate(db, "conv") == []  # within budget
+
+        _add_messages(db, 10, 10)
+        first = curator.curate(db, "conv")
+        leaves = [s for s in first if s.level == 0]
+        assert len(leaves) == 3  # full 4-message windows until back within budget
+        conv = db.get(Conversation, "conv")
+        assert conv.summarized_message_count == 12
+        assert conv.summary_watermark_id == "m-00011"
+        assert unsummarized_counts(conv)["messages"] == 8
+
+        _add_messages(db, 20, 5)
+        second = curator.curate(db, "conv")
+        assert _summarized_ids(leaves) == list(range(0, 12))
+        assert _summarized_ids([s for s in second if s.level == 0]) == list(range(12, 16))  # starts past the watermark
+        assert [s.level for s in second] == [0, 1]  # the fourth leaf carries into a parent
+
+    def test_token_budget_before_full_window_writes_short_leaf(self, session_factory):
+        db = session_factory()
+        curator = _curator(session_factory, budget_messages=100, leaf_window=32)
+        curator.budget_tokens = 50
+        _add_messages(db, 0, 10)  # 100 tokens, far below one window
+        created = curator.curate(db, "conv")
+        assert len(created) == 1
+        assert created[0].message_count == 6  # oldest 60% of the pending delta
+
+    def test_run_that_loses_the_watermark_race_is_dropped(self, session_factory, monkeypatch):
+        db = session_factory()
+        curator = _curator(session_factory)
+        _add_messages(db, 0, 20)
+        add_leaf = curator.tree.add_leaf
+
+        def racing_add_leaf(session, conversation_id, batch):
+            # A concurrent run commits its watermark while this one is still summarizing
+            session.query(Conversation).filter_by(id=conversation_id).update({"summary_watermark_id": "m-00003"})
+            return add_leaf(session, conversation_id, batch)
+
+        monkeypatch.setattr(curator.tree, "add_leaf", racing_add_leaf)
+        assert curator.curate(db, "conv") == []
+        assert db.query(Summary).count() == 0
+        assert db.get(Conversation, "conv").summarized_message_count == 0
+
+    def test_background_worker_curates_enqueued_conversation(self, session_factory):
+        db = session_factory()
+        curator = _curator(session_factory)
+        _add_messages(db, 0, 30)
+        curator.enqueue("conv")
+        curator.enqueue("conv")
+        curator.drain()
+        stats = curator.stats()
+        assert stats["summaries"] >= 1
+        assert stats["failures"] == 0
+        assert session_factory().query(Summary).count() == stats["summaries"]
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Connection pool tests - checkout wait / occupancy metrics and fail-fast on saturation
+"""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from core.pool import PoolMetrics, timed_pool
+
+@pytest.fixture
+def pooled(tmp_path):
+    metrics = PoolMetrics()
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=timed_pool(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    yield engine, metrics
+    engine.dispose()
+
+class TestPoolMetrics:
+    """借出统计与占用"""
+
+    def test_counts_checkouts_in_use_and_overflow(self, pooled):
+        engine, metrics = pooled
+        first = engine.connect()
+        second = engine.connect()
+        first.execute(text("SELECT 1"))
+        stats = metrics.snapshot(engine.pool)
+        assert stats["checkouts"] == 2
+        assert stats["in_use"] == 2
+        assert stats["overflow"] == 1
+        assert stats["size"] == 1 and stats["max_overflow"] == 1
+        second.close()
+        first.close()
+        stats = metrics.snapshot(engine.pool)
+        assert stats["in_use"] == 0
+        assert stats["overflow"] == 0
+        assert stats["wait_ms_max"] >= stats["wait_ms_p50"] >= 0
+
+    def test_metrics_survive_pool_recreate(self, pooled):
+        engine, metrics = pooled
+        engine.connect().close()
+        engine.dispose()  # replaces engine.pool with a fresh instance of the same class
+        engine.connect().close()
+        assert metrics.checkouts == 2
+        assert type(engine.pool).__name__ == "TimedQueuePool"
+
+class TestSaturation:
+    """池耗尽时在 pool_timeout 后失败"""
+
+    def test_checkout_times_out_when_saturated(self, pooled):
+        engine, metrics = pooled
+        held = [engine.connect(), engine.connect()]
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        stats = metrics.snapshot(engine.pool)
+        assert stats["timeouts"] == 1
+        assert stats["checkouts"] == 2
+        assert stats["wait_ms_max"] >= 40
+        for conn in held:
+            conn.close()
+        engine.connect().close()
+        assert metrics.checkouts == 3
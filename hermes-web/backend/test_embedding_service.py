@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+EmbeddingService tests - vectorized stub embedding and LRU cache
+"""
+
+import hashlib
+import math
+
+import numpy as np
+import pytest
+
+from services.embedding_service import EmbeddingService, decode_embeddings_frame, encode_embeddings_frame
+
+def reference_embedding(text: str, dim: int = 1536):
+    """Original per-float implementation from main.generate_embedding_stub"""
+    if not text:
+        return [0.0] * dim
+    h = hashlib.sha256(text.encode("utf-8")).digest()
+    vals = []
+    acc = 0
+    for i in range(dim):
+        acc = (acc + h[i % len(h)]) % 256
+        vals.append((acc / 255.0) * 2.0 - 1.0)
+    norm = math.sqrt(sum(v * v for v in vals)) or 1.0
+    return [v / norm for v in vals]
+
+class TestEmbeddingService:
+    """Equivalence with the original loop, batching and cache accounting"""
+
+    @pytest.mark.parametrize("text", ["hello", "", "多语言 text", "x" * 5000])
+    def test_matches_reference(self, text):
+        service = EmbeddingService()
+        np.testing.assert_allclose(service.embed(text, 1536), reference_embedding(text), atol=1e-12)
+
+    def test_embed_many_matches_single(self):
+        service = EmbeddingService()
+        texts = ["a", "b", "", "a"]
+        batch = service.embed_many(texts, 64)
+        assert batch.shape == (4, 64)
+        for text, row in zip(texts, batch):
+            np.testing.assert_allclose(row, reference_embedding(text, 64), atol=1e-12)
+
+    def test_cache_hits_and_lru_cap(self):
+        service = EmbeddingService(max_entries=2)
+        service.embed("one")
+        service.embed("two")
+        service.embed("one")
+        assert service.stats()["hits"] == 1
+        service.embed("three")  # evicts "two"
+        service.embed("two")
+        stats = service.stats()
+        assert stats["entries"] == 2
+        assert stats["hits"] == 1
+        assert stats["misses"] == 4
+
+    def test_results_are_read_only(self):
+        service = EmbeddingService()
+        vec = service.embed("immutable")
+        with pytest.raises(ValueError):
+            vec[0] = 1.0
+
+class TestEmbeddingFrames:
+    """Binary batch frame used by /embeddings/batch"""
+
+    @pytest.mark.parametrize("dtype,itemsize", [("f32", 4), ("f16", 2)])
+    def test_round_trip(self, dtype, itemsize):
+        matrix = EmbeddingService().embed_many(["alpha", "beta", "gamma"], 1536)
+        frame = encode_embeddings_frame(matrix, dtype)
+        assert frame[:4] == b"HEMB"
+        assert len(frame) == 16 + 3 * 1536 * itemsize
+        decoded = decode_embeddings_frame(frame)
+        assert decoded.shape == (3, 1536)
+        np.testing.assert_allclose(decoded, matrix, atol=1e-3 if dtype == "f16" else 1e-7)
+
+    def test_rejects_unknown_dtype(self):
+        with pytest.raises(ValueError):
+            encode_embeddings_frame(np.zeros((1, 4)), "f64")
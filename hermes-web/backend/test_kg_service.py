@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Knowledge graph traversal tests - bounded BFS, fan-out / relationship filters, shortest path
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import KGEdge, KGNode
+from services.kg_service import traverse
+
+T0 = datetime(2025, 1, 1)
+
+@pytest.fixture
+def db(make_session_factory):
+    """a -knows-> b -knows-> c -knows-> d, a -owns-> x, e -knows-> a, d -knows-> a (cycle)"""
+    session = make_session_factory(KGNode, KGEdge)()
+    session.add_all([KGNode(id=n, entity_type="thing", created_at=T0) for n in "abcdex"])
+    edges = [("a", "b", "knows"), ("b", "c", "knows"), ("c", "d", "knows"), ("a", "x", "owns"), ("e", "a", "knows"), ("d", "a", "knows")]
+    session.add_all([
+        KGEdge(id=f"{s}{t}", source_node_id=s, target_node_id=t, relationship_type=r, created_at=T0 + timedelta(seconds=i))
+        for i, (s, t, r) in enumerate(edges)
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+def _depths(result):
+    return {n["id"]: n["depth"] for n in result["nodes"]}
+
+class TestTraverse:
+    """邻域 BFS"""
+
+    def test_outgoing_bfs_depths_and_paths(self, db):
+        result = traverse(db, ["a"], max_depth=2, direction="out")
+        assert _depths(result) == {"a": 0, "b": 1, "x": 1, "c": 2}
+        c = next(n for n in result["nodes"] if n["id"] == "c")
+        assert c["path"] == ["a", "b", "c"]
+        assert c["via_edge"]["id"] == "bc"
+        assert result["nodes"][0]["via_edge"] is None
+        assert not result["truncated"]
+
+    def test_both_directions_and_cycles_terminate(self, db):
+        result = traverse(db, ["a"], max_depth=5, direction="both")
+        assert _depths(result) == {"a": 0, "b": 1, "x": 1, "e": 1, "d": 1, "c": 2}
+
+    def test_relationship_filter(self, db):
+        result = traverse(db, ["a"], max_depth=3, direction="out", relationship_types=["owns"])
+        assert _depths(result) == {"a": 0, "x": 1}
+
+    def test_fanout_keeps_oldest_edges(self, db):
+        result = traverse(db, ["a"], max_depth=1, direction="out", max_fanout=1)
+        assert _depths(result) == {"a": 0, "b": 1}
+
+    def test_visit_budget_truncates(self, db):
+        result = traverse(db, ["a"], max_depth=3, direction="out", max_nodes=3)
+        assert result["truncated"]
+        assert result["visits"] == 3
+        assert len(result["nodes"]) == 3
+
+    def test_unknown_start_and_direction(self, db):
+        assert traverse(db, ["missing"])["nodes"] == []
+        with pytest.raises(ValueError):
+            traverse(db, ["a"], direction="sideways")
+
+class TestShortestPath:
+    """target_id 模式"""
+
+    def test_returns_shortest_path_nodes(self, db):
+        result = traverse(db, ["a"], max_depth=4, direction="both", target_id="c")
+        assert result["path"] == ["a", "b", "c"]
+        assert [n["id"] for n in result["nodes"]] == ["a", "b", "c"]
+
+    def test_unreachable_within_depth(self, db):
+        result = traverse(db, ["a"], max_depth=2, direction="out", target_id="d")
+        assert result["path"] is None
+        assert result["nodes"] == []
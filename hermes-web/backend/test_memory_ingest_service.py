@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Memory ingest tests - content-addressed upsert and embedding reuse
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import MemoryChunk
+from services.memory_ingest_service import content_sha256, find_shared_embeddings, upsert_chunks
+
+# Postgres with pgvector and the migrations applied, e.g. postgresql://hermes@localhost/hermes_test
+PG_URL = os.getenv("TEST_DATABASE_URL", "")
+pg_only = pytest.mark.skipif(not PG_URL.startswith(("postgresql", "postgres:")), reason="TEST_DATABASE_URL not set")
+
+def _pg_url(driver):
+    return f"postgresql+{driver}://" + PG_URL.split("://", 1)[1]
+
+@pytest.fixture
+def db(make_session_factory):
+    session = make_session_factory(MemoryChunk)()
+    yield session
+    session.close()
+
+def _row(content, source_id="src", embedding=None, metadata=None):
+    return {
+        "id": str(uuid4()),
+        "source_type": "document",
+        "source_id": source_id,
+        "content": content,
+        "content_sha256": content_sha256(content),
+        "embedding": embedding,
+        "metadata_json": metadata,
+        "created_at": datetime.utcnow(),
+    }
+
+class TestUpsertChunks:
+    """Duplicates resolve to one stored row per (source_type, source_id, content)"""
+
+    def test_duplicates_in_payload_and_store_share_ids(self, db):
+        first_ids, _, inserted = upsert_chunks(db, [_row("alpha"), _row("beta")])
+        db.commit()
+        assert inserted == 2
+
+        ids, method, inserted = upsert_chunks(db, [_row("alpha"), _row("gamma"), _row("gamma"), _row("alpha", source_id="other")])
+        db.commit()
+        assert method == "insert"
+        assert inserted == 2  # gamma once, alpha under a new source scope
+        assert ids[0] == first_ids[0]
+        assert ids[1] == ids[2]
+        assert ids[3] != first_ids[0]
+        assert db.query(MemoryChunk).count() == 4
+
+    def test_existing_embedding_wins_and_missing_one_is_filled(self, db):
+        (chunk_id,), _, _ = upsert_chunks(db, [_row("alpha")])
+        db.commit()
+        upsert_chunks(db, [_row("alpha", embedding=[0.25] * 1536, metadata={"v": 2})])
+        db.commit()
+        upsert_chunks(db, [_row("alpha", embedding=[0.75] * 1536)])
+        db.commit()
+        mc = db.get(MemoryChunk, chunk_id)
+        assert list(mc.embedding) == [0.25] * 1536
+        assert mc.metadata_json == {"v": 2}
+
+    def test_find_shared_embeddings_across_scopes(self, db):
+        upsert_chunks(db, [_row("alpha", source_id="a", embedding=[0.5] * 1536), _row("beta", source_id="b")])
+        db.commit()
+        shared = find_shared_embeddings(db, [content_sha256("alpha"), content_sha256("beta")])
+        assert list(shared) == [content_sha256("alpha")]
+        assert shared[content_sha256("alpha")] == [0.5] * 1536
+
+class TestCopyPath:
+    """Postgres 上批量写入走 COPY：同步 Session (psycopg) 与 AsyncSession.run_sync (asyncpg)"""
+
+    @pg_only
+    def test_psycopg_session_uses_copy(self):
+        engine = create_engine(_pg_url("psycopg"))
+        db = sessionmaker(bind=engine)()
+        try:
+            source_id = str(uuid4())
+            ids, method, inserted = upsert_chunks(db, [_row("alpha", source_id, [0.5] * 1536, {"k": 1}), _row("alpha", source_id)])
+            assert method == "copy" and inserted == 1 and ids[0] == ids[1]
+        finally:
+            db.rollback()
+            db.close()
+            engine.dispose()
+
+    @pg_only
+    def test_asyncpg_session_uses_copy(self):
+        async def ingest():
+            engine = create_async_engine(_pg_url("asyncpg"))
+            try:
+                async with AsyncSession(engine) as db:
+                    source_id = str(uuid4())
+                    result = await db.run_sync(upsert_chunks, [_row("alpha", source_id, [0.5] * 1536, {"k": 1}), _row("beta", source_id)])
+                    stored = await db.run_sync(lambda s: s.query(MemoryChunk).filter(MemoryChunk.source_id == source_id).count())
+                    await db.rollback()
+                    return result, stored
+            finally:
+                await engine.dispose()
+
+        (ids, method, inserted), stored = asyncio.run(ingest())
+        assert method == "copy" and inserted == 2 and stored == 2
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Orchestration DAG executor tests - dependency order, bounded concurrency, output passing, failure handling
+"""
+
+import asyncio
+
+import pytest
+
+from services.orchestration_service import DagExecutor, PlanError, critical_path, normalize_plan, resolve_refs
+
+def _run(executor, plan, invoke, **kwargs):
+    async def collect():
+        return [e async for e in executor.run(plan, invoke, **kwargs)]
+    return asyncio.run(collect())
+
+def _sleeper(delays, log=None, fail=()):
+    async def invoke(step, input_data):
+        if log is not None:
+            log.append(("start", step["step"]))
+        await asyncio.sleep(delays.get(step["step"], 0.01))
+        if log is not None:
+            log.append(("end", step["step"]))
+        if step["step"] in fail:
+            raise RuntimeError(f"step {step['step']} broke")
+        return {"result": f"out{step['step']}", "input": input_data}
+    return invoke
+
+# 1 -> (2, 3, 4) -> 5 (needs 2 and 4)
+DIAMOND = [
+    {"step": 1, "tool": "web_search", "depends_on": [], "input": {"q": "x"}},
+    {"step": 2, "tool": "security_analyzer", "depends_on": [1], "input": {"code": "${steps.1.output.result}"}},
+    {"step": 3, "tool": "linter", "depends_on": [1], "input": {}},
+    {"step": 4, "tool": "test_runner", "depends_on": [1], "input": {}},
+    {"step": 5, "tool": "code_reviewer_llm", "depends_on": [2, 4], "input": {"findings": ["${steps.2.output}", "${steps.4.output.result}"]}},
+]
+
+class TestPlan:
+    """计划校验"""
+
+    def test_missing_depends_on_means_linear(self):
+        steps = normalize_plan([{"step": 1, "tool": "a"}, {"step": 2, "tool": "b"}, {"step": 3, "tool": "c"}])
+        assert [s["depends_on"] for s in steps.values()] == [[], [1], [2]]
+
+    def test_rejects_cycles_unknown_steps_and_undeclared_refs(self):
+        with pytest.raises(PlanError, match="cycle"):
+            normalize_plan([{"step": 1, "tool": "a", "depends_on": [2]}, {"step": 2, "tool": "b", "depends_on": [1]}])
+        with pytest.raises(PlanError, match="unknown"):
+            normalize_plan([{"step": 1, "tool": "a", "depends_on": [9]}])
+        with pytest.raises(PlanError, match="references"):
+            normalize_plan([{"step": 1, "tool": "a", "depends_on": []}, {"step": 2, "tool": "b", "depends_on": [], "input": {"x": "${steps.1.output}"}}])
+
+    def test_resolve_refs(self):
+        outputs = {1: {"result": {"code": "print()"}}}
+        assert resolve_refs({"a": "${steps.1.output.result.code}", "b": ["${steps.1.output.missing}", "plain"]}, outputs) == {
+            "a": "print()",
+            "b": [None, "plain"],
+        }
+
+    def test_critical_path(self):
+        steps = normalize_plan(DIAMOND)
+        assert critical_path(steps, {1: 10, 2: 5, 3: 50, 4: 20, 5: 1}) == {"steps": [1, 3], "ms": 60}
+
+class TestExecutor:
+    """DAG 执行"""
+
+    def test_independent_steps_overlap_and_outputs_flow(self):
+        log = []
+        events = _run(DagExecutor(4), DIAMOND, _sleeper({2: 0.05, 3: 0.05, 4: 0.05}, log))
+        starts = [n for kind, n in log if kind == "start"]
+        assert starts[0] == 1 and set(starts[1:4]) == {2, 3, 4} and starts[4] == 5
+        # 2, 3 and 4 all start before any of them ends
+        assert log.index(("end", 2)) > log.index(("start", 4))
+        done = {e["step"]: e for e in events if e["event"] == "step_succeeded"}
+        assert done[2]["output"]["input"] == {"code": "out1"}
+        assert done[5]["output"]["input"]["findings"] == [{"result": "out2", "input": {"code": "out1"}}, "out4"]
+        finished = events[-1]
+        assert finished["event"] == "run_finished" and finished["status"] == "succeeded"
+        assert finished["elapsed_ms"] < finished["sum_latency_ms"]
+
+    def test_concurrency_is_bounded(self):
+        running = {"now": 0, "peak": 0}
+
+        async def invoke(step, input_data):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.02)
+            running["now"] -= 1
+            return {}
+
+        plan = [{"step": n, "tool": "t", "depends_on": []} for n in range(1, 7)]
+        events = _run(DagExecutor(4), plan, invoke, max_concurrency=2)
+        assert running["peak"] == 2
+        assert events[0]["max_concurrency"] == 2
+
+    def test_failure_skips_downstream_only(self):
+        events = _run(DagExecutor(4), DIAMOND, _sleeper({}, fail={2}))
+        by_step = {e["step"]: e["event"] for e in events if "step" in e and e["event"] != "step_started"}
+        assert by_step == {1: "step_succeeded", 2: "step_failed", 3: "step_succeeded", 4: "step_succeeded", 5: "step_skipped"}
+        assert "step 2 broke" in next(e["error"] for e in events if e["event"] == "step_failed")
+        assert events[-1]["status"] == "failed"
+
+    def test_fail_fast_cancels_running_steps(self):
+        log = []
+        events = _run(DagExecutor(4), DIAMOND, _sleeper({2: 0.01, 3: 0.5, 4: 0.5}, log, fail={2}), fail_fast=True)
+        by_step = {e["step"]: e["event"] for e in events if "step" in e and e["event"] != "step_started"}
+        assert by_step[2] == "step_failed"
+        assert by_step[3] == by_step[4] == by_step[5] == "step_skipped"
+        assert ("end", 3) not in log
+        assert events[-1]["elapsed_ms"] < 400
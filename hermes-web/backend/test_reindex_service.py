@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+ReindexService tests - background keyset-batched embedding job
+"""
+
+import pytest
+
+from models import MemoryChunk
+from services.embedding_service import EmbeddingService
+from services.memory_ingest_service import content_sha256
+from services.reindex_service import ReindexService
+
+@pytest.fixture
+def session_factory(make_session_factory):
+    factory = make_session_factory(MemoryChunk)
+    db = factory()
+    for i in range(250):
+        content = f"content {i}"
+        db.add(MemoryChunk(id=f"chunk-{i:04d}", source_type="document", source_id="src", content=content, content_sha256=content_sha256(content)))
+    db.commit()
+    db.close()
+    return factory
+
+def _embed_many(texts):
+    return EmbeddingService().embed_many(list(texts), 1536).tolist()
+
+class TestReindexService:
+    """Batching, progress and resume from the keyset cursor"""
+
+    def test_embeds_all_rows_in_batches(self, session_factory):
+        seen = []
+        service = ReindexService()
+        job = service.start(session_factory, _embed_many, batch_size=40, workers=3, on_batch=lambda db, rows: seen.extend(rows))
+        job._thread.join(timeout=30)
+
+        progress = job.progress()
+        assert progress["status"] == "completed"
+        assert progress["total"] == 250
+        assert progress["updated"] == 250
+        assert progress["batches"] == 7
+        assert len(seen) == 250
+        db = session_factory()
+        assert db.query(MemoryChunk).filter(MemoryChunk.embedding.is_(None)).count() == 0
+        assert len(db.get(MemoryChunk, "chunk-0007").embedding) == 1536
+
+    def test_cancel_then_resume(self, session_factory):
+        service = ReindexService()
+        calls = []
+
+        def slow_hook(db, rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                service.cancel(job.id)
+
+        job = service.start(session_factory, _embed_many, batch_size=50, workers=2, on_batch=slow_hook)
+        job._thread.join(timeout=30)
+        assert job.status == "cancelled"
+        assert job.updated == 100
+        assert job.last_id == "chunk-0099"
+
+        service.resume(job.id, session_factory, _embed_many)
+        job._thread.join(timeout=30)
+        assert job.status == "completed"
+        assert job.updated == 250
+
+    def test_reuses_embeddings_of_identical_content(self, session_factory):
+        db = session_factory()
+        stored = [0.5] * 1536
+        db.add(MemoryChunk(
+            id="other-0000", source_type="message", source_id="elsewhere", content="content 3",
+            content_sha256=content_sha256("content 3"), embedding=stored,
+        ))
+        db.commit()
+        db.close()
+        embedded = []
+
+        def counting_embed(texts):
+            embedded.extend(texts)
+            return _embed_many(texts)
+
+        job = ReindexService().start(session_factory, counting_embed, batch_size=100, workers=2)
+        job._thread.join(timeout=30)
+        assert job.status == "completed"
+        assert job.shared == 1
+        assert "content 3" not in embedded
+        assert len(embedded) == 249
+        assert list(session_factory().get(MemoryChunk, "chunk-0003").embedding) == stored
+
+    def test_rebuild_replays_stored_embeddings_without_embedding(self, session_factory):
+        first = ReindexService().start(session_factory, _embed_many, batch_size=100, workers=2)
+        first._thread.join(timeout=30)
+        index = {}
+
+        def no_embed(texts):
+            pytest.fail("rebuild must not embed")
+
+        job = ReindexService().start(
+            session_factory, no_embed, batch_size=60,
+            on_batch=lambda db, rows: index.update((r["id"], r["embedding"]) for r in rows), rebuild=True,
+        )
+        job._thread.join(timeout=30)
+        assert (job.status, job.mode, job.total, job.updated) == ("completed", "rebuild", 250, 250)
+        assert len(index) == 250
+        assert index["chunk-0007"] == list(session_factory().get(MemoryChunk, "chunk-0007").embedding)
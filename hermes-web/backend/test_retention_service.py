@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+RetentionService tests - monthly archive of cold rows into compressed JSONL + manifest
+"""
+
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import ArchiveManifest, Conversation, Message, Summary, ToolCall
+from services.retention_service import RetentionService, add_months, read_archive
+
+NOW = datetime(2025, 7, 15)
+
+# Postgres with the migrations applied (messages partitioned, messages_default present)
+PG_URL = os.getenv("TEST_DATABASE_URL", "")
+pg_only = pytest.mark.skipif(not PG_URL.startswith(("postgresql", "postgres:")), reason="TEST_DATABASE_URL not set")
+
+@pytest.fixture
+def db(make_session_factory):
+    session = make_session_factory(Conversation, Message, ToolCall, Summary, ArchiveManifest)()
+    # Both conversations are fully summarized: their messages are free to archive
+    session.add(Conversation(id="a", user_id="u", agent_name="hermes", summary_watermark_at=datetime(2025, 7, 3), summary_watermark_id="m4"))
+    session.add(Conversation(id="b", user_id="u", agent_name="hermes", summary_watermark_at=datetime(2025, 1, 3), summary_watermark_id="m1"))
+    for i, (month, conv) in enumerate([(1, "a"), (1, "b"), (2, "a"), (6, "a"), (7, "a")]):
+        session.add(Message(id=f"m{i}", conversation_id=conv, sender="user", content=f"hello {i} ✓", created_at=datetime(2025, month, 3)))
+    session.add(ToolCall(id="t0", conversation_id="a", message_id="m0", step_number=1, tool_name="search",
+                         input={"q": "x"}, status="success", created_at=datetime(2025, 1, 3)))
+    session.commit()
+    yield session
+    session.close()
+
+@pytest.fixture
+def retention(tmp_path):
+    service = RetentionService()
+    service.configure(str(tmp_path), retain_months=3, months_ahead=1, compression="gzip")
+    return service
+
+class TestRetention:
+    """Months before the cutoff leave the hot tables and stay readable from the archive"""
+
+    def test_add_months_wraps_years(self):
+        assert add_months(datetime(2025, 11, 1), 3) == datetime(2026, 2, 1)
+        assert add_months(datetime(2025, 1, 1), -1) == datetime(2024, 12, 1)
+
+    def test_dry_run_lists_cold_months_only(self, db, retention):
+        assert retention.cutoff(NOW) == datetime(2025, 5, 1)
+        result = retention.run(db, now=NOW, dry_run=True)
+        assert [(c["partition"]) for c in result["candidates"]] == [
+            "messages_p202501", "messages_p202502", "messages_p202503", "messages_p202504",
+            "tool_calls_p202501", "tool_calls_p202502", "tool_calls_p202503", "tool_calls_p202504",
+        ]
+        assert db.query(Message).count() == 5
+
+    def test_run_archives_and_deletes_cold_rows(self, db, retention):
+        result = retention.run(db, now=NOW)
+        archived = {(e.table_name, e.partition_name): e for e in result["archived"]}
+        assert sorted(archived) == [("messages", "messages_p202501"), ("messages", "messages_p202502"), ("tool_calls", "tool_calls_p202501")]
+        assert sorted(m.id for m in db.query(Message)) == ["m3", "m4"]
+        assert db.query(ToolCall).count() == 0
+
+        january = archived[("messages", "messages_p202501")]
+        assert january.row_count == 2
+        assert january.conversation_ids == ["a", "b"]
+        assert january.range_end == datetime(2025, 2, 1)
+        rows = list(read_archive(january))
+        assert [r["id"] for r in rows] == ["m0", "m1"]
+        assert rows[0]["content"] == "hello 0 ✓"
+        assert rows[0]["created_at"] == "2025-01-03T00:00:00"
+        assert [r["id"] for r in read_archive(january, conversation_id="b")] == ["m1"]
+        assert list(read_archive(archived[("tool_calls", "tool_calls_p202501")]))[0]["input"] == {"q": "x"}
+
+        assert db.query(ArchiveManifest).count() == 3
+        assert retention.stats()["archived_rows"] == 4
+        assert retention.run(db, now=NOW)["archived"] == []  # nothing cold left
+
+    def test_failed_archive_keeps_rows(self, db, retention, monkeypatch):
+        import services.retention_service as module
+        monkeypatch.setattr(module, "_file_sha256", lambda path: (_ for _ in ()).throw(OSError("disk")))
+        result = retention.run(db, now=NOW)
+        assert result["archived"] == []
+        assert db.query(Message).count() == 5
+        assert retention.stats()["failures"] == 3
+        assert db.query(ArchiveManifest).count() == 0
+
+    def test_rows_written_during_export_abort_the_month(self, db, retention, monkeypatch):
+        export = RetentionService._export
+
+        def export_then_write(self, session, source, path, compression):
+            out = export(self, session, source, path, compression)
+            # A late writer lands in the month after its rows were copied out
+            session.add(Message(id="late", conversation_id="a", sender="user", content="late", created_at=datetime(2025, 1, 20)))
+            session.commit()
+            return out
+
+        monkeypatch.setattr(RetentionService, "_export", export_then_write)
+        with pytest.raises(RuntimeError, match="changed during export"):
+            retention.archive_month(db, "messages", datetime(2025, 1, 1))
+        assert db.query(Message).filter(Message.created_at < datetime(2025, 2, 1)).count() == 3
+        assert db.query(ArchiveManifest).count() == 0
+        assert list(Path(retention.archive_dir).rglob("*.gz")) == []
+
+class TestPartitionMaintenance:
+    """未来分区预建"""
+
+    def test_manual_archiving_still_schedules_partition_maintenance(self, retention, monkeypatch, make_session_factory):
+        ran = threading.Event()
+        monkeypatch.setattr(retention, "maintain", lambda db, now=None: ran.set() or [])
+        monkeypatch.setattr(retention, "run", lambda db, now=None, dry_run=False: pytest.fail("archived without a schedule"))
+        retention.start(make_session_factory(), 3600, archive=False)
+        try:
+            assert ran.wait(5)  # runs once at start-up
+        finally:
+            retention.stop()
+
+    @pg_only
+    def test_rows_in_default_partition_move_into_the_new_month(self, retention):
+        from sqlalchemy import text
+        engine = create_engine("postgresql+psycopg://" + PG_URL.split("://", 1)[1])
+        db = sessionmaker(bind=engine)()
+        try:
+            month = datetime(2099, 1, 1)
+            db.add(Message(id="stray-2099", conversation_id=None, sender="user", content="x", created_at=datetime(2099, 1, 20)))
+            db.flush()
+            assert db.execute(text("SELECT tableoid::regclass::text FROM messages WHERE id = 'stray-2099'")).scalar() == "messages_default"
+            created = retention.ensure_partitions(db, now=month)
+            assert "messages_p209901" in created
+            assert db.execute(text("SELECT tableoid::regclass::text FROM messages WHERE id = 'stray-2099'")).scalar() == "messages_p209901"
+        finally:
+            db.rollback()  # DDL is transactional: the 2099 partitions go away too
+            db.close()
+            engine.dispose()
+
+    @pg_only
+    def test_only_one_process_leads(self):
+        engine = create_engine("postgresql+psycopg://" + PG_URL.split("://", 1)[1])
+        first, second = RetentionService(), RetentionService()
+        try:
+            with sessionmaker(bind=engine)() as db:
+                assert first._lead(db) and not second._lead(db)
+            first._resign()
+            with sessionmaker(bind=engine)() as db:
+                assert second._lead(db)
+        finally:
+            first._resign()
+            second._resign()
+            engine.dispose()
+
+class TestPinnedRows:
+    """未整理的消息与摘要树根节点不随月份归档"""
+
+    def test_unsummarized_messages_and_tree_roots_stay_hot(self, db, retention):
+        retention.pin_unsummarized = True
+        db.get(Conversation, "a").summary_watermark_at = datetime(2025, 1, 3)
+        db.get(Conversation, "a").summary_watermark_id = "m0"  # m2 (February) is not summarized yet
+        db.add(Summary(id="leaf", conversation_id="a", summary="s", level=0, parent_id="root", created_at=datetime(2025, 1, 4)))
+        db.add(Summary(id="root", conversation_id="a", summary="s", level=1, parent_id=None, created_at=datetime(2025, 1, 5)))
+        db.commit()
+
+        result = retention.run(db, now=NOW)
+        archived = {(e.table_name, e.partition_name): e.row_count for e in result["archived"]}
+        assert archived == {("messages", "messages_p202501"): 2, ("tool_calls", "tool_calls_p202501"): 1, ("summaries", "summaries_p202501"): 1}
+        assert sorted(m.id for m in db.query(Message)) == ["m2", "m3", "m4"]
+        assert [s.id for s in db.query(Summary)] == ["root"]
+
+        # Once the curator moves past m2 it goes with the next run
+        db.get(Conversation, "a").summary_watermark_at = datetime(2025, 7, 3)
+        db.get(Conversation, "a").summary_watermark_id = "m4"
+        db.commit()
+        result = retention.run(db, now=NOW)
+        assert [(e.partition_name, e.row_count) for e in result["archived"]] == [("messages_p202502", 1)]
+        assert [s.id for s in db.query(Summary)] == ["root"]
+
+    def test_legacy_flat_summaries_are_archived(self, db, retention):
+        db.add(Summary(id="flat", conversation_id="a", summary="s", created_at=datetime(2025, 1, 4)))
+        db.commit()
+        retention.run(db, now=NOW)
+        assert db.query(Summary).count() == 0
+
+    def test_without_curation_unsummarized_messages_are_archived_and_counted(self, db, retention):
+        conv = db.get(Conversation, "b")
+        conv.summary_watermark_at = conv.summary_watermark_id = None
+        conv.message_count, conv.summarized_message_count = 1, 0
+        db.query(Message).filter_by(id="m1").update({"token_count": 7})
+        db.commit()
+
+        retention.run(db, now=NOW)
+        assert db.get(Message, "m1") is None
+        db.refresh(conv)
+        assert (conv.summary_watermark_at, conv.summary_watermark_id) == (datetime(2025, 1, 3), "m1")
+        assert (conv.summarized_message_count, conv.summarized_token_total) == (1, 7)
+
+    def test_pinned_messages_are_released_after_the_grace_period(self, db, retention):
+        retention.configure(retention.archive_dir, 3, 1, "gzip", pin_unsummarized=True, pin_grace_months=2)
+        db.get(Conversation, "a").summary_watermark_at = datetime(2025, 1, 3)
+        db.get(Conversation, "a").summary_watermark_id = "m0"
+        db.commit()
+        assert not retention.pins_month(datetime(2025, 2, 1), NOW) and retention.pins_month(datetime(2025, 3, 1), NOW)
+        retention.run(db, now=NOW)
+        assert sorted(m.id for m in db.query(Message)) == ["m3", "m4"]  # m2 (February) is past the grace period
+        assert db.get(Conversation, "a").summary_watermark_id == "m2"
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+SummaryTreeService tests - leaf windows, carry-style merges and range covers
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Conversation, Message, Summary
+from services.summary_tree_service import SummaryTreeService
+
+BASE = datetime(2025, 1, 1)
+
+@pytest.fixture
+def db(make_session_factory):
+    session = make_session_factory(Conversation, Message, Summary)()
+    session.add(Conversation(id="conv", user_id="u", agent_name="agent"))
+    session.commit()
+    return session
+
+@pytest.fixture
+def tree():
+    tree = SummaryTreeService()
+    tree.configure(
+        lambda msgs, target: "leaf\n" + "\n".join(m.id for m in msgs),
+        lambda children, target: "merged\n" + "\n".join(c.id for c in children),
+        leaf_window=2,
+        fanout=2,
+    )
+    return tree
+
+def _window(index: int, size: int = 2):
+    return [
+        Message(id=f"m-{i:05d}", conversation_id="conv", sender="user", content="x", created_at=BASE + timedelta(seconds=i))
+        for i in range(index * size, (index + 1) * size)
+    ]
+
+def _build(db, tree, leaves: int):
+    created = []
+    for i in range(leaves):
+        created.append(tree.add_leaf(db, "conv", _window(i)))
+    db.commit()
+    return created
+
+class TestSummaryTree:
+    """Each leaf touches at most one node per level; roots cover the whole history"""
+
+    def test_merge_path_is_logarithmic(self, db, tree):
+        created = _build(db, tree, 8)
+        assert [len(c) for c in created] == [1, 2, 1, 3, 1, 2, 1, 4]  # leaf + carries of a binary counter
+        roots = tree.roots(db, "conv")
+        assert [(r.level, r.message_count) for r in roots] == [(3, 16)]
+        assert roots[0].span_start_id == "m-00000"
+        assert roots[0].span_end_id == "m-00015"
+
+    def test_roots_form_frontier_in_time_order(self, db, tree):
+        _build(db, tree, 5)
+        roots = tree.roots(db, "conv")
+        assert [(r.level, r.message_count) for r in roots] == [(2, 8), (0, 2)]
+        assert sum(r.message_count for r in roots) == 10
+
+    def test_cover_descends_only_into_partial_overlaps(self, db, tree):
+        _build(db, tree, 8)
+        nodes = tree.cover(db, "conv", BASE + timedelta(seconds=4), BASE + timedelta(seconds=12))
+        assert [(n.level, n.span_start_id, n.span_end_id) for n in nodes] == [
+            (1, "m-00004", "m-00007"),
+            (1, "m-00008", "m-00011"),
+        ]
+        assert [n.level for n in tree.cover(db, "conv")] == [3]
+        assert tree.cover(db, "conv", BASE + timedelta(seconds=100)) == []
+
+    def test_cover_returns_partially_overlapping_leaves(self, db, tree):
+        _build(db, tree, 4)
+        nodes = tree.cover(db, "conv", BASE + timedelta(seconds=1), BASE + timedelta(seconds=3))
+        assert [n.span_start_id for n in nodes] == ["m-00000", "m-00002"]
+        assert all(n.level == 0 for n in nodes)
+
+    def test_cover_keeps_parent_whose_children_were_archived(self, db, tree):
+        _build(db, tree, 4)
+        db.query(Summary).filter(Summary.level == 0).delete()
+        db.commit()
+        nodes = tree.cover(db, "conv", BASE + timedelta(seconds=1), BASE + timedelta(seconds=3))
+        assert [(n.level, n.span_start_id) for n in nodes] == [(1, "m-00000")]
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+TokenizerService tests - pure-Python BPE, heuristic fallback and the count cache
+"""
+
+import base64
+
+import pytest
+
+from services.tokenizer_service import BPETokenizer, HeuristicTokenizer, TokenizerService, load_tokenizer
+
+def _ranks_file(tmp_path, tokens):
+    path = tmp_path / "tiny.tiktoken"
+    lines = [f"{base64.b64encode(bytes([b])).decode()} {b}" for b in range(256)]
+    lines += [f"{base64.b64encode(t).decode()} {256 + i}" for i, t in enumerate(tokens)]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+class TestBPETokenizer:
+    """Byte-level merges follow rank order"""
+
+    def test_merges_by_rank(self, tmp_path):
+        tok = BPETokenizer.from_file(_ranks_file(tmp_path, [b"he", b"ll", b"hell", b"hello", b" w", b" wo"]))
+        assert tok.count("hello") == 1
+        assert tok.count("hello world") == 1 + 4  # " wo" + "r" + "l" + "d"
+        assert tok.count("xyz") == 3  # bytes only
+        assert tok.count("") == 0
+
+    def test_load_tokenizer_prefers_local_ranks(self, tmp_path):
+        path = _ranks_file(tmp_path, [b"ab"])
+        tok = load_tokenizer("bpe", bpe_file=path)
+        assert isinstance(tok, BPETokenizer)
+        assert isinstance(load_tokenizer("heuristic"), HeuristicTokenizer)
+        with pytest.raises(ValueError):
+            load_tokenizer("bpe")
+        with pytest.raises(ValueError):
+            load_tokenizer("sentencepiece")
+
+class TestTokenizerService:
+    """Counts are cached by content hash; batches tokenize each distinct text once"""
+
+    def test_count_many_dedupes_and_caches(self):
+        calls = []
+
+        class Counting(HeuristicTokenizer):
+            def count(self, text):
+                calls.append(text)
+                return super().count(text)
+
+        service = TokenizerService(max_entries=2)
+        service.set_tokenizer(Counting())
+        counts = service.count_many(["Hello world", "Hello world", "", "other text"])
+        assert counts[0] == counts[1] > 0
+        assert counts[2] == 0
+        assert calls == ["Hello world", "other text"]
+
+        assert service.count("Hello world") == counts[0]
+        assert len(calls) == 2
+        service.count("third")  # evicts the least recently used entry
+        stats = service.stats()
+        assert stats["entries"] == 2
+        assert stats["hits"] == 1
+        assert stats["method"] == "heuristic" and stats["exact"] is False
+
+    def test_auto_fallback_to_heuristic_is_reported(self, tmp_path, monkeypatch, caplog):
+        import builtins
+        real_import = builtins.__import__
+
+        def no_tiktoken(name, *args, **kwargs):
+            if name == "tiktoken":
+                raise ImportError(name)
+            return real_import(name, *args, **kwargs)
+
+        monkeypatch.setattr(builtins, "__import__", no_tiktoken)
+        service = TokenizerService(backend="auto", bpe_file=str(tmp_path / "missing.tiktoken"))
+        assert service.stats()["exact"] is None
+        service.count("Hello world")
+        assert "token counts are heuristic estimates" in caplog.text
+        assert service.stats()["method"] == "heuristic" and service.stats()["exact"] is False
+
+        service = TokenizerService(backend="bpe", bpe_file=_ranks_file(tmp_path, [b"ab"]))
+        service.count("ab")
+        assert service.stats()["exact"] is True
+
+    def test_heuristic_counts_common_words_as_single_tokens(self):
+        assert HeuristicTokenizer().count("Hello world, how are you?") == 7
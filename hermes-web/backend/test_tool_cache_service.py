@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tool cache tests - canonical input keys, opt-in per tool, TTL, LRU bound, disk tier, invalidation
+"""
+
+import time
+
+from services.tool_cache_service import ToolCacheService, canonical_input_hash
+
+def _cache(**kwargs):
+    cache = ToolCacheService()
+    cache.configure(kwargs.pop("max_entries", 100), kwargs.pop("disk_dir", None))
+    cache.enable("linter", kwargs.pop("ttl", 60))
+    return cache
+
+class TestKeys:
+    """规范化输入哈希"""
+
+    def test_key_order_does_not_matter(self):
+        assert canonical_input_hash({"a": 1, "b": {"x": [1, 2], "y": None}}) == canonical_input_hash({"b": {"y": None, "x": [1, 2]}, "a": 1})
+        assert canonical_input_hash({"a": 1}) != canonical_input_hash({"a": "1"})
+
+class TestMemoryTier:
+    """内存 LRU"""
+
+    def test_hit_returns_a_copy(self):
+        cache = _cache()
+        assert cache.get("linter", {"code": "x"}) is None
+        assert cache.put("linter", {"code": "x"}, {"issues": []})
+        hit = cache.get("linter", {"code": "x"})
+        assert hit == {"issues": []}
+        hit["issues"].append("mutated")
+        assert cache.get("linter", {"code": "x"}) == {"issues": []}
+        assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+    def test_only_enabled_tools_are_cached(self):
+        cache = _cache()
+        assert not cache.put("file_writer", {"path": "a"}, {"ok": True})
+        assert cache.get("file_writer", {"path": "a"}) is None
+
+    def test_ttl_expiry(self):
+        cache = _cache(ttl=0.05)
+        cache.put("linter", {}, {"ok": True})
+        time.sleep(0.06)
+        assert cache.get("linter", {}) is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_lru_bound(self):
+        cache = _cache(max_entries=2)
+        for i in range(3):
+            cache.put("linter", {"i": i}, {"i": i})
+        cache.get("linter", {"i": 1})  # 1 becomes most recent
+        cache.put("linter", {"i": 3}, {"i": 3})
+        assert cache.get("linter", {"i": 2}) is None
+        assert cache.get("linter", {"i": 1}) == {"i": 1}
+        assert cache.stats()["evictions"] == 2
+
+    def test_invalidate_single_input_tool_and_all(self):
+        cache = _cache()
+        cache.enable("web_search", 60)
+        cache.put("linter", {"a": 1}, {})
+        cache.put("linter", {"a": 2}, {})
+        cache.put("web_search", {"q": "x"}, {})
+        assert cache.invalidate("linter", {"a": 1}) == 1
+        assert cache.get("linter", {"a": 2}) == {}
+        assert cache.invalidate("linter") == 1
+        assert cache.invalidate() == 1
+        assert cache.stats()["entries"] == 0
+
+class TestDiskTier:
+    """磁盘二级缓存"""
+
+    def test_survives_a_new_instance_and_invalidation_removes_files(self, tmp_path):
+        first = _cache(disk_dir=str(tmp_path))
+        first.put("linter", {"code": "x"}, {"issues": ["E1"]})
+        second = _cache(disk_dir=str(tmp_path))
+        assert second.get("linter", {"code": "x"}) == {"issues": ["E1"]}
+        assert second.stats()["disk_hits"] == 1
+        second.invalidate("linter")
+        assert _cache(disk_dir=str(tmp_path)).get("linter", {"code": "x"}) is None
+
+    def test_unsafe_tool_names_stay_inside_the_cache_dir(self, tmp_path):
+        cache = _cache(disk_dir=str(tmp_path / "cache"))
+        cache.enable("../escape", 60)
+        cache.put("../escape", {}, {"ok": True})
+        assert not (tmp_path / "escape").exists()
+        assert _cache(disk_dir=str(tmp_path / "cache")).stats()["entries"] == 0
+        fresh = _cache(disk_dir=str(tmp_path / "cache"))
+        fresh.enable("../escape", 60)
+        assert fresh.get("../escape", {}) == {"ok": True}
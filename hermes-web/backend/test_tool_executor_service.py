@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Tool executor tests - routing by execution kind, per-tool concurrency limits, timeouts, subprocess cancellation
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from services.tool_executor_service import ToolExecutor, ToolTimeoutError, registered_tool_stub
+
+def _blocking(input_data):
+    time.sleep(input_data.get("sleep", 0))
+    return {"thread": threading.current_thread().name}
+
+def _cpu(input_data):
+    return {"pid": os.getpid(), "total": sum(i * i for i in range(input_data["n"]))}
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+class TestKinds:
+    """按执行类型路由"""
+
+    def test_thread_kind_keeps_the_loop_responsive(self):
+        executor = ToolExecutor()
+        executor.declare("file_reader", "thread")
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def main():
+            result, _ = await asyncio.gather(executor.run("file_reader", _blocking, {"sleep": 0.1}), ticker())
+            return result
+
+        result = asyncio.run(main())
+        executor.shutdown()
+        assert result["thread"].startswith("tool")
+        assert len(ticks) == 5 and ticks[-1] - ticks[0] < 0.09
+
+    def test_process_kind_runs_in_another_process(self):
+        executor = ToolExecutor(max_processes=1)
+        executor.declare("analyzer", "process")
+        result = asyncio.run(executor.run("analyzer", _cpu, {"n": 1000}))
+        executor.shutdown()
+        assert result["pid"] != os.getpid()
+        assert result["total"] == sum(i * i for i in range(1000))
+
+    def test_registered_stub_runs_in_the_process_pool(self):
+        executor = ToolExecutor(max_processes=1)
+        executor.declare("custom_tool", "process")
+        assert asyncio.run(executor.run("custom_tool", registered_tool_stub, {"a": 1})) == {"result": "stub", "input": {"a": 1}}
+        executor.shutdown()
+
+    def test_coroutine_body_cannot_be_declared_thread(self):
+        executor = ToolExecutor()
+        executor.declare("file_reader", "thread")
+
+        async def body(input_data):
+            return {}
+
+        with pytest.raises(TypeError, match="coroutine function"):
+            asyncio.run(executor.run("file_reader", body, {}))
+
+    def test_unknown_kind_is_rejected(self):
+        with pytest.raises(ValueError, match="Unknown execution kind"):
+            ToolExecutor().declare("x", "gpu")
+
+class TestLimits:
+    """并发上限与超时"""
+
+    def test_per_tool_concurrency_limit(self):
+        executor = ToolExecutor()
+        executor.declare("test_runner", "async", max_concurrency=2)
+        running = {"now": 0, "peak": 0}
+
+        async def tool(input_data):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.02)
+            running["now"] -= 1
+            return {}
+
+        async def main():
+            await asyncio.gather(*(executor.run("test_runner", tool, {}) for _ in range(6)))
+
+        asyncio.run(main())
+        assert running["peak"] == 2
+        stats = executor.stats()["tools"]["test_runner"]
+        assert stats["completed"] == 6 and stats["running"] == 0 and stats["waiting"] == 0
+
+    def test_thread_timeout_does_not_wait_for_the_thread(self):
+        executor = ToolExecutor()
+        executor.declare("security_analyzer", "thread", timeout_s=0.05)
+        started = time.monotonic()
+        with pytest.raises(ToolTimeoutError):
+            asyncio.run(executor.run("security_analyzer", _blocking, {"sleep": 0.5}))
+        assert time.monotonic() - started < 0.4
+        executor.shutdown()
+
+    def test_timed_out_thread_keeps_its_slot_until_it_finishes(self):
+        executor = ToolExecutor()
+        executor.declare("dependency_analyzer", "thread", max_concurrency=1, timeout_s=0.05)
+
+        async def main():
+            with pytest.raises(ToolTimeoutError):
+                await executor.run("dependency_analyzer", _blocking, {"sleep": 0.3})
+            assert executor.stats()["tools"]["dependency_analyzer"]["running"] == 1
+            started = time.monotonic()
+            await asyncio.wait_for(executor.run("dependency_analyzer", _blocking, {}), 2)
+            return time.monotonic() - started
+
+        waited = asyncio.run(main())
+        executor.shutdown()
+        assert waited > 0.15  # the second call waited for the first worker, not just its timeout
+        assert executor.stats()["tools"]["dependency_analyzer"]["running"] == 0
+
+    def test_timeout_kills_the_subprocess(self, tmp_path):
+        executor = ToolExecutor()
+        executor.declare("build_tool", "subprocess", timeout_s=0.3)
+        pid_file = tmp_path / "pid"
+        script = f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(30)"
+
+        async def tool(input_data):
+            return await executor.run_subprocess([sys.executable, "-c", script])
+
+        started = time.monotonic()
+        with pytest.raises(ToolTimeoutError, match="timed out after 0.3s"):
+            asyncio.run(executor.run("build_tool", tool, {}))
+        assert time.monotonic() - started < 5
+        assert not _alive(int(pid_file.read_text()))
+        assert executor.stats()["tools"]["build_tool"]["timeouts"] == 1
+
+class TestSubprocess:
+    """子进程执行"""
+
+    def test_collects_output_and_return_code(self):
+        executor = ToolExecutor()
+        code = "import sys; print(sys.stdin.read().upper()); print('warn', file=sys.stderr); sys.exit(3)"
+        result = asyncio.run(executor.run_subprocess([sys.executable, "-c", code], stdin=b"lint me"))
+        assert result["returncode"] == 3
+        assert result["stdout"].strip() == "LINT ME" and result["stderr"].strip() == "warn"
+
+    def test_cancellation_kills_the_subprocess(self):
+        executor = ToolExecutor()
+        executor.declare("test_runner", "subprocess")
+
+        async def tool(input_data):
+            return await executor.run_subprocess([sys.executable, "-c", "import time; time.sleep(30)"])
+
+        async def main():
+            task = asyncio.create_task(executor.run("test_runner", tool, {}))
+            await asyncio.sleep(0.3)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        assert executor.stats()["tools"]["test_runner"]["cancelled"] == 1
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tool metrics tests - log-bucketed latency histograms, percentiles and error rates per tool
+"""
+
+import random
+
+from services.tool_metrics_service import LatencyHistogram, ToolMetricsService, bucket_bounds, bucket_index
+
+class TestBuckets:
+    """桶号与边界"""
+
+    def test_every_value_falls_inside_its_bucket(self):
+        for value in list(range(0, 300)) + [1_000, 65_535, 65_536, 10**6, 3_600 * 10**6]:
+            lower, upper = bucket_bounds(bucket_index(value))
+            assert lower <= value < upper
+
+    def test_relative_width_is_bounded(self):
+        for value in (100, 5_000, 250_000, 10**7):
+            lower, upper = bucket_bounds(bucket_index(value))
+            assert (upper - lower) / lower <= 2 / 64 + 1e-9
+
+class TestHistogram:
+    """分位数与错误率"""
+
+    def test_percentiles_track_exact_values(self):
+        rng = random.Random(7)
+        samples = sorted(rng.expovariate(1 / 0.02) for _ in range(5000))
+        h = LatencyHistogram()
+        for s in samples:
+            h.record(s)
+        for q in (0.5, 0.95, 0.99):
+            exact = samples[int(q * len(samples)) - 1] * 1000
+            assert abs(h.percentile(q) - exact) / exact < 0.04
+
+    def test_summary_and_error_rate(self):
+        h = LatencyHistogram()
+        h.record(0.010)
+        h.record(0.030, ok=False)
+        summary = h.summary()
+        assert summary["count"] == 2
+        assert summary["errors"] == 1 and summary["error_rate"] == 0.5
+        assert summary["max_ms"] == 30.0 and summary["min_ms"] == 10.0
+        assert summary["total_ms"] == 40.0
+        assert LatencyHistogram().summary()["p99_ms"] == 0.0
+
+class TestService:
+    """按工具聚合"""
+
+    def test_snapshot_orders_by_total_time(self):
+        metrics = ToolMetricsService()
+        metrics.record("linter", 0.001)
+        metrics.record("test_runner", 0.5)
+        metrics.record("test_runner", 0.4, ok=False)
+        assert list(metrics.snapshot()) == ["test_runner", "linter"]
+        stats = metrics.stats("test_runner")
+        assert stats["tool_name"] == "test_runner" and stats["count"] == 2 and stats["errors"] == 1
+        assert metrics.stats("unused")["count"] == 0
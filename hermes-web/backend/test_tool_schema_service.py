@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tool schema tests - compiled validators for nested objects and arrays, error paths, invalid schemas
+"""
+
+import pytest
+
+from services.tool_schema_service import SchemaError, ValidationError, compile_schema
+
+SCHEMA = {
+    "type": "object",
+    "required": ["repo", "checks"],
+    "properties": {
+        "repo": {"type": "string", "minLength": 1},
+        "depth": {"type": "integer", "minimum": 1, "maximum": 10},
+        "checks": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "required": ["name"],
+                "additionalProperties": False,
+                "properties": {
+                    "name": {"enum": ["lint", "test", "build"]},
+                    "args": {"type": "array", "items": {"type": "string"}},
+                    "timeout": {"type": ["number", "null"], "exclusiveMinimum": 0},
+                },
+            },
+        },
+    },
+}
+
+def _error(validator, data) -> str:
+    with pytest.raises(ValidationError) as info:
+        validator(data)
+    return str(info.value)
+
+class TestNested:
+    """嵌套对象与数组"""
+
+    def test_valid_input_passes(self):
+        validate = compile_schema(SCHEMA)
+        validate({"repo": "hermes", "depth": 3, "checks": [{"name": "lint", "args": ["-q"], "timeout": None}, {"name": "test", "timeout": 2.5}]})
+
+    def test_errors_carry_the_full_path(self):
+        validate = compile_schema(SCHEMA)
+        base = {"repo": "hermes", "checks": [{"name": "lint"}]}
+        assert _error(validate, {"checks": []}) == "Missing required field: repo"
+        assert _error(validate, {**base, "repo": 1}) == "Field 'repo' expects type string"
+        assert _error(validate, {**base, "checks": []}) == "Field 'checks' must have at least 1 items"
+        assert _error(validate, {**base, "checks": [{"name": "lint"}, {}]}) == "Missing required field: checks[1].name"
+        assert _error(validate, {**base, "checks": [{"name": "lint", "args": ["a", 2]}]}) == "Field 'checks[0].args[1]' expects type string"
+        assert _error(validate, {**base, "checks": [{"name": "deploy"}]}) == "Field 'checks[0].name' must be one of ['lint', 'test', 'build']"
+        assert _error(validate, {**base, "checks": [{"name": "lint", "extra": 1}]}) == "Field 'checks[0].extra' is not allowed"
+        assert _error(validate, {**base, "checks": [{"name": "lint", "timeout": 0}]}) == "Field 'checks[0].timeout' must be > 0"
+        assert _error(validate, {**base, "depth": 11}) == "Field 'depth' must be <= 10"
+        assert _error(validate, []) == "Input expects type object"
+
+    def test_booleans_are_not_numbers(self):
+        validate = compile_schema({"properties": {"n": {"type": "number"}, "i": {"type": "integer"}, "e": {"enum": [1]}}})
+        validate({"n": 1.5, "i": 2.0})
+        assert _error(validate, {"n": True}) == "Field 'n' expects type number"
+        assert _error(validate, {"i": 1.5}) == "Field 'i' expects type integer"
+        assert "must be one of" in _error(validate, {"e": True})
+
+    def test_combinators_and_tuple_items(self):
+        validate = compile_schema({
+            "properties": {
+                "target": {"anyOf": [{"type": "string", "pattern": "^[a-z]+$"}, {"type": "integer"}]},
+                "pair": {"type": "array", "items": [{"type": "string"}, {"type": "number"}]},
+                "id": {"oneOf": [{"type": "integer"}, {"type": "number"}]},
+            }
+        })
+        validate({"target": "main", "pair": ["x", 1, "anything"], "id": 1.5})
+        assert "anyOf" in _error(validate, {"target": "Main"})
+        assert _error(validate, {"pair": [1]}) == "Field 'pair[0]' expects type string"
+        assert "oneOf" in _error(validate, {"id": 3})
+
+class TestCompile:
+    """schema 校验"""
+
+    def test_empty_schema_accepts_anything(self):
+        compile_schema({})({"anything": [1, {"x": None}]})
+        compile_schema(None)({})
+
+    @pytest.mark.parametrize("schema", [
+        {"type": "any"},
+        {"properties": {"x": {"type": "strng"}}},
+        {"properties": {"x": {"pattern": "("}}},
+        {"required": "x"},
+        {"items": [1]},
+        {"minItems": -1},
+        {"enum": []},
+    ])
+    def test_invalid_schemas_fail_at_compile_time(self, schema):
+        with pytest.raises(SchemaError):
+            compile_schema(schema)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+NumpyVectorIndex tests - in-process MemoryNexus search backend
+"""
+
+import numpy as np
+import pytest
+
+from datetime import datetime
+
+from services.vector_index import NumpyVectorIndex, SearchFilters, VectorRecord, check_vector_config
+
+DIM = 8
+
+def _record(i: int, vec, source_type: str = "document") -> VectorRecord:
+    return VectorRecord(id=f"chunk-{i}", source_type=source_type, source_id=f"src-{i}", content=f"content {i}", embedding=vec)
+
+@pytest.fixture
+def index(tmp_path):
+    rng = np.random.default_rng(0)
+    idx = NumpyVectorIndex(str(tmp_path), DIM, block_rows=16)
+    idx.upsert([_record(i, rng.standard_normal(DIM), "code" if i % 2 else "document") for i in range(50)])
+    return idx
+
+class TestNumpyVectorIndex:
+    """Brute-force top-k kernel, filtering and persistence"""
+
+    def test_search_matches_exact_cosine(self, index):
+        query = np.asarray(index._matrix[7]) * 3.0
+        hits = index.search(query, top_k=5)
+        assert len(hits) == 5
+        assert hits[0].id == "chunk-7"
+        assert hits[0].score == pytest.approx(1.0, abs=1e-5)
+        scores = [h.score for h in hits]
+        assert scores == sorted(scores, reverse=True)
+
+        matrix = np.asarray(index._matrix)
+        expected = np.argsort(-(matrix @ (query / np.linalg.norm(query))))[:5]
+        assert [h.id for h in hits] == [f"chunk-{i}" for i in expected]
+
+    def test_source_type_filter(self, index):
+        hits = index.search(np.ones(DIM), top_k=10, source_type="code")
+        assert len(hits) == 10
+        assert all(h.source_type == "code" for h in hits)
+        assert index.search(np.ones(DIM), top_k=10, source_type="missing") == []
+
+    def test_upsert_overwrites_and_remove(self, index):
+        target = np.zeros(DIM)
+        target[0] = 1.0
+        index.upsert([_record(3, target)])
+        assert len(index) == 50
+        assert index.search(target, top_k=1)[0].id == "chunk-3"
+
+        assert index.remove(["chunk-3", "unknown"]) == 1
+        assert len(index) == 49
+        assert all(h.id != "chunk-3" for h in index.search(target, top_k=49))
+
+    def test_persists_incrementally(self, index, tmp_path):
+        index.remove(["chunk-0"])
+        index.upsert([_record(99, np.ones(DIM))])
+        reloaded = NumpyVectorIndex(str(tmp_path), DIM)
+        assert len(reloaded) == 50
+        assert reloaded.search(np.ones(DIM), top_k=1)[0].id == "chunk-99"
+        assert all(h.id != "chunk-0" for h in reloaded.search(np.ones(DIM), top_k=50))
+
+    def test_metadata_and_created_at_filters(self, tmp_path):
+        idx = NumpyVectorIndex(str(tmp_path), DIM)
+        idx.upsert([
+            VectorRecord(id="a", source_type="code", source_id="repo-1", content="a", embedding=np.ones(DIM),
+                         metadata={"project": "hermes", "tags": ["db", "perf"]}, created_at=datetime(2025, 1, 1)),
+            VectorRecord(id="b", source_type="code", source_id="repo-2", content="b", embedding=np.ones(DIM),
+                         metadata={"project": "other"}, created_at=datetime(2025, 6, 1)),
+            VectorRecord(id="c", source_type="code", source_id="repo-1", content="c", embedding=np.ones(DIM)),
+        ])
+        query = np.ones(DIM)
+        assert [h.id for h in idx.search(query, top_k=3, filters=SearchFilters(metadata={"project": "hermes"}))] == ["a"]
+        assert [h.id for h in idx.search(query, top_k=3, filters=SearchFilters(metadata={"tags": ["perf"]}))] == ["a"]
+        assert sorted(h.id for h in idx.search(query, top_k=3, filters=SearchFilters(source_id="repo-1"))) == ["a", "c"]
+        recent = SearchFilters(created_after=datetime(2025, 3, 1))
+        assert [h.id for h in idx.search(query, top_k=3, filters=recent)] == ["b"]
+
+    def test_offset_timestamps_are_normalized_to_naive_utc(self, tmp_path):
+        filters = SearchFilters(created_after=datetime.fromisoformat("2025-06-01T02:00:00+02:00"),
+                                created_before=datetime.fromisoformat("2025-06-01T00:00:01Z"))
+        assert filters.created_after == datetime(2025, 6, 1) and filters.created_after.tzinfo is None
+        assert filters.created_before == datetime(2025, 6, 1, 0, 0, 1)
+        idx = NumpyVectorIndex(str(tmp_path), DIM)
+        idx.upsert([VectorRecord(id="b", source_type="code", source_id="repo-2", content="b", embedding=np.ones(DIM),
+                                 created_at=datetime(2025, 6, 1))])
+        assert [h.id for h in idx.search(np.ones(DIM), top_k=1, filters=filters)] == ["b"]
+
+    def test_rejects_wrong_dimension(self, index):
+        with pytest.raises(ValueError):
+            index.search([1.0, 2.0], top_k=1)
+
+class TestInt8Quantization:
+    """int8 scan + exact float32 re-rank"""
+
+    def test_reranked_results_match_exact_search(self, tmp_path):
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((400, 32))
+        exact = NumpyVectorIndex(str(tmp_path / "exact"), 32, block_rows=64)
+        quant = NumpyVectorIndex(str(tmp_path / "int8"), 32, block_rows=64, quantization="int8", rerank_factor=4)
+        records = [_record(i, v) for i, v in enumerate(vectors)]
+        exact.upsert(records)
+        quant.upsert(records)
+
+        queries = rng.standard_normal((20, 32))
+        expected = exact.search_batch(queries, top_k=10)
+        got = quant.search_batch(queries, top_k=10)
+        overlap = np.mean([len({h.id for h in e} & {h.id for h in g}) / 10 for e, g in zip(expected, got)])
+        assert overlap >= 0.95
+        # Scores come from the full-precision re-rank, not the int8 approximation
+        for e, g in zip(expected, got):
+            by_id = {h.id: h.score for h in e}
+            for h in g:
+                if h.id in by_id:
+                    assert h.score == pytest.approx(by_id[h.id], abs=1e-5)
+        assert quant.stats()["scan_bytes"] < exact.stats()["scan_bytes"] / 3
+
+    def test_codes_built_for_existing_index(self, index, tmp_path):
+        reloaded = NumpyVectorIndex(str(tmp_path), DIM, quantization="int8")
+        assert reloaded._codes.shape == (50, DIM)
+        query = np.array(index._matrix[11])
+        assert reloaded.search(query, top_k=1)[0].id == "chunk-11"
+        reloaded.upsert([_record(11, -query)])
+        assert reloaded.search(query, top_k=1)[0].id != "chunk-11"
+        assert NumpyVectorIndex(str(tmp_path), DIM, quantization="int8").search(-query, top_k=1)[0].id == "chunk-11"
+
+    def test_rejects_unknown_quantization(self, tmp_path):
+        with pytest.raises(ValueError):
+            NumpyVectorIndex(str(tmp_path), DIM, quantization="pq")
+
+    def test_backend_and_quantization_are_checked_together(self):
+        check_vector_config("pgvector", "halfvec")
+        check_vector_config("numpy", "int8")
+        with pytest.raises(ValueError, match="not supported by the pgvector backend"):
+            check_vector_config("pgvector", "int8")
+        with pytest.raises(ValueError, match="not supported by the numpy backend"):
+            check_vector_config("numpy", "halfvec")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Write buffer tests - multi-row transcript inserts and coalesced write-behind flushes
+"""
+
+import threading
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from models import Conversation, Message, ToolCall
+from services.write_buffer_service import WriteBufferService, insert_transcript
+
+@pytest.fixture
+def session_factory(make_session_factory):
+    factory = make_session_factory(Conversation, Message, ToolCall)
+    db = factory()
+    db.add_all([Conversation(id=cid, user_id="u", agent_name="agent") for cid in ("a", "b")])
+    db.commit()
+    db.close()
+    return factory
+
+def _message(conversation_id="a", tokens=3, sender="user", offset=0):
+    return {
+        "id": str(uuid4()),
+        "conversation_id": conversation_id,
+        "sender": sender,
+        "content": "hello",
+        "role": None,
+        "token_count": tokens,
+        "created_at": datetime(2025, 1, 1) + timedelta(seconds=offset),
+    }
+
+def _tool_call(message_id, conversation_id="a"):
+    return {
+        "id": str(uuid4()),
+        "conversation_id": conversation_id,
+        "message_id": message_id,
+        "step_number": 1,
+        "tool_name": "search",
+        "input": {"q": "x"},
+        "output": None,
+        "latency_ms": 5,
+        "status": "success",
+        "created_at": datetime(2025, 1, 1),
+    }
+
+class TestInsertTranscript:
+    """One INSERT per table and one counter UPDATE per conversation"""
+
+    def test_counters_aggregate_per_conversation(self, session_factory):
+        db = session_factory()
+        messages = [_message("a", offset=i) for i in range(4)] + [_message("b", tokens=10), _message("missing")]
+        touched = insert_transcript(db, messages, [_tool_call(messages[0]["id"])])
+        db.commit()
+        assert sorted(touched) == ["a", "b"]
+        a, b = db.get(Conversation, "a"), db.get(Conversation, "b")
+        assert (a.message_count, a.token_total) == (4, 12)
+        assert (b.message_count, b.token_total) == (1, 10)
+        assert a.updated_at == datetime(2025, 1, 1, 0, 0, 3)
+        assert db.query(Message).count() == 6
+        assert db.query(ToolCall).one().message_id == messages[0]["id"]
+
+class TestWriteBuffer:
+    """Concurrent submissions share flushes; futures resolve after commit"""
+
+    def _buffer(self, factory, flush_ms=50, max_rows=1000, ack="flush", on_flush=None):
+        buffer = WriteBufferService()
+        buffer.configure(factory, True, flush_ms=flush_ms, max_rows=max_rows, ack=ack, on_flush=on_flush)
+        return buffer
+
+    def test_burst_coalesces_into_few_flushes(self, session_factory):
+        touched = []
+        buffer = self._buffer(session_factory, on_flush=lambda db, ids: touched.extend(ids))
+        futures = []
+        threads = [threading.Thread(target=lambda: futures.append(buffer.submit([_message()]))) for _ in range(50)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for f in futures:
+            f.result(timeout=5)
+        stats = buffer.stats()
+        assert stats["flushed_rows"] == 50
+        assert stats["flushes"] < 10
+        assert session_factory().get(Conversation, "a").message_count == 50
+        assert set(touched) == {"a"}
+
+    def test_max_rows_bounds_each_flush(self, session_factory):
+        buffer = self._buffer(session_factory, flush_ms=1000, max_rows=10)
+        futures = [buffer.submit([_message() for _ in range(5)]) for _ in range(4)]
+        for f in futures:
+            f.result(timeout=5)  # full batches flush without waiting out flush_ms
+        assert buffer.stats()["flushes"] == 2
+
+    def test_failed_submission_does_not_fail_neighbours(self, session_factory):
+        buffer = self._buffer(session_factory, ack="buffer")
+        good = buffer.submit([_message()])
+        bad = buffer.submit([_message(sender=None)])  # violates NOT NULL
+        assert buffer.drain(timeout=5)
+        assert good.result() is None
+        with pytest.raises(Exception):
+            bad.result()
+        stats = buffer.stats()
+        assert stats["failures"] == 1
+        assert stats["dropped_rows"] == 1
+        assert session_factory().query(Message).count() == 1
+
+    def test_full_queue_falls_back_to_waiting_for_the_flush(self, session_factory):
+        buffer = self._buffer(session_factory, flush_ms=1000, ack="buffer")
+        buffer.max_queue_rows = 5
+        _, first = buffer.submit_with_ack([_message() for _ in range(4)])
+        future, second = buffer.submit_with_ack([_message() for _ in range(2)])
+        assert (first, second) == (True, False)
+        stats = buffer.stats()
+        assert (stats["buffered_rows"], stats["queued_submissions"], stats["backpressured"]) == (6, 2, 1)
+        future.result(timeout=5)
+        assert buffer.stats()["buffered_rows"] == 0
+
+    def test_unknown_ack_mode_rejected(self, session_factory):
+        with pytest.raises(ValueError):
+            WriteBufferService().configure(session_factory, True, ack="never")